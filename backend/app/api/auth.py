@@ -7,6 +7,7 @@ from datetime import timedelta
 from typing import Optional
 import httpx
 
+from ..core.cache import user_cache
 from ..core.config import settings
 from ..core.security import create_access_token
 from ..core.deps import get_current_active_user
@@ -110,6 +111,7 @@ async def oauth_callback(provider: str, request: Request, db: AsyncSession = Dep
             if avatar_url:
                 user.avatar_url = avatar_url
             await db.commit()
+            user_cache.pop(user.id)
         else:
             # Create new user
             user_create = UserCreate(
@@ -1,26 +1,143 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+import base64
+import datetime
+import json
+import logging
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from uuid import uuid4
+from uuid import UUID, uuid4
+from ..core.config import settings
 from ..db import crud
+from ..db.database import AsyncSessionLocal
 from ..core.deps import get_current_active_user
 from ..schemas.user import User
+from ..services.embeddings import embedding_service
+from ..services.export import exporter
+from ..services.transcript_import import ImportInProgress, transcript_importer
+from ..services.work_queue import QueueFull, message_queue
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 class ChatRequest(BaseModel):
-    session_id: str
+    session_id: UUID
     message: str
     role: str = "user"
 
 @router.post("/")
 async def post_chat(
     req: ChatRequest, 
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user)
 ):
     """Send a chat message (requires authentication)"""
-    # store message with authenticated user ID
-    await crud.create_chat_message(req.session_id, current_user.id, req.message, req.role)
-    # enqueue background processing (entity extraction + graph update)
-    background_tasks.add_task(crud.process_message_async, req.session_id, current_user.id, req.message, req.role)
+    # shed load before storing anything if background processing is backed up
+    try:
+        message_queue.check_capacity()
+    except QueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"})
+    # embed (batched with concurrent requests); a failing backend must not lose the message
+    try:
+        embedding = await embedding_service.embed(req.message)
+    except Exception:
+        logger.exception("embedding failed; storing message without one")
+        embedding = None
+    # store the message and its durable background job (entity extraction + graph update) in one transaction
+    try:
+        async with message_queue.reserve():
+            await crud.create_chat_message(
+                req.session_id, current_user.id, req.message, req.role, embedding, enqueue=True
+            )
+    except QueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"})
     return {"status": "processing", "llm_response": "pending"}
+
+
+@router.post("/import")
+async def import_transcript(
+    request: Request,
+    key: str = Query(..., min_length=1, max_length=512),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Bulk-import a JSONL transcript sent as the request body (requires authentication)
+
+    Lines are Open WebUI chats or single messages; see
+    ``services.transcript_import``. The body is streamed in chunks, never
+    buffered whole. If an import is interrupted, send the same body with
+    the same ``key`` again: lines before the last checkpoint are skipped.
+    """
+    try:
+        return await transcript_importer.run(current_user.id, key, request.stream())
+    except ImportInProgress as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.get("/export")
+async def export_history(
+    graph: bool = True,
+    compress: bool = False,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream all of the user's messages, then their entities and facts, as NDJSON (requires authentication)
+
+    With ``compress=true`` the body is gzip-compressed on the fly and sent
+    with ``Content-Encoding: gzip``. The last line has type ``end`` and
+    says whether the export is ``complete``.
+    """
+    filename = f"relevantic-export-{datetime.date.today().isoformat()}.ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        exporter.stream(current_user.id, graph=graph, compress=compress),
+        media_type="application/x-ndjson", headers=headers,
+    )
+
+
+def _encode_cursor(timestamp: datetime.datetime, message_id: UUID) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{message_id.hex}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(timestamp), UUID(message_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/history/{session_id}")
+async def get_history(
+    session_id: UUID,
+    limit: int = Query(settings.history_page_size, ge=1, le=settings.history_page_max),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Stream one page of a session's messages, newest first, as NDJSON (requires authentication)
+
+    The last line carries ``next_cursor``; pass it back as ``cursor`` for the
+    next (older) page. It is null once the history is exhausted.
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    user_id = current_user.id
+
+    async def lines():
+        # one extra row tells whether another page exists
+        query = crud.history_page_query(user_id, session_id, limit + 1, before)
+        sent, last, more = 0, None, False
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(query)
+            async for chat in result.scalars():
+                if sent == limit:
+                    more = True
+                    break
+                yield json.dumps({
+                    "id": str(chat.id),
+                    "role": chat.role,
+                    "message": chat.message_text,
+                    "timestamp": chat.timestamp.isoformat() if chat.timestamp else None,
+                }) + "\n"
+                sent, last = sent + 1, chat
+            await result.close()
+        next_cursor = _encode_cursor(last.timestamp, last.id) if more else None
+        yield json.dumps({"next_cursor": next_cursor, "count": sent}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
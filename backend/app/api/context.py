@@ -1,16 +1,65 @@
 
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, Response
 from typing import List
+from uuid import UUID
+from ..core.config import settings
 from ..core.deps import get_current_active_user
+from ..db import crud
+from ..db.database import AsyncSessionLocal
 from ..schemas.user import User
+from ..services import neo4j_client, vector_index
+from ..services.context_engine import assemble
 
 router = APIRouter()
 
+def _message(chat) -> dict:
+    return {
+        "id": str(chat.id),
+        "role": chat.role,
+        "message": chat.message_text,
+        "timestamp": chat.timestamp.isoformat() if chat.timestamp else None,
+    }
+
 @router.get("/{session_id}")
 async def get_context(
-    session_id: str,
+    session_id: UUID,
+    response: Response,
     current_user: User = Depends(get_current_active_user)
 ):
     """Get context for a session (requires authentication)"""
-    # TODO: fetch recent chat history + graph facts for the authenticated user
-    return {"session_id": session_id, "user_id": str(current_user.id), "context": []}
+    user_id = current_user.id
+    deadline = settings.context_deadline_ms / 1000
+
+    # each source uses its own DB session: they run concurrently
+    async def recent():
+        async with AsyncSessionLocal() as db:
+            rows = await crud.get_recent_messages_buffered(db, user_id, session_id, settings.context_history_limit)
+        return [_message(row) for row in rows]
+
+    async def similar():
+        async with AsyncSessionLocal() as db:
+            latest = await crud.get_latest_embedding(db, user_id, session_id)
+            if latest is None:
+                return []
+            hits = await vector_index.search(user_id, latest.embedding, settings.context_similar_k + 1)
+            scores = {message_id: score for message_id, score in hits if message_id != latest.id}
+            rows = await crud.get_messages_by_ids(db, user_id, list(scores))
+        rows.sort(key=lambda row: scores[row.id], reverse=True)
+        return [{**_message(row), "score": scores[row.id]} for row in rows[:settings.context_similar_k]]
+
+    async def facts():
+        # cancelling the task does not stop its thread; the transaction timeout ends the query server-side
+        return await asyncio.to_thread(
+            neo4j_client.get_user_facts, user_id, settings.context_fact_limit, deadline
+        )
+
+    context = await assemble({"recent": recent, "similar": similar, "facts": facts}, deadline=deadline)
+    response.headers["Server-Timing"] = context.server_timing()
+    return {
+        "session_id": str(session_id),
+        "user_id": str(user_id),
+        "context": context.values(),
+        "partial": context.partial,
+        "sources": {name: result.status for name, result in context.sources.items()},
+    }
@@ -1,23 +1,76 @@
+import json
+from typing import Annotated, List
 from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
 from ..core.deps import get_current_active_user
+from ..db.database import get_session
 from ..schemas.user import User
+from ..services.entity_matcher import entity_matcher, fold
 
 router = APIRouter()
 
 class ResolveRequest(BaseModel):
     mention: str
 
+class BatchResolveRequest(BaseModel):
+    # blank mentions are rejected with a 422 rather than reported as unresolved
+    mentions: List[Annotated[str, Field(pattern=r"\S")]] = Field(..., max_length=settings.entity_resolve_batch_max)
+
 @router.post("/resolve")
 async def resolve_entity(
     req: ResolveRequest,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_session)
 ):
     """Resolve entity mention to canonical form (requires authentication)"""
-    # naive canonicalization
-    canonical = req.mention.strip().title()
+    mention = req.mention.strip()
+    matches = await entity_matcher.find(db, current_user.id, mention)
+    if len(matches) == 1 and matches[0].start == 0 and matches[0].end == len(mention):
+        match = matches[0]
+        canonical, entity_type, resolved = match.canonical, match.entity_type, True
+    else:
+        # unknown entity: fall back to naive canonicalization
+        canonical, entity_type, resolved = mention.title(), None, False
     return {
         "mention": req.mention, 
         "canonical": canonical,
+        "entity_type": entity_type,
+        "resolved": resolved,
         "user_id": str(current_user.id)
     }
+
+
+@router.post("/resolve/batch")
+async def resolve_entities(
+    req: BatchResolveRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_session)
+):
+    """Resolve many mentions against the cached dictionary layers; streams NDJSON in input order (requires authentication)
+
+    Lookups go through the same Python-folded patterns as ``/resolve``, so
+    non-ASCII names match however the database would fold their case.
+    """
+    user_layer, global_layer = await entity_matcher.layers(db, current_user.id)
+    keys = [fold(mention.strip()) for mention in req.mentions]
+    resolved = {}
+    for key in keys:
+        # the user's own dictionary wins over the global one
+        entry = user_layer.patterns.get(key) or global_layer.patterns.get(key)
+        if entry is not None:
+            resolved[key] = {"canonical": entry.canonical, "entity_type": entry.entity_type}
+
+    async def lines():
+        unresolved = []
+        for index, (mention, key) in enumerate(zip(req.mentions, keys)):
+            entry = resolved.get(key)
+            if entry is None:
+                unresolved.append(mention)
+                entry = {"canonical": mention.strip().title(), "entity_type": None}
+            yield json.dumps({"index": index, "mention": mention, "resolved": key in resolved, **entry}) + "\n"
+        yield json.dumps({"unresolved": unresolved, "user_id": str(current_user.id)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,48 @@
+import asyncio
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from uuid import UUID
+from ..core.config import settings
+from ..core.deps import get_current_active_user
+from ..schemas.user import User
+from ..services.events import event_bus
+
+router = APIRouter()
+
+@router.get("/{session_id}")
+async def stream_events(
+    session_id: UUID,
+    request: Request,
+    last_event_id: Optional[int] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Server-sent fact_update, facts_recalled and message_processed events for a session (requires authentication)"""
+    subscriber, replay, gap = event_bus.subscribe(current_user.id, session_id, last_event_id)
+
+    async def stream():
+        try:
+            if gap:
+                # missed events are gone: tell the client to refetch /api/context
+                yield "event: resync\ndata: {}\n\n"
+            for event in replay:
+                yield event.encode()
+            while not await request.is_disconnected():
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), settings.event_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                for event in subscriber.drain():
+                    yield event.encode()
+                if subscriber.dropped:
+                    # too slow to keep up: end the stream, the client resumes via Last-Event-ID
+                    break
+        finally:
+            event_bus.unsubscribe(current_user.id, session_id, subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -9,11 +9,112 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = os.getenv("DATABASE_URL")
+    # Connection pool (ignored for in-memory SQLite)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout_seconds: float = 30.0
+    db_pool_pre_ping: bool = False  # a round trip per checkout; pool recycling already retires stale connections
+    db_pool_recycle_seconds: int = 1800  # -1 never recycles
+    db_statement_cache_size: int = 100  # asyncpg prepared statements per connection; 0 behind pgbouncer
+    # Group commit for chat message inserts
+    chat_write_window_ms: int = 5
+    chat_write_max_batch: int = 256
+    # Embedding vector size (text-embedding-ada-002); must match the chat_history.embedding column
+    embedding_dim: int = 1536
+    # Embedding service: "hashing" runs fully offline, "openai" calls the embeddings API
+    embedding_backend: str = os.getenv("EMBEDDING_BACKEND", "hashing")
+    embedding_model: str = "text-embedding-ada-002"
+    embedding_hash_seed: int = 0
+    embedding_batch_window_ms: int = 10
+    embedding_max_batch: int = 64
+    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    # Shared LLM client (services/llm.py)
+    llm_model: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    llm_timeout_seconds: float = 60.0
+    llm_max_concurrency: int = 8  # backend requests in flight, process-wide
+    llm_per_user_concurrency: int = 2
+    llm_batch_prompts: bool = False  # only for backends whose /completions accepts a list of prompts
+    llm_batch_window_ms: int = 20
+    llm_batch_max: int = 16
+    llm_batch_max_chars: int = 1000
+    # Message routing: local classifier, then batched fact extraction for statements only
+    classifier_min_confidence: float = 0.5  # below this a message is treated as a statement
+    extraction_backend: str = os.getenv("EXTRACTION_BACKEND", "none")  # "none" or "openai"
+    extraction_batch_window_ms: int = 50
+    extraction_max_batch: int = 16
+    extraction_cache_path: str = os.getenv("EXTRACTION_CACHE_PATH", "./data/extraction_cache.sqlite3")
+    extraction_cache_max_entries: int = 100000
+    # Context assembly
+    context_deadline_ms: int = 200
+    context_history_limit: int = 20
+    context_similar_k: int = 5
+    context_fact_limit: int = 20
+    # Recent messages kept in memory per session, under a global byte budget
+    session_buffer_size: int = 50
+    session_buffer_max_bytes: int = 64 * 1024 * 1024
+    # Chat history pages (keyset pagination)
+    history_page_size: int = 100
+    history_page_max: int = 1000
+    # Server-sent fact update events
+    event_history: int = 256  # events kept per session for Last-Event-ID resume
+    event_subscriber_buffer: int = 64
+    event_max_channels: int = 10000
+    event_heartbeat_seconds: float = 15.0
+    # Per-user ANN index over chat embeddings
+    vector_index_dir: str = os.getenv("VECTOR_INDEX_DIR", "./data/vector_index")
+    vector_index_min_train: int = 1024
+    vector_index_nprobe: int = 8
+    vector_index_max_bytes: int = 1024 * 1024 * 1024  # resident indexes, least recently used evicted first
+    
+    # Background message processing queue
+    queue_workers: int = 4
+    queue_max_depth: int = 10000
+    queue_max_attempts: int = 5
+    queue_retry_base_seconds: float = 2.0
+    queue_retry_max_seconds: float = 300.0
+    queue_visibility_timeout_seconds: float = 300.0
+    queue_poll_interval_seconds: float = 1.0
+    # Bulk transcript import
+    import_chunk_size: int = 1000  # messages per INSERT/COPY transaction and checkpoint
+    import_workers: int = 4  # chunks embedded concurrently ahead of the writer
+    import_queue_share: float = 0.5  # share of queue_max_depth an import may fill with extraction jobs
+    # Streaming export
+    export_batch_size: int = 1000  # rows per cursor fetch and per streamed block
+    export_gzip_level: int = 6
+    
+    # Entity mention detection
+    entity_matcher_users: int = 1000  # per-user pattern layers kept in memory
+    entity_matcher_delta_min: int = 64  # additions buffered before the main automaton is rebuilt
+    entity_matcher_refresh_seconds: float = 30.0  # how often a loaded layer looks for rows other processes added
+    entity_resolve_batch_max: int = 1000
+    
+    # Neo4j
+    neo4j_bolt_uri: str = os.getenv("NEO4J_BOLT_URI", "bolt://localhost:7687")
+    neo4j_user: str = os.getenv("NEO4J_USER", "neo4j")
+    neo4j_password: str = os.getenv("NEO4J_PASSWORD", "")
+    neo4j_fact_batch_size: int = 500
+    neo4j_schema_bootstrap: bool = True  # apply graph schema migrations at startup
+    neighbourhood_cache_size: int = 20000
+    neighbourhood_cache_max_bytes: int = 64 * 1024 * 1024
+    neighbourhood_max_edges: int = 500
+    # Fact decay (spec 5.3): effective weight halves every half-life without reinforcement
+    fact_half_life_days: float = 30.0  # <= 0 disables decay
+    fact_prune_threshold: float = 0.05
+    fact_compact_interval_seconds: float = 3600.0  # <= 0 disables the background compactor
+    fact_compact_min_age_seconds: float = 86400.0
+    fact_compact_batch_size: int = 1000
+    fact_marker_retention_seconds: float = 7 * 86400.0  # AppliedFacts markers; must outlast job redelivery
+    
+    # Authenticated user lookup cache
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: float = 60.0
     
     # JWT settings
     secret_key: str = os.getenv("SECRET_KEY")
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    token_cache_size: int = 10000
     
     # OAuth2 Google
     google_client_id: str = os.getenv("GOOGLE_CLIENT_ID", "")
@@ -2,6 +2,7 @@ from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.cache import user_cache
 from ..core.security import verify_token
 from ..db.database import get_session
 from ..db import crud
@@ -30,9 +31,17 @@ async def get_current_user(
     except ValueError:
         raise credentials_exception
     
-    user = await crud.get_user(db, user_id=user_uuid)
+    user = user_cache.get(user_uuid)
     if user is None:
-        raise credentials_exception
+        db_user = await crud.get_user(db, user_id=user_uuid)
+        if db_user is None:
+            raise credentials_exception
+        # cache an immutable snapshot rather than the session-bound ORM row
+        user = User.model_validate(db_user)
+        user_cache.set(user_uuid, user)
+        # end the read so its pooled connection is not held for the rest of the
+        # request (chat writes need a connection of their own from the same pool)
+        await db.rollback()
     return user
 
 async def get_current_active_user(
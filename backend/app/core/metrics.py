@@ -0,0 +1,115 @@
+"""In-process metrics: component counters and latency histograms.
+
+Components register a collector that returns a dict of current values.
+``snapshot()`` serves those dicts as JSON at ``/stats``. ``render()``
+serves them in Prometheus text format at ``/metrics``, as gauges, along
+with every ``Histogram``.
+
+Histograms are sharded per thread. ``observe`` only touches the calling
+thread's shard, so the hot path never takes a lock, and the event loop
+never contends with Neo4j worker threads. Shards are merged when the
+metrics are scraped.
+"""
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# name -> zero-argument callable returning a dict of current values
+_collectors: Dict[str, Callable[[], dict]] = {}
+_histograms: List["Histogram"] = []
+
+PREFIX = "relevantic"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def register(name: str, collector: Callable[[], dict]):
+    _collectors[name] = collector
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def snapshot() -> Dict[str, dict]:
+    return {name: collector() for name, collector in _collectors.items()}
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()  # only taken when a thread observes for the first time
+        _histograms.append(self)
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        series = shard.get(labels)
+        if series is None:
+            # one count per bucket, one for +Inf, then the running sum
+            series = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> Dict[tuple, list]:
+        merged: Dict[tuple, list] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for labels, series in list(shard.items()):
+                total = merged.setdefault(labels, [0] * len(series))
+                for i, value in enumerate(list(series)):
+                    total[i] += value
+        return merged
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.collect().items()):
+            base = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le}"}} {cumulative}')
+            braced = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{braced} {series[-1]}")
+            lines.append(f"{self.name}_count{braced} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _gauges(prefix: str, values: dict, lines: List[str]):
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            _gauges(name, value, lines)
+        elif isinstance(value, (bool, int, float)):
+            lines.append(f"{name} {float(value)}")
+
+
+def render() -> str:
+    """All histograms plus every numeric collector value, in Prometheus text format 0.0.4."""
+    lines: List[str] = []
+    for histogram in _histograms:
+        lines.extend(histogram.render())
+    for component, values in snapshot().items():
+        _gauges(f"{PREFIX}_{component}", values, lines)
+    return "\n".join(lines) + "\n"
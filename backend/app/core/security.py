@@ -1,7 +1,9 @@
+import hashlib
 from datetime import datetime, timedelta
 from typing import Optional, Union, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from .cache import token_cache
 from .config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -20,6 +22,11 @@ def create_access_token(
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[str]:
+    # only successful verifications are cached, and each only until its own exp
+    key = hashlib.sha256(token.encode()).digest()
+    user_id = token_cache.get(key)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(
             token, settings.secret_key, algorithms=[settings.algorithm]
@@ -27,6 +34,8 @@ def verify_token(token: str) -> Optional[str]:
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
+        if payload.get("exp") is not None:
+            token_cache.set(key, user_id, expires_at=float(payload["exp"]))
         return user_id
     except JWTError:
         return None
@@ -1,25 +1,135 @@
-from .database import get_session
-from .models import ChatHistory, EntityDictionary, User
+import asyncio
+from .database import AsyncSessionLocal, get_session
+from .models import ChatHistory, EntityDictionary, MessageJob, User
+from .writer import chat_writer, fill_defaults
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from uuid import UUID
-from typing import Optional
+from typing import List, Optional
+from ..core.cache import user_cache
+from ..core.config import settings
 from ..schemas.user import UserCreate, UserUpdate
+from ..services import neo4j_client, vector_index
+from ..services.classifier import QUESTION, STATEMENT, message_classifier
+from ..services.entity_matcher import entity_matcher
+from ..services.events import event_bus, publish_recalled
+from ..services.extraction import extraction_service
+from ..services.session_buffer import BufferedMessage, session_buffer
 
-async def create_chat_message(session_id, user_id, message_text, role="user"):
-    async for db in get_session():
-        chat = ChatHistory(session_id=session_id, user_id=user_id, message_text=message_text, role=role)
-        db.add(chat)
-        await db.commit()
-        await db.refresh(chat)
-        return chat
+async def create_chat_message(session_id, user_id, message_text, role="user", embedding=None, enqueue=False):
+    """Store a message; with ``enqueue``, its background processing job commits in the same transaction."""
+    # rows from concurrent requests are group-committed as one multi-row INSERT
+    row = fill_defaults(ChatHistory, dict(
+        session_id=session_id, user_id=user_id, message_text=message_text, role=role, embedding=embedding
+    ))
+    related = []
+    if enqueue:
+        related.append((MessageJob, dict(
+            message_id=row["id"], session_id=session_id, user_id=user_id, message_text=message_text, role=role
+        )))
+    row = await chat_writer.submit(row, related)
+    if embedding is not None:
+        vector_index.add(user_id, row["id"], session_id, embedding, row["timestamp"])
+    session_buffer.append(
+        user_id, session_id, BufferedMessage(row["id"], role, message_text, row["timestamp"])
+    )
+    return ChatHistory(**row)
+
+async def process_message_async(session_id, user_id, message_text, role, message_id=None):
+    """Classify locally, then route: statements to the extractor, questions to the graph.
 
-async def process_message_async(session_id, user_id, message_text, role):
-    # stub: pretend to extract entities and insert into graph
-    # In real implementation call LLM or spaCy
+    Chit-chat stops here. Only the user's own messages are routed; assistant
+    replies restate retrieved facts and must not reinforce them. With
+    ``message_id``, re-running a message does not reinforce its facts twice.
+    """
+    kind = message_classifier.classify(message_text).label
+    facts = 0
+    if role == "user" and kind == STATEMENT:
+        triples = await extraction_service.extract(message_text, user_id)
+        if triples:
+            await asyncio.to_thread(
+                neo4j_client.insert_facts, triples, user_id, session_id, message_id=message_id
+            )
+        facts = len(triples)
+    elif role == "user" and kind == QUESTION:
+        # stream what the graph knows about the mentioned entities; this also warms the
+        # neighbourhood cache for the context request that usually follows
+        async with AsyncSessionLocal() as db:
+            matches = await entity_matcher.find(db, user_id, message_text)
+        for name in dict.fromkeys(match.canonical for match in matches):
+            neighbourhood = await asyncio.to_thread(
+                neo4j_client.get_entity_neighbourhood, user_id, name, settings.context_fact_limit
+            )
+            publish_recalled(user_id, session_id, name, neighbourhood)
+            facts += len(neighbourhood["outgoing"]) + len(neighbourhood["incoming"])
+    event_bus.publish(
+        user_id, session_id, "message_processed",
+        {"type": "message_processed", "role": role, "kind": kind, "facts": facts},
+    )
     return True
 
+# Context retrieval
+async def get_recent_messages(db: AsyncSession, user_id: UUID, session_id: UUID, limit: int = 20) -> List[ChatHistory]:
+    """Most recent messages of a session, oldest first."""
+    result = await db.execute(
+        select(ChatHistory)
+        .where(ChatHistory.user_id == user_id, ChatHistory.session_id == session_id)
+        .order_by(ChatHistory.timestamp.desc())
+        .limit(limit)
+    )
+    return list(reversed(result.scalars().all()))
+
+def history_page_query(user_id: UUID, session_id: UUID, limit: int, before: Optional[tuple] = None):
+    """Newest-first page of a session, seeking past the (timestamp, id) of the previous page's last row.
+
+    Served straight from ix_chat_history_user_session_timestamp, so page N
+    costs the same as page 1.
+    """
+    query = select(ChatHistory).where(ChatHistory.user_id == user_id, ChatHistory.session_id == session_id)
+    if before is not None:
+        query = query.where(sa.tuple_(ChatHistory.timestamp, ChatHistory.id) < tuple(before))
+    return query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(limit)
+
+async def get_recent_messages_buffered(db: AsyncSession, user_id: UUID, session_id: UUID, limit: int = 20):
+    """Like get_recent_messages, but served from the session's ring buffer when it can answer."""
+    messages = session_buffer.get(user_id, session_id, limit)
+    if messages is not None:
+        return messages
+    if limit > session_buffer.capacity:
+        return await get_recent_messages(db, user_id, session_id, limit)
+    rows = await get_recent_messages(db, user_id, session_id, session_buffer.capacity)
+    session_buffer.warm(user_id, session_id, rows)
+    return rows[-limit:] if limit else []
+
+async def get_latest_embedding(db: AsyncSession, user_id: UUID, session_id: UUID):
+    result = await db.execute(
+        select(ChatHistory.id, ChatHistory.embedding)
+        .where(
+            ChatHistory.user_id == user_id,
+            ChatHistory.session_id == session_id,
+            ChatHistory.embedding.isnot(None),
+        )
+        .order_by(ChatHistory.timestamp.desc())
+        .limit(1)
+    )
+    return result.first()
+
+async def get_messages_by_ids(db: AsyncSession, user_id: UUID, ids: List[UUID]) -> List[ChatHistory]:
+    result = await db.execute(
+        select(ChatHistory).where(ChatHistory.user_id == user_id, ChatHistory.id.in_(ids))
+    )
+    return result.scalars().all()
+
+# Entity dictionary operations
+async def create_entity(db: AsyncSession, name: str, canonical_form: Optional[str] = None,
+                        entity_type: Optional[str] = None, user_id: Optional[UUID] = None) -> EntityDictionary:
+    db_entity = EntityDictionary(name=name, canonical_form=canonical_form, entity_type=entity_type, user_id=user_id)
+    db.add(db_entity)
+    await db.commit()
+    entity_matcher.add(name, canonical_form, entity_type, user_id)
+    return db_entity
+
 # User CRUD operations
 async def get_user(db: AsyncSession, user_id: UUID) -> Optional[User]:
     result = await db.execute(select(User).where(User.id == user_id))
@@ -56,4 +166,5 @@ async def update_user(db: AsyncSession, user_id: UUID, user_update: UserUpdate)
             setattr(db_user, field, value)
         await db.commit()
         await db.refresh(db_user)
+    user_cache.pop(user_id)
     return db_user
@@ -1,9 +1,151 @@
 import os
+import time
+from collections import deque
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from ..core import metrics
 from ..core.config import settings
+from .types import register_vector_codec
+
+
+wait_seconds = metrics.Histogram("db_pool_wait_seconds", "Time spent waiting to check out a pooled connection", ())
+query_seconds = metrics.Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type", ("statement",)
+)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = PoolTelemetry(self)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            self.telemetry.failed_checkouts += 1
+            raise
+        finally:
+            self.telemetry.observe_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        pool.telemetry.pool = pool
+        return pool
+
+
+class PoolTelemetry:
+    def __init__(self, pool):
+        self.pool = pool
+        self._waits = deque(maxlen=2048)  # checkout wait, seconds; checkouts all happen on the event loop
+        self.checkouts = 0
+        self.failed_checkouts = 0
+        self.waited = 0  # checkouts that had to wait for a free connection
+        self.connects = 0
+        self.invalidations = 0
+        self.peak_in_use = 0
+        self.peak_overflow = 0
+
+    def observe_wait(self, seconds: float):
+        self._waits.append(seconds)
+        wait_seconds.observe(seconds)
+        if seconds > 0.001:
+            self.waited += 1
+
+    def checked_out(self):
+        self.checkouts += 1
+        self.peak_in_use = max(self.peak_in_use, self.pool.checkedout())
+        self.peak_overflow = max(self.peak_overflow, self.pool.overflow())
+
+    def stats(self) -> dict:
+        waits = list(self._waits)
+        return {
+            "size": self.pool.size(),
+            "max_overflow": self.pool._max_overflow,
+            "in_use": self.pool.checkedout(),
+            "idle": self.pool.checkedin(),
+            "overflow": max(self.pool.overflow(), 0),
+            "peak_in_use": self.peak_in_use,
+            "peak_overflow": max(self.peak_overflow, 0),
+            "checkouts": self.checkouts,
+            "waited": self.waited,
+            "failed_checkouts": self.failed_checkouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "wait_p50_seconds": metrics.percentile(waits, 0.5),
+            "wait_p99_seconds": metrics.percentile(waits, 0.99),
+            "wait_max_seconds": max(waits, default=0.0),
+        }
+
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return {}  # single shared connection; pool sizing does not apply
+    options = dict(
+        poolclass=InstrumentedPool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle_seconds,
+    )
+    if "+asyncpg" in url:
+        options["connect_args"] = {
+            "statement_cache_size": settings.db_statement_cache_size,
+            "prepared_statement_cache_size": settings.db_statement_cache_size,
+        }
+    return options
+
+
+engine = create_async_engine(settings.database_url, echo=False, **_engine_options(settings.database_url))
+
+if engine.dialect.driver == "asyncpg":
+    # decode pgvector columns from the binary protocol instead of parsing text
+    @event.listens_for(engine.sync_engine, "connect")
+    def _register_vector(dbapi_connection, connection_record):
+        dbapi_connection.run_async(register_vector_codec)
+
+if isinstance(engine.sync_engine.pool, InstrumentedPool):
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        engine.sync_engine.pool.telemetry.checked_out()
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        engine.sync_engine.pool.telemetry.connects += 1
+
+    @event.listens_for(engine.sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        engine.sync_engine.pool.telemetry.invalidations += 1
+
+    metrics.register("db_pool", lambda: engine.sync_engine.pool.telemetry.stats())
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    if keyword not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+        keyword = "OTHER"
+    query_seconds.observe(time.perf_counter() - started, keyword)
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _query_failed(exception_context):
+    # only statements that reached before_cursor_execute have an execution context
+    if exception_context.connection is not None and exception_context.execution_context is not None:
+        started = exception_context.connection.info.get("query_started")
+        if started:
+            started.pop()
 
-engine = create_async_engine(settings.database_url, echo=False)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def get_session():
@@ -11,9 +11,13 @@ from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import declarative_base, relationship
 import datetime
 import uuid
+from .types import Vector
 
 Base = declarative_base()
 
+# width of chat_history.embedding as created by migration 8a50710a82bc; settings.embedding_dim must match
+EMBEDDING_DIM = 1536
+
 class User(Base):
     __tablename__ = "users"
 
@@ -34,13 +38,15 @@ class User(Base):
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    # per-session history in time order; id breaks timestamp ties for keyset pagination
+    __table_args__ = (sa.Index("ix_chat_history_user_session_timestamp", "user_id", "session_id", "timestamp", "id"),)
 
     id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = sa.Column(UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False)
     session_id = sa.Column(UUID(as_uuid=True), nullable=False, index=True)
     message_text = sa.Column(sa.Text, nullable=False)
     role = sa.Column(sa.String(16), nullable=False)
-    embedding = sa.Column(sa.Text)  # store as JSON or base64 for MVP
+    embedding = sa.Column(Vector(EMBEDDING_DIM))  # pgvector on Postgres, float32 BLOB on SQLite
     source_metadata = sa.Column(sa.Text)  # Use Text for SQLite compatibility, JSON string
     timestamp = sa.Column(sa.DateTime, default=datetime.datetime.utcnow)
 
@@ -58,3 +64,43 @@ class EntityDictionary(Base):
 
     # Relationships
     user = relationship("User", back_populates="entities")
+
+# case-insensitive lookups from /api/entity/resolve/batch
+sa.Index("ix_entity_dictionary_lower_name", sa.func.lower(EntityDictionary.name))
+sa.Index("ix_entity_dictionary_lower_canonical_form", sa.func.lower(EntityDictionary.canonical_form))
+
+class MessageJob(Base):
+    """Durable work item for background message processing (see services/work_queue)."""
+    __tablename__ = "message_jobs"
+    __table_args__ = (sa.Index("ix_message_jobs_status_available_at", "status", "available_at"),)
+
+    id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    message_id = sa.Column(UUID(as_uuid=True), sa.ForeignKey("chat_history.id"), nullable=False, unique=True)  # idempotency key
+    user_id = sa.Column(UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False)
+    session_id = sa.Column(UUID(as_uuid=True), nullable=False)
+    message_text = sa.Column(sa.Text, nullable=False)
+    role = sa.Column(sa.String(16), nullable=False)
+    status = sa.Column(sa.String(16), nullable=False, default="pending")  # pending | running | done | failed
+    attempts = sa.Column(sa.Integer, nullable=False, default=0)
+    available_at = sa.Column(sa.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    locked_until = sa.Column(sa.DateTime)
+    last_error = sa.Column(sa.Text)
+    created_at = sa.Column(sa.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    finished_at = sa.Column(sa.DateTime)
+
+class TranscriptImport(Base):
+    """Resume checkpoint of a bulk transcript import (see services/transcript_import)."""
+    __tablename__ = "transcript_imports"
+    __table_args__ = (sa.UniqueConstraint("user_id", "key", name="uq_transcript_imports_user_key"),)
+
+    id = sa.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = sa.Column(UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False)
+    key = sa.Column(sa.String(512), nullable=False)  # caller-chosen name of the transcript, e.g. its path
+    status = sa.Column(sa.String(16), nullable=False, default="running")  # running | done
+    byte_offset = sa.Column(sa.BigInteger, nullable=False, default=0)  # end of the last committed line
+    lines = sa.Column(sa.Integer, nullable=False, default=0)
+    messages = sa.Column(sa.Integer, nullable=False, default=0)
+    jobs = sa.Column(sa.Integer, nullable=False, default=0)
+    skipped = sa.Column(sa.Integer, nullable=False, default=0)
+    created_at = sa.Column(sa.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    updated_at = sa.Column(sa.DateTime, nullable=False, default=datetime.datetime.utcnow)
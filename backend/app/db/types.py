@@ -0,0 +1,85 @@
+import struct
+
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.types import UserDefinedType
+
+# pgvector's binary wire format: uint16 dim, uint16 unused, then big-endian float32s
+_PG_HEADER = struct.Struct(">HH")
+
+
+class PGVector(UserDefinedType):
+    """Postgres ``vector(n)`` column; values are encoded by the asyncpg codec below."""
+
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def get_col_spec(self, **kw):
+        return "VECTOR(%d)" % self.dim
+
+
+class Vector(sa.types.TypeDecorator):
+    """Fixed-size float32 embedding.
+
+    Stored as pgvector ``vector(n)`` on Postgres and as a packed little-endian
+    float32 BLOB elsewhere (SQLite). Values are returned as read-only NumPy
+    arrays that view the driver's buffer directly, without a copy.
+    """
+
+    impl = sa.LargeBinary
+    cache_ok = True
+
+    def __init__(self, dim: int):
+        super().__init__()
+        self.dim = dim
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(PGVector(self.dim))
+        return dialect.type_descriptor(sa.LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = np.asarray(value, dtype="<f4")
+        if value.shape != (self.dim,):
+            raise ValueError(f"expected a vector of {self.dim} dimensions, got shape {value.shape}")
+        if dialect.name == "postgresql":
+            return value
+        return value.tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return decode_blob(value)
+
+
+def decode_blob(value) -> np.ndarray:
+    return np.frombuffer(value, dtype="<f4")
+
+
+def encode_pg_binary(value) -> bytes:
+    value = np.asarray(value, dtype=">f4")
+    return _PG_HEADER.pack(value.shape[0], 0) + value.tobytes()
+
+
+def decode_pg_binary(value) -> np.ndarray:
+    dim, _ = _PG_HEADER.unpack_from(value)
+    return np.frombuffer(value, dtype=">f4", count=dim, offset=_PG_HEADER.size)
+
+
+async def register_vector_codec(conn):
+    """Register a binary ``vector`` codec on an asyncpg connection."""
+    try:
+        await conn.set_type_codec(
+            "vector",
+            schema="public",
+            encoder=encode_pg_binary,
+            decoder=decode_pg_binary,
+            format="binary",
+        )
+    except ValueError:
+        # extension not created yet (migrations not run); fall back to text I/O
+        pass
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from typing import Any, List, Optional, Sequence, Tuple
+
+import sqlalchemy as sa
+
+from ..core import metrics
+from ..core.config import settings
+from ..services.batching import MicroBatcher
+from .database import AsyncSessionLocal
+from .models import ChatHistory
+
+
+def fill_defaults(model, row: dict) -> dict:
+    """A copy of ``row`` with the model's client-side column defaults (ids, timestamps) filled in."""
+    row = dict(row)
+    for column in model.__table__.columns:
+        default = column.default
+        if column.key not in row and default is not None and not default.is_sequence:
+            row[column.key] = default.arg(None) if default.is_callable else default.arg
+    return row
+
+
+class GroupCommitWriter(MicroBatcher):
+    """Collects rows from concurrent callers and inserts them in one transaction.
+
+    The first row to arrive opens a short collection window; every row
+    submitted before it closes (up to ``max_batch``) is written with a single
+    multi-row INSERT and a single COMMIT, one batch at a time. If that fails,
+    the rows are retried one transaction each, so only the caller whose row
+    is bad gets the error. Column defaults (primary keys, timestamps) are
+    generated client-side so no RETURNING or refresh round trip is needed,
+    which keeps the same code path working on asyncpg and aiosqlite.
+    """
+
+    def __init__(self, model, window: float = 0.005, max_batch: int = 256, session_factory=None):
+        super().__init__(window, max_batch, concurrency=1)
+        self.model = model
+        self.session_factory = session_factory or AsyncSessionLocal
+
+    async def submit(self, row: dict, related: Sequence[Tuple[Any, dict]] = ()) -> dict:
+        """Queue ``row`` for the next group commit and wait until it is durable.
+
+        ``related`` holds (model, row) pairs that must commit with it, such as
+        the processing job of a new message; they are inserted after the
+        batch's own rows, in the same transaction. Returns the row with its
+        client-side column defaults filled in.
+        """
+        row = fill_defaults(self.model, row)
+        related = [(model, fill_defaults(model, values)) for model, values in related]
+        await super().submit((row, related))
+        return row
+
+    async def _insert(self, items: Sequence[Tuple[dict, list]]):
+        related = defaultdict(list)
+        for _, pairs in items:
+            for model, values in pairs:
+                related[model].append(values)
+        async with self.session_factory() as db:
+            await db.execute(sa.insert(self.model).values([row for row, _ in items]))
+            for model, rows in related.items():
+                await db.execute(sa.insert(model).values(rows))
+            await db.commit()
+
+    async def _call(self, items: Sequence[Tuple[dict, list]]) -> List[Optional[Exception]]:
+        try:
+            await self._insert(items)
+            return [None] * len(items)
+        except Exception:
+            if len(items) == 1:
+                raise
+        # one bad row (e.g. a duplicate key) must not fail everyone else's
+        results = []
+        for item in items:
+            try:
+                await self._insert([item])
+                results.append(None)
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+
+chat_writer = GroupCommitWriter(
+    ChatHistory,
+    window=settings.chat_write_window_ms / 1000,
+    max_batch=settings.chat_write_max_batch,
+)
+metrics.register("chat_writer", chat_writer.stats)
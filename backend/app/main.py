@@ -1,10 +1,105 @@
+import asyncio
+import contextlib
+import time
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from .api import router as api_router
+from .core import metrics
 from .core.config import settings
+from .db.models import EMBEDDING_DIM
+from .db.writer import chat_writer
+from .services import graph_schema, vector_index
+from .services.classifier import message_classifier
+from .services.embeddings import embedding_service
+from .services.extraction import extraction_service
+from .services.extraction_cache import extraction_cache
+from .services.fact_decay import fact_compactor
+from .services.llm import llm_client
+from .services.work_queue import message_queue
 
-app = FastAPI(title="Relevantic Recall")
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    if settings.embedding_dim != EMBEDDING_DIM:
+        raise RuntimeError(
+            f"EMBEDDING_DIM={settings.embedding_dim} does not match the {EMBEDDING_DIM}-dimension "
+            "chat_history.embedding column; changing it needs a schema migration"
+        )
+    if settings.neo4j_schema_bootstrap:
+        await asyncio.to_thread(graph_schema.bootstrap)
+    # train before the queue starts so the first message does not stall the event loop
+    await asyncio.to_thread(message_classifier.ensure_trained)
+    await message_queue.start()
+    await fact_compactor.start()
+    try:
+        yield
+    finally:
+        # flush pending writes
+        await fact_compactor.stop()
+        await message_queue.stop()
+        await chat_writer.close()
+        await embedding_service.close()
+        await extraction_service.close()
+        extraction_cache.close()
+        await llm_client.close()
+        await vector_index.close()
+
+app = FastAPI(title="Relevantic Recall", lifespan=lifespan)
+
+request_seconds = metrics.Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status")
+)
+
+def _route_template(scope) -> str:
+    """The matched route's path template, e.g. ``/api/chat/history/{session_id}``, for bounded label cardinality."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # FastAPI resolves included routers lazily: the route only knows the path it was declared
+    # with, and the template with the router prefixes is on the effective route context
+    effective = (scope.get("fastapi") or {}).get("effective_route_context")
+    return getattr(effective, "path_format", None) or route.path
+
+class RequestTimingMiddleware:
+    """Pure ASGI timing middleware: records each request once it has been fully sent.
+
+    Server-sent event streams are recorded when their headers go out, so
+    long-lived subscriptions do not swamp the histogram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        state = {"status": 500, "recorded": False}
+
+        def record():
+            if not state["recorded"]:
+                state["recorded"] = True
+                request_seconds.observe(
+                    time.perf_counter() - started, scope["method"], _route_template(scope), str(state["status"])
+                )
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                headers = dict(message.get("headers") or [])
+                if headers.get(b"content-type", b"").startswith(b"text/event-stream"):
+                    record()
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            record()
+
+app.add_middleware(RequestTimingMiddleware)
 
 # Add SessionMiddleware for OAuth state management
 app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
@@ -22,4 +117,14 @@ app.include_router(api_router, prefix="/api")
 
 @app.get("/healthz")
 async def healthz():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/stats")
+async def stats():
+    """In-process component counters"""
+    return metrics.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Latency histograms and component counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""Micro-batching of concurrent calls into one backend request.
+
+Callers submit one item at a time. Their items are queued, and the first
+one to arrive opens a short collection window. Everything queued before
+the window closes (up to ``max_batch``) goes to ``_call`` as a single
+batch, and each caller gets back its own row of the result. A result
+that is an exception fails only its own caller. At most ``concurrency``
+batches are in flight. While they are, items queue up and go out as the
+next, larger batch. ``db.writer.GroupCommitWriter`` is the same machinery
+applied to INSERTs.
+"""
+import abc
+import asyncio
+import time
+from typing import Any, List, Optional, Sequence, Set, Tuple
+
+_STOP = object()
+
+
+class MicroBatcher(abc.ABC):
+    """Coalesces concurrent ``submit`` calls; subclasses implement ``_call``."""
+
+    def __init__(self, window: float = 0.01, max_batch: int = 64, concurrency: int = 4):
+        self.window = window
+        self.max_batch = max_batch
+        self.concurrency = concurrency
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._flushing: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.batches = 0
+        self.failures = 0
+        self.backend_seconds = 0.0
+
+    @abc.abstractmethod
+    async def _call(self, items: Sequence[Any]) -> Sequence[Any]:
+        """Process one batch; must return one result per item, in order.
+
+        Raising fails the whole batch; returning an exception as an item's
+        result fails only that item.
+        """
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        """Process one item; batched with whatever else arrives in the same window."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        while len(batch) < self.max_batch and batch[-1] is not _STOP and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _flush(self, batch: List[Tuple[Any, asyncio.Future]]):
+        started = time.perf_counter()
+        try:
+            results = await self._call([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"backend returned {len(results)} results for {len(batch)} items")
+        except Exception as exc:
+            self.failures += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
+            self.batches += 1
+            self.requests += len(batch)
+            self.backend_seconds += time.perf_counter() - started
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                # flush concurrently so a slow backend call does not stall collection,
+                # but wait for a free slot so a stalled backend cannot pile up tasks
+                await self._slots.acquire()
+                task = asyncio.create_task(self._flush(batch))
+                self._flushing.add(task)
+                task.add_done_callback(self._flushing.discard)
+            if stop:
+                return
+
+    async def close(self):
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "in_flight": len(self._flushing),
+            "batches": self.batches,
+            "mean_batch": self.requests / self.batches if self.batches else None,
+            "failures": self.failures,
+            "backend_seconds": self.backend_seconds,
+        }
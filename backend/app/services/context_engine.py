@@ -0,0 +1,76 @@
+"""Concurrent context assembly under a single deadline.
+
+Each context source (recent history, vector search, graph facts) runs as
+its own task, and all of them start at once. Whatever has finished when
+the deadline expires is returned. Sources that are still running are
+cancelled and reported as ``timeout``, and sources that raised are
+reported as ``error``. A slow graph query therefore degrades the response
+to partial instead of stalling it.
+
+Cancelling a source only cancels the coroutine. Sources that run work
+in a thread must bound it themselves (the graph query carries a
+transaction timeout), and work that should outlive one request, like a
+vector index build, is shielded so the next request can find it done.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SourceResult:
+    status: str  # "ok" | "timeout" | "error"
+    elapsed_ms: float
+    value: Any = None
+
+
+@dataclass
+class AssembledContext:
+    sources: Dict[str, SourceResult] = field(default_factory=dict)
+
+    @property
+    def partial(self) -> bool:
+        return any(result.status != "ok" for result in self.sources.values())
+
+    def values(self) -> Dict[str, Any]:
+        return {name: result.value for name, result in self.sources.items() if result.status == "ok"}
+
+    def server_timing(self) -> str:
+        """Per-source timings in ``Server-Timing`` header syntax."""
+        return ", ".join(
+            f'{name};dur={result.elapsed_ms:.1f};desc="{result.status}"'
+            for name, result in self.sources.items()
+        )
+
+
+async def assemble(sources: Dict[str, Callable[[], Awaitable[Any]]], deadline: float) -> AssembledContext:
+    """Run every source concurrently and collect what finishes within ``deadline`` seconds."""
+    started = time.perf_counter()
+    finished_at: Dict[str, float] = {}
+
+    async def timed(name, source):
+        try:
+            return await source()
+        finally:
+            finished_at[name] = time.perf_counter()
+
+    tasks = {name: asyncio.create_task(timed(name, source)) for name, source in sources.items()}
+    await asyncio.wait(tasks.values(), timeout=deadline)
+
+    context = AssembledContext()
+    for name, task in tasks.items():
+        if not task.done():
+            task.cancel()
+            context.sources[name] = SourceResult("timeout", (time.perf_counter() - started) * 1000)
+            continue
+        elapsed = (finished_at.get(name, time.perf_counter()) - started) * 1000
+        if task.exception() is not None:
+            logger.warning("context source %s failed: %r", name, task.exception())
+            context.sources[name] = SourceResult("error", elapsed)
+        else:
+            context.sources[name] = SourceResult("ok", elapsed, task.result())
+    return context
@@ -0,0 +1,129 @@
+"""Micro-batching embedding service with pluggable backends.
+
+Callers ask for one text at a time with ``embed(text)``. Concurrent calls
+are coalesced by ``batching.MicroBatcher``, so each batch goes to the
+backend as a single request.
+
+Backends are looked up by name in ``BACKENDS``:
+
+- ``hashing``: a deterministic local feature-hashing embedder. It needs no
+  network or GPU, so the whole pipeline can run and be benchmarked offline.
+  Similar texts get similar vectors, but the vectors carry no semantics
+  beyond shared words and character trigrams.
+- ``openai``: the OpenAI embeddings API (``text-embedding-ada-002`` by
+  default), with each batch sent as a single request.
+"""
+import asyncio
+import hashlib
+import re
+from typing import Callable, Dict, List, Sequence
+
+import httpx
+import numpy as np
+
+from ..core import metrics
+from ..core.config import settings
+from .batching import MicroBatcher
+
+_WORD = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """Signed feature hashing of word unigrams, word bigrams and character trigrams."""
+
+    def __init__(self, dim: int, seed: int = 0):
+        self.dim = dim
+        self.key = seed.to_bytes(8, "little")
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed_sync(self, texts: Sequence[str]) -> np.ndarray:
+        rows, hashes = [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode(), digest_size=8, key=self.key).digest()
+                hashes.append(int.from_bytes(digest, "little"))
+                rows.append(row)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hashes:
+            hashes = np.array(hashes, dtype=np.uint64)
+            columns = (hashes % np.uint64(self.dim)).astype(np.intp)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors, (np.array(rows, dtype=np.intp), columns), signs)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        return await asyncio.to_thread(self.embed_sync, texts)
+
+
+class OpenAIEmbedder:
+    """Batched calls to an OpenAI-compatible ``/embeddings`` endpoint."""
+
+    def __init__(self, dim: int, api_key: str, model: str, base_url: str, timeout: float = 30.0):
+        self.dim = dim
+        self.model = model
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        response = await self.client.post("/embeddings", json={"model": self.model, "input": list(texts)})
+        if response.is_error:
+            raise RuntimeError(f"embedding request failed ({response.status_code}): {response.text[:200]}")
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        return np.asarray([item["embedding"] for item in data], dtype=np.float32)
+
+
+BACKENDS: Dict[str, Callable[[], object]] = {
+    "hashing": lambda: HashingEmbedder(settings.embedding_dim, settings.embedding_hash_seed),
+    "openai": lambda: OpenAIEmbedder(
+        settings.embedding_dim, settings.openai_api_key, settings.embedding_model, settings.openai_base_url
+    ),
+}
+
+
+class EmbeddingService(MicroBatcher):
+    """Coalesces concurrent ``embed`` calls into backend batches."""
+
+    def __init__(self, backend=None, window: float = 0.01, max_batch: int = 64):
+        super().__init__(window, max_batch)
+        self._backend = backend
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = BACKENDS[settings.embedding_backend]()
+        return self._backend
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed one text; batched with whatever else arrives in the same window."""
+        return await self.submit(text)
+
+    async def embed_many(self, texts: Sequence[str]) -> List[np.ndarray]:
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    async def _call(self, texts: Sequence[str]) -> np.ndarray:
+        return await self.backend.embed(texts)
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.embedding_backend if self._backend is None else type(self._backend).__name__,
+            **super().stats(),
+        }
+
+
+embedding_service = EmbeddingService(
+    window=settings.embedding_batch_window_ms / 1000,
+    max_batch=settings.embedding_max_batch,
+)
+metrics.register("embeddings", embedding_service.stats)
@@ -0,0 +1,254 @@
+"""Multi-pattern entity mention detection over the EntityDictionary.
+
+Every ``EntityDictionary.name`` and ``canonical_form`` is compiled into an
+Aho-Corasick automaton, so all known entities in a message are found in a
+single left-to-right pass, however many patterns there are. Matching is
+case-insensitive and only accepts whole words.
+
+Patterns come in two layers: a global one (rows with no ``user_id``) and
+one per user. Each layer is loaded from the database on first use. New
+rows are added incrementally: they go into small delta automata that are
+searched alongside the main one. Like the digits of a binary counter,
+each delta is at least twice the size of the next newer one. An addition
+only rebuilds the deltas it merges with, so it costs O(log d) amortised
+for d pending additions. The deltas are folded into the main automaton
+once they reach a fraction of its size.
+
+Rows stored by other processes do not pass through ``add``. Every
+``entity_matcher_refresh_seconds``, a loaded layer compares its row count
+with the table's and reloads when they differ.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core import metrics
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..db.models import EntityDictionary
+
+
+@dataclass(frozen=True)
+class Entry:
+    canonical: str
+    entity_type: Optional[str]
+
+
+@dataclass(frozen=True)
+class Match:
+    start: int
+    end: int
+    mention: str
+    canonical: str
+    entity_type: Optional[str]
+    scope: str  # "user" or "global"
+
+
+def fold(text: str) -> str:
+    """Lowercase without changing string length, so offsets map back to the input."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class AhoCorasick:
+    """Immutable Aho-Corasick automaton over folded patterns."""
+
+    def __init__(self, patterns: Dict[str, Entry]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[Tuple[int, ...]] = [()]
+        self.entries: List[Tuple[int, Entry]] = []
+        for pattern, entry in patterns.items():
+            self._insert(pattern, entry)
+        self._link()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _insert(self, pattern: str, entry: Entry):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            node = nxt
+        self.out[node] = (len(self.entries),)
+        self.entries.append((len(pattern), entry))
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(ch, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def scan(self, folded: str):
+        """Yield (start, end, entry) for every pattern occurrence in ``folded``."""
+        goto, fail, out, entries = self.goto, self.fail, self.out, self.entries
+        node = 0
+        for i, ch in enumerate(folded):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pid in out[node]:
+                length, entry = entries[pid]
+                yield i + 1 - length, i + 1, entry
+
+
+class PatternLayer:
+    """A main automaton plus small deltas absorbing incremental additions."""
+
+    def __init__(self, patterns: Optional[Dict[str, Entry]] = None, rows: int = 0):
+        self.patterns: Dict[str, Entry] = dict(patterns or {})
+        self.main = AhoCorasick(self.patterns)
+        self.deltas: List[AhoCorasick] = []  # oldest and largest first
+        self.delta_patterns: List[Dict[str, Entry]] = []
+        self.rows = rows  # dictionary rows behind this layer, compared against the table
+        self.checked_at = time.monotonic()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(patterns) for patterns in self.delta_patterns)
+
+    def add(self, pattern: str, entry: Entry):
+        pattern = fold(pattern.strip())
+        if not pattern or self.patterns.get(pattern) == entry:
+            return
+        self.patterns[pattern] = entry
+        if self.pending >= max(settings.entity_matcher_delta_min, len(self.main) // 8):
+            self.main = AhoCorasick(self.patterns)
+            self.deltas, self.delta_patterns = [], []
+            return
+        merged = {pattern: entry}
+        # merge with every newer delta that is no larger, so sizes stay powers of two apart
+        while self.delta_patterns and len(self.delta_patterns[-1]) <= len(merged):
+            self.deltas.pop()
+            merged = {**self.delta_patterns.pop(), **merged}
+        self.delta_patterns.append(merged)
+        self.deltas.append(AhoCorasick(merged))
+
+    def scan(self, folded: str):
+        # newest first: a pattern re-added with a new canonical form shadows its older entries
+        seen = set()
+        for automaton in (*reversed(self.deltas), self.main):
+            for start, end, entry in automaton.scan(folded):
+                if (start, end) not in seen:
+                    seen.add((start, end))
+                    yield start, end, entry
+
+
+def _patterns(rows) -> Dict[str, Entry]:
+    patterns = {}
+    for name, canonical_form, entity_type in rows:
+        entry = Entry(canonical_form or name, entity_type)
+        for pattern in (name, canonical_form):
+            if pattern and pattern.strip():
+                patterns[fold(pattern.strip())] = entry
+    return patterns
+
+
+def _is_word_boundary(text: str, start: int, end: int) -> bool:
+    return (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum())
+
+
+def _owned_by(user_id: Optional[UUID]):
+    if user_id is None:
+        return EntityDictionary.user_id.is_(None)
+    return EntityDictionary.user_id == user_id
+
+
+class EntityMatcher:
+    def __init__(self):
+        self.global_layer: Optional[PatternLayer] = None
+        self.user_layers = TTLCache(maxsize=settings.entity_matcher_users)
+        self.reloads = 0
+
+    async def _load(self, db: AsyncSession, user_id: Optional[UUID]) -> PatternLayer:
+        query = sa.select(
+            EntityDictionary.name, EntityDictionary.canonical_form, EntityDictionary.entity_type
+        ).where(_owned_by(user_id))
+        rows = (await db.execute(query)).all()
+        return PatternLayer(_patterns(rows), rows=len(rows))
+
+    async def _fresh(self, db: AsyncSession, user_id: Optional[UUID], layer: PatternLayer) -> PatternLayer:
+        """``layer``, or a reload of it if rows were stored behind its back, checked at most once per interval."""
+        now = time.monotonic()
+        if now - layer.checked_at < settings.entity_matcher_refresh_seconds:
+            return layer
+        layer.checked_at = now
+        # rows are only ever inserted, so a changed count means another process added some
+        count = await db.scalar(sa.select(sa.func.count()).select_from(EntityDictionary).where(_owned_by(user_id)))
+        if count == layer.rows:
+            return layer
+        self.reloads += 1
+        return await self._load(db, user_id)
+
+    async def layers(self, db: AsyncSession, user_id: UUID) -> Tuple[PatternLayer, PatternLayer]:
+        if self.global_layer is None:
+            self.global_layer = await self._load(db, None)
+        else:
+            self.global_layer = await self._fresh(db, None, self.global_layer)
+        user_layer = self.user_layers.get(user_id)
+        fresh = await self._load(db, user_id) if user_layer is None else await self._fresh(db, user_id, user_layer)
+        if fresh is not user_layer:
+            self.user_layers.set(user_id, fresh)
+        return fresh, self.global_layer
+
+    async def find(self, db: AsyncSession, user_id: UUID, text: str) -> List[Match]:
+        """Return non-overlapping known entity mentions in ``text``, leftmost-longest first.
+
+        On overlaps the longer mention wins; on ties the user's own dictionary
+        wins over the global one.
+        """
+        user_layer, global_layer = await self.layers(db, user_id)
+        folded = fold(text)
+        candidates = []
+        for priority, scope, layer in ((0, "user", user_layer), (1, "global", global_layer)):
+            for start, end, entry in layer.scan(folded):
+                if _is_word_boundary(folded, start, end):
+                    candidates.append((start, -(end - start), priority, end, scope, entry))
+        candidates.sort(key=lambda c: c[:3])
+        matches, covered = [], 0
+        for start, _, _, end, scope, entry in candidates:
+            if start >= covered:
+                matches.append(Match(start, end, text[start:end], entry.canonical, entry.entity_type, scope))
+                covered = end
+        return matches
+
+    def add(self, name: str, canonical_form: Optional[str], entity_type: Optional[str], user_id: Optional[UUID]):
+        """Fold a newly stored dictionary row into the loaded layer it belongs to."""
+        layer = self.global_layer if user_id is None else self.user_layers.get(user_id)
+        if layer is None:
+            return  # not loaded yet; the row is picked up when the layer is
+        entry = Entry(canonical_form or name, entity_type)
+        layer.rows += 1
+        for pattern in (name, canonical_form):
+            if pattern:
+                layer.add(pattern, entry)
+
+    def stats(self) -> dict:
+        return {
+            "global_patterns": len(self.global_layer.patterns) if self.global_layer else 0,
+            "reloads": self.reloads,
+            "user_layers": self.user_layers.stats(),
+        }
+
+
+entity_matcher = EntityMatcher()
+metrics.register("entity_matcher", entity_matcher.stats)
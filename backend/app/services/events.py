@@ -0,0 +1,222 @@
+"""In-process event bus for pushing fact updates to clients over SSE.
+
+Events are published per ``(user_id, session_id)`` channel. A channel is
+created by its first subscriber and keeps a short history ring, so a
+reconnecting client can resume from its ``Last-Event-ID``. Events for a
+session nobody has subscribed to are not kept. Every subscriber has a
+small bounded buffer. When that buffer is full, a newer ``fact_update``
+replaces a queued update for the same fact, and a newer
+``facts_recalled`` one for the same entity. If nothing can be coalesced,
+the subscriber is dropped; its client reconnects and replays from the
+history ring.
+
+An idle subscriber costs one deque and one ``asyncio.Event``, with no
+per-subscriber task on the bus side. ``publish`` may be called from
+worker threads (e.g. the Neo4j client) and hops back onto the event loop.
+"""
+import asyncio
+import itertools
+import json
+from collections import OrderedDict, deque
+from typing import Iterable, List, Optional, Set, Tuple
+
+from ..core import metrics
+from ..core.config import settings
+
+ChannelKey = Tuple[str, str]
+
+
+class Event:
+    __slots__ = ("id", "type", "data", "key")
+
+    def __init__(self, id: int, type: str, data: dict, key: Optional[tuple] = None):
+        self.id = id
+        self.type = type
+        self.data = data
+        self.key = key  # events sharing a key may be coalesced
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+
+
+class Subscriber:
+    __slots__ = ("buffer", "ready", "dropped", "maxlen")
+
+    def __init__(self, maxlen: int):
+        self.buffer: deque = deque()
+        self.ready = asyncio.Event()
+        self.dropped = False
+        self.maxlen = maxlen
+
+    def push(self, event: Event) -> bool:
+        """Queue ``event``; returns False if the subscriber overflowed and must be dropped."""
+        if len(self.buffer) >= self.maxlen:
+            if event.key is None:
+                return False
+            for queued in self.buffer:
+                if queued.key == event.key:
+                    self.buffer.remove(queued)
+                    break
+            else:
+                return False
+        self.buffer.append(event)
+        self.ready.set()
+        return True
+
+    def drain(self) -> List[Event]:
+        events = list(self.buffer)
+        self.buffer.clear()
+        self.ready.clear()
+        return events
+
+
+class Channel:
+    __slots__ = ("history", "subscribers", "evicted_upto")
+
+    def __init__(self, history: int, evicted_upto: int):
+        self.history: deque = deque(maxlen=history)
+        self.subscribers: Set[Subscriber] = set()
+        # events up to this id may have belonged to the channel but are gone
+        self.evicted_upto = evicted_upto
+
+
+class EventBus:
+    def __init__(self, history: int, buffer: int, max_channels: int):
+        self.history = history
+        self.buffer = buffer
+        self.max_channels = max_channels
+        self._channels: "OrderedDict[ChannelKey, Channel]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.dropped = 0
+
+    def _channel(self, key: ChannelKey, create: bool) -> Optional[Channel]:
+        channel = self._channels.get(key)
+        if channel is None and create:
+            channel = self._channels[key] = Channel(self.history, self._last_id)
+            if len(self._channels) > self.max_channels:
+                # forget the least recently used channels nobody is listening to
+                for stale in list(self._channels):
+                    if len(self._channels) <= self.max_channels:
+                        break
+                    if not self._channels[stale].subscribers and stale != key:
+                        del self._channels[stale]
+        if channel is not None:
+            self._channels.move_to_end(key)
+        return channel
+
+    def subscribe(self, user_id, session_id, last_event_id: Optional[int] = None) -> Tuple[Subscriber, List[Event], bool]:
+        """Register a subscriber and return it with the events to replay.
+
+        The flag is True when the requested position has already left the
+        history ring (or predates a restart), so the client must resync.
+        """
+        self._loop = asyncio.get_running_loop()
+        channel = self._channel((str(user_id), str(session_id)), create=True)
+        subscriber = Subscriber(self.buffer)
+        channel.subscribers.add(subscriber)
+        replay, gap = [], False
+        if last_event_id is not None:
+            replay = [event for event in channel.history if event.id > last_event_id]
+            gap = last_event_id < channel.evicted_upto or last_event_id > self._last_id
+        return subscriber, replay, gap
+
+    def unsubscribe(self, user_id, session_id, subscriber: Subscriber):
+        channel = self._channels.get((str(user_id), str(session_id)))
+        if channel is not None:
+            channel.subscribers.discard(subscriber)
+
+    def publish(self, user_id, session_id, type: str, data: dict, key: Optional[tuple] = None):
+        """Publish an event; safe to call from any thread."""
+        loop = self._loop
+        if loop is None:
+            return  # nobody has ever subscribed
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish(str(user_id), str(session_id), type, data, key)
+        elif not loop.is_closed():
+            loop.call_soon_threadsafe(self._publish, str(user_id), str(session_id), type, data, key)
+
+    def _publish(self, user_id: str, session_id: str, type: str, data: dict, key: Optional[tuple]):
+        event = Event(next(self._ids), type, data, key)
+        self._last_id = event.id
+        self.published += 1
+        channel = self._channel((user_id, session_id), create=False)
+        if channel is None:
+            return  # no subscriber yet; the first one to resume past this id is told to resync
+        if len(channel.history) == channel.history.maxlen:
+            channel.evicted_upto = channel.history[0].id
+        channel.history.append(event)
+        for subscriber in list(channel.subscribers):
+            before = len(subscriber.buffer)
+            if not subscriber.push(event):
+                subscriber.dropped = True
+                subscriber.ready.set()
+                channel.subscribers.discard(subscriber)
+                self.dropped += 1
+            elif len(subscriber.buffer) == before:
+                self.coalesced += 1
+            else:
+                self.delivered += 1
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._channels),
+            "subscribers": sum(len(channel.subscribers) for channel in self._channels.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+        }
+
+
+event_bus = EventBus(
+    history=settings.event_history,
+    buffer=settings.event_subscriber_buffer,
+    max_channels=settings.event_max_channels,
+)
+metrics.register("event_bus", event_bus.stats)
+
+
+def publish_facts(user_id, session_id, facts: Iterable[dict]):
+    """Emit one ``fact_update`` per written fact row, with its weight after the write, in the spec's event shape."""
+    if user_id is None or session_id is None:
+        return
+    for fact in facts:
+        event_bus.publish(
+            user_id, session_id, "fact_update",
+            {
+                "type": "fact_update",
+                "entity": fact["source"],
+                "relation": fact["relation"],
+                "target": fact["target"],
+                "weight": fact["weight"],
+            },
+            key=("fact", fact["source"], fact["relation"], fact["target"]),
+        )
+
+
+def publish_recalled(user_id, session_id, entity: str, neighbourhood: dict):
+    """Emit one ``facts_recalled`` with what the graph already knows about ``entity``.
+
+    These are reads, not writes, so they never share a type with ``fact_update``.
+    """
+    if user_id is None or session_id is None:
+        return
+    event_bus.publish(
+        user_id, session_id, "facts_recalled",
+        {
+            "type": "facts_recalled",
+            "entity": entity,
+            "outgoing": neighbourhood["outgoing"],
+            "incoming": neighbourhood["incoming"],
+        },
+        key=("recalled", entity),
+    )
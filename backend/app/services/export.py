@@ -0,0 +1,199 @@
+"""Streaming NDJSON export of a user's chat history and knowledge graph.
+
+The export is one JSON object per line, each tagged with a ``type``:
+
+- ``export``: a header with the user id and export time.
+- ``message``: each ``chat_history`` row, grouped by session in time order.
+- ``entity``: each entity the user's facts touch.
+- ``relation``: each of the user's ``RELATED`` edges, with its decayed weight.
+- ``end``: a trailer with the counts. ``complete`` is false if the
+  export stopped early, for example because Neo4j went away mid-stream.
+
+Nothing is collected in memory. History comes from a server-side cursor
+(``yield_per``) on Postgres, and the graph is pulled from Neo4j
+``batch_size`` records at a time, each batch going out as one block. On
+Postgres, this holds a pooled connection and an open read transaction
+for the length of the download. With ``compress``, blocks go through
+one streaming gzip compressor.
+
+``message`` lines have the shape ``transcript_import`` reads, so an
+export can be imported again. The importer ignores the other line types.
+
+From the command line, run from ``backend``::
+
+    python -m app.services.export --user someone@example.com -o export.ndjson.gz
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import sys
+import time
+import uuid
+import zlib
+from typing import AsyncIterator
+
+import sqlalchemy as sa
+
+from ..core import metrics
+from ..core.config import settings
+from ..db import crud
+from ..db.database import AsyncSessionLocal
+from ..db.models import ChatHistory
+from . import neo4j_client
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+_PLURAL = {"message": "messages", "entity": "entities", "relation": "relations"}
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record, default=str) + "\n"
+
+
+def history_query(user_id, batch_size: int):
+    """Every message of a user in (session, timestamp) order, without embeddings, fetched in batches."""
+    return (
+        sa.select(ChatHistory.id, ChatHistory.session_id, ChatHistory.role, ChatHistory.message_text,
+                  ChatHistory.timestamp)
+        .where(ChatHistory.user_id == user_id)
+        # ix_chat_history_user_session_timestamp already has this order, so nothing is sorted
+        .order_by(ChatHistory.session_id, ChatHistory.timestamp, ChatHistory.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+
+async def gzip_blocks(blocks: AsyncIterator[bytes], level: int) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip framing
+    async for block in blocks:
+        compressed = compressor.compress(block)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class Exporter:
+    def __init__(self, batch_size: int = 1000, gzip_level: int = 6):
+        self.batch_size = batch_size
+        self.gzip_level = gzip_level
+        self.active = 0
+        self.exports = 0
+        self.incomplete = 0
+        self.totals = dict.fromkeys(_PLURAL.values(), 0)
+        self.bytes = 0
+
+    async def _graph_batches(self, user_id):
+        # the driver is synchronous: pull each batch off the event loop, one at a time
+        batches = neo4j_client.stream_user_graph(user_id, self.batch_size)
+        try:
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    return
+                yield batch
+        finally:
+            await asyncio.to_thread(batches.close)
+
+    async def ndjson(self, user_id, graph: bool = True) -> AsyncIterator[bytes]:
+        """The export of ``user_id`` as UTF-8 NDJSON blocks of about ``batch_size`` lines."""
+        counts = dict.fromkeys(_PLURAL.values(), 0)
+        complete = finished = False
+        self.active += 1
+        self.exports += 1
+        try:
+            yield _line({
+                "type": "export", "version": FORMAT_VERSION, "user_id": str(user_id),
+                "exported_at": datetime.datetime.utcnow().isoformat(), "graph": graph,
+            }).encode()
+            async with AsyncSessionLocal() as db:
+                result = await db.stream(history_query(user_id, self.batch_size))
+                async for rows in result.partitions():
+                    yield "".join(_line({
+                        "type": "message", "id": str(row.id), "session_id": str(row.session_id), "role": row.role,
+                        "content": row.message_text,
+                        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+                    }) for row in rows).encode()
+                    counts["messages"] += len(rows)
+            complete = True
+            if graph:
+                try:
+                    async for kind, rows in self._graph_batches(user_id):
+                        yield "".join(_line({"type": kind, **row}) for row in rows).encode()
+                        counts[_PLURAL[kind]] += len(rows)
+                except Exception:
+                    # the response is already under way; say so in-band instead of cutting it short
+                    logger.exception("graph export for user %s failed", user_id)
+                    complete = False
+                    yield _line({"type": "error", "detail": "graph export failed"}).encode()
+            finished = True
+            yield _line({"type": "end", "complete": complete, **counts}).encode()
+        finally:
+            self.active -= 1
+            if not (finished and complete):  # cut short by an error or by the client going away
+                self.incomplete += 1
+            for name, count in counts.items():
+                self.totals[name] += count
+
+    async def stream(self, user_id, graph: bool = True, compress: bool = False) -> AsyncIterator[bytes]:
+        """``ndjson``, optionally gzip-compressed on the fly, counting the bytes that go out."""
+        blocks = self.ndjson(user_id, graph)
+        if compress:
+            blocks = gzip_blocks(blocks, self.gzip_level)
+        async for block in blocks:
+            self.bytes += len(block)
+            yield block
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "exports": self.exports,
+            "incomplete": self.incomplete,
+            **self.totals,
+            "bytes": self.bytes,
+        }
+
+
+exporter = Exporter(batch_size=settings.export_batch_size, gzip_level=settings.export_gzip_level)
+metrics.register("export", exporter.stats)
+
+
+async def _export(args):
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await crud.get_user(db, uuid.UUID(args.user))
+        except ValueError:
+            user = await crud.get_user_by_email(db, args.user)
+    if user is None:
+        raise SystemExit(f"no user {args.user!r}")
+    compress = args.gzip or args.output.endswith(".gz")
+    started, written = time.perf_counter(), 0
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        async for block in exporter.stream(user.id, graph=args.graph, compress=compress):
+            await asyncio.to_thread(out.write, block)
+            written += len(block)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+        neo4j_client.driver.close()
+    totals = exporter.totals
+    print(f"exported {totals['messages']} messages, {totals['entities']} entities, {totals['relations']} relations: "
+          f"{written} bytes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a user's chat history and graph as NDJSON")
+    parser.add_argument("--user", required=True, help="id or email of the user to export")
+    parser.add_argument("-o", "--output", default="-", help="file to write (default: stdout; .gz implies --gzip)")
+    parser.add_argument("--gzip", action="store_true", help="gzip-compress the output")
+    parser.add_argument("--no-graph", dest="graph", action="store_false", help="export chat history only")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_export(args))
+
+
+if __name__ == "__main__":
+    main()
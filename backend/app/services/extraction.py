@@ -0,0 +1,168 @@
+"""Fact extraction from user statements, batched across messages.
+
+A port of ``getEntities`` and ``getRelationships`` from ``api/llm.js``. The
+two prompts are folded into one that returns typed subject-verb-object
+triples. Statements that arrive together share one completion: concurrent
+``extract`` calls are coalesced by ``batching.MicroBatcher``, and the
+prompt numbers each statement so the triples can be routed back to their
+callers. A prompt only ever holds one user's statements. The model
+resolves pronouns across everything it is shown, so a batch is split by
+user and each user's statements get their own completion.
+
+Backends are looked up by name in ``BACKENDS``:
+
+- ``none``: extracts nothing. Messages still flow through the pipeline
+  offline; the graph is only fed by explicit fact inserts.
+- ``openai``: any OpenAI-compatible API, through the shared ``llm.llm_client``.
+"""
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..core import metrics
+from ..core.config import settings
+from .batching import MicroBatcher
+from .extraction_cache import ExtractionCache, extraction_cache, text_hash
+from .llm import LLMClient, llm_client
+
+ENTITY_TYPES = "Person, Organization, Occupation, Place, Product, Service, Event, Skill, Religion, Thing"
+SELF = "User"  # entity name that self-references ("I", "my", ...) resolve to
+
+PROMPT = """Extract facts from each numbered statement below as Subject-Verb-Object triples.
+Self-references (like "I", "I'm", "my") refer to a person named "{self}".
+Resolve pronouns to the entity they refer to. Type every subject and object as one of: {types}.
+Format each verb as UPPER_CASE_WITH_UNDERSCORES.
+
+{statements}
+
+Return a JSON array of objects with "statement" (the statement number), "subject", "subject_type",
+"verb", "object" and "object_type" keys. Return [] if no statement contains a fact."""
+PROMPT_VERSION = hashlib.sha256(PROMPT.encode()).hexdigest()[:12]
+
+_VERB = re.compile(r"[^A-Z0-9]+")
+
+
+def parse_code_block(text: str):
+    """JSON from the last fenced code block in ``text``, or from the whole text."""
+    end = text.rfind("```")
+    start = text.rfind("```", 0, end) if end != -1 else -1
+    if start != -1:
+        text = text[start + 3:end]
+        if text.startswith("json"):
+            text = text[4:]
+    try:
+        return json.loads(text.strip())
+    except ValueError:
+        return None
+
+
+def _triples(parsed, count: int) -> List[List[dict]]:
+    """Group parsed triples by statement number into ``count`` lists of ``insert_facts`` dicts."""
+    grouped: List[List[dict]] = [[] for _ in range(count)]
+    for item in parsed if isinstance(parsed, list) else []:
+        try:
+            index = int(item["statement"]) - 1
+            subject, verb, obj = str(item["subject"]).strip(), str(item["verb"]), str(item["object"]).strip()
+        except (KeyError, TypeError, ValueError):
+            continue
+        relation = _VERB.sub("_", verb.upper()).strip("_")
+        if 0 <= index < count and subject and obj and relation:
+            grouped[index].append({
+                "source": subject,
+                "relation": relation,
+                "target": obj,
+                "source_type": item.get("subject_type") or "Thing",
+                "target_type": item.get("object_type") or "Thing",
+            })
+    return grouped
+
+
+class NullExtractor:
+    version = None  # nothing worth caching
+
+    async def extract(self, statements: Sequence[str]) -> List[List[dict]]:
+        return [[] for _ in statements]
+
+
+class LLMExtractor:
+    """One completion per batch of statements, through the shared ``llm_client``."""
+
+    def __init__(self, client: LLMClient):
+        self.client = client
+        self.version = f"llm:{settings.llm_model}:{PROMPT_VERSION}"
+
+    async def extract(self, statements: Sequence[str]) -> List[List[dict]]:
+        numbered = "\n".join(f"{i}. {json.dumps(text)}" for i, text in enumerate(statements, 1))
+        content = await self.client.complete(PROMPT.format(self=SELF, types=ENTITY_TYPES, statements=numbered))
+        return _triples(parse_code_block(content), len(statements))
+
+
+BACKENDS: Dict[str, Callable[[], object]] = {
+    "none": NullExtractor,
+    "openai": lambda: LLMExtractor(llm_client),
+}
+
+
+class ExtractionService(MicroBatcher):
+    """Coalesces concurrent ``extract`` calls into one prompt per batch."""
+
+    def __init__(self, backend=None, window: float = 0.05, max_batch: int = 16,
+                 cache: Optional[ExtractionCache] = None):
+        super().__init__(window, max_batch)
+        self._backend = backend
+        self.cache = cache
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = BACKENDS[settings.extraction_backend]()
+        return self._backend
+
+    async def extract(self, statement: str, user_id=None) -> List[dict]:
+        """Triples of one statement, as ``insert_facts`` dicts; repeated statements come from the cache.
+
+        Cache misses take one of the user's ``llm_client`` slots while they wait for their batch.
+        """
+        version = getattr(self.backend, "version", None)
+        key = text_hash(statement) if self.cache is not None and version is not None else None
+        if key is not None:
+            triples = await self.cache.get(version, key)
+            if triples is not None:
+                return triples
+        async with llm_client.user_slot(user_id):
+            triples = await self.submit((user_id, statement))
+        if key is not None:
+            await self.cache.put(version, key, triples)
+        return triples
+
+    async def _call(self, items: Sequence[Tuple[Any, str]]) -> List[Any]:
+        # one prompt per user, so triples cannot cross from one user's statements to another's
+        by_user: Dict[Any, List[int]] = {}
+        for i, (user_id, _) in enumerate(items):
+            by_user.setdefault(user_id, []).append(i)
+        groups = list(by_user.values())
+        extracted = await asyncio.gather(
+            *(self.backend.extract([items[i][1] for i in group]) for group in groups), return_exceptions=True
+        )
+        results: List[Any] = [None] * len(items)
+        for group, triples in zip(groups, extracted):
+            # a failed prompt fails only the statements that were in it
+            for position, i in enumerate(group):
+                results[i] = triples if isinstance(triples, BaseException) else triples[position]
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.extraction_backend if self._backend is None else type(self._backend).__name__,
+            **super().stats(),
+        }
+
+
+extraction_service = ExtractionService(
+    window=settings.extraction_batch_window_ms / 1000,
+    max_batch=settings.extraction_max_batch,
+    cache=extraction_cache,
+)
+metrics.register("extraction", extraction_service.stats)
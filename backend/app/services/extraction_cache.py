@@ -0,0 +1,148 @@
+"""Persistent, content-addressed cache of fact extraction results.
+
+Entries are keyed on the SHA-256 of the normalised statement and the
+extractor version. A version names the backend, the model and a hash of
+the prompt, so changing any of them starts a fresh keyspace instead of
+serving stale triples. Normalisation applies NFKC, case folding and
+whitespace collapsing, and strips trailing sentence punctuation. "I live
+in Berlin." and "i live in berlin" share an entry.
+
+The store is a local SQLite file, independent of the application
+database, so it works the same in front of Postgres. It holds at most
+``max_entries`` rows. When full, the least recently used tenth is evicted
+in one statement, which keeps eviction off the per-insert path. Only
+triples are cached: callers still write them to the graph, so repeated
+facts are reinforced as usual.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Optional
+
+from ..core import metrics
+from ..core.config import settings
+
+_SPACE = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s.!]+$")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _TRAILING.sub("", _SPACE.sub(" ", text).strip())
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(normalize(text).encode("utf-8")).digest()
+
+
+class ExtractionCache:
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # one connection, used from worker threads
+        self.entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extractions (
+                    text_hash BLOB NOT NULL,
+                    version TEXT NOT NULL,
+                    triples TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (text_hash, version)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_extractions_last_used ON extractions (last_used)")
+            self.entries = conn.execute("SELECT count(*) FROM extractions").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_sync(self, version: str, key: bytes) -> Optional[List[dict]]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT triples FROM extractions WHERE text_hash = ? AND version = ?", (key, version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute(
+                "UPDATE extractions SET last_used = ?, hits = hits + 1 WHERE text_hash = ? AND version = ?",
+                (time.time(), key, version),
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def put_sync(self, version: str, key: bytes, triples: List[dict]):
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # a concurrent miss may have stored the same statement first; keep that entry
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO extractions (text_hash, version, triples, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, version, json.dumps(triples), now, now),
+            ).rowcount
+            self.entries += inserted
+            if self.entries > self.max_entries:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection):
+        # drop down to 90% so the next eviction is max_entries / 10 inserts away
+        excess = self.entries - int(self.max_entries * 0.9)
+        conn.execute(
+            "DELETE FROM extractions WHERE last_used <= "
+            "(SELECT last_used FROM extractions ORDER BY last_used LIMIT 1 OFFSET ?)",
+            (excess - 1,),
+        )
+        remaining = conn.execute("SELECT count(*) FROM extractions").fetchone()[0]
+        self.evictions += self.entries - remaining
+        self.entries = remaining
+
+    async def get(self, version: str, key: bytes) -> Optional[List[dict]]:
+        return await asyncio.to_thread(self.get_sync, version, key)
+
+    async def put(self, version: str, key: bytes, triples: List[dict]):
+        await asyncio.to_thread(self.put_sync, version, key, triples)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+extraction_cache = ExtractionCache(settings.extraction_cache_path, settings.extraction_cache_max_entries)
+metrics.register("extraction_cache", extraction_cache.stats)
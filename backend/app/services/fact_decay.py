@@ -0,0 +1,96 @@
+"""Background compaction of decayed fact weights.
+
+Edge weights decay lazily: reads compute the effective weight from
+``r.weight``, ``r.decayed_at`` and the configured half-life, so nothing has
+to rewrite the graph on every tick. This periodic task folds the decay into
+the stored weights in bounded batches, one transaction per batch, and
+deletes edges whose weight has fallen below ``fact_prune_threshold``. It
+also deletes the per-message ``AppliedFacts`` markers once they are older
+than ``fact_marker_retention_seconds``, long after any redelivery.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from ..core import metrics
+from ..core.config import settings
+from . import neo4j_client
+
+logger = logging.getLogger(__name__)
+
+
+class FactCompactor:
+    def __init__(self, interval: float, min_age: float, batch_size: int, threshold: float, marker_retention: float):
+        self.interval = interval
+        self.min_age = min_age
+        self.batch_size = batch_size
+        self.threshold = threshold
+        self.marker_retention = marker_retention
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.compacted = 0
+        self.pruned = 0
+        self.markers_deleted = 0
+        self.failures = 0
+        self.last_run_seconds = None
+
+    def run_once(self):
+        """One compaction pass; blocking, so call it from a worker thread."""
+        started = time.perf_counter()
+        now_ms = int(time.time() * 1000)
+        compacted, pruned = neo4j_client.compact_facts(
+            now_ms, int(self.min_age * 1000), self.batch_size, self.threshold
+        )
+        self.markers_deleted += neo4j_client.prune_markers(
+            now_ms - int(self.marker_retention * 1000), self.batch_size
+        )
+        self.runs += 1
+        self.compacted += compacted
+        self.pruned += pruned
+        self.last_run_seconds = time.perf_counter() - started
+        return compacted, pruned
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                compacted, pruned = await asyncio.to_thread(self.run_once)
+                logger.info("fact compaction folded %d edges, pruned %d", compacted, pruned)
+            except Exception:
+                self.failures += 1
+                logger.exception("fact compaction failed")
+
+    async def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "half_life_days": settings.fact_half_life_days,
+            "runs": self.runs,
+            "compacted": self.compacted,
+            "pruned": self.pruned,
+            "markers_deleted": self.markers_deleted,
+            "failures": self.failures,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+
+fact_compactor = FactCompactor(
+    interval=settings.fact_compact_interval_seconds,
+    min_age=settings.fact_compact_min_age_seconds,
+    batch_size=settings.fact_compact_batch_size,
+    threshold=settings.fact_prune_threshold,
+    marker_retention=settings.fact_marker_retention_seconds,
+)
+metrics.register("fact_compactor", fact_compactor.stats)
@@ -0,0 +1,217 @@
+"""Versioned Neo4j schema: constraints and indexes, applied in order.
+
+This works like Alembic for the graph. Each migration has an integer
+version and a list of schema statements. The highest applied version is
+recorded on a single ``(:GraphSchema {key: "graph"})`` node. Every schema
+statement uses ``IF [NOT] EXISTS`` and every data statement is a no-op
+once applied, so re-running an interrupted upgrade is safe.
+
+Entities belong to one user and are keyed by ``(user_id, name)``. Each
+``RELATED`` edge carries the ``user_id`` of both its ends.
+
+Migrations run at startup (``neo4j_schema_bootstrap``) or from the
+command line, run from ``backend``::
+
+    python -m app.services.graph_schema upgrade
+    python -m app.services.graph_schema current
+"""
+import argparse
+import logging
+from typing import List, NamedTuple
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_KEY = "graph"
+
+
+MERGE_DUPLICATE_ENTITIES = """
+MATCH (e:Entity)
+WITH e ORDER BY elementId(e)
+WITH e.user_id AS user_id, e.name AS name, collect(e) AS nodes
+WHERE size(nodes) > 1
+WITH head(nodes) AS keep, tail(nodes) AS duplicates
+CALL {
+    WITH keep, duplicates
+    UNWIND duplicates AS duplicate
+    MATCH (duplicate)-[r:RELATED]->(target)
+    WITH keep, r, CASE WHEN target IN duplicates THEN keep ELSE target END AS target
+    CREATE (keep)-[moved:RELATED]->(target)
+    SET moved = properties(r)
+    DELETE r
+    RETURN count(*) AS outgoing
+}
+CALL {
+    WITH keep, duplicates
+    UNWIND duplicates AS duplicate
+    MATCH (source)-[r:RELATED]->(duplicate)
+    CREATE (source)-[moved:RELATED]->(keep)
+    SET moved = properties(r)
+    DELETE r
+    RETURN count(*) AS incoming
+}
+FOREACH (duplicate IN duplicates | DETACH DELETE duplicate)
+"""
+
+# one edge per (source, verb, user, target), as upserts MERGE them; weights of merged edges add up
+MERGE_PARALLEL_RELATIONS = """
+MATCH (a:Entity)-[r:RELATED]->(b:Entity)
+WITH a, b, r.verb AS verb, r.user_id AS user_id, collect(r) AS edges
+WHERE size(edges) > 1
+WITH head(edges) AS keep, tail(edges) AS extra
+SET keep.weight = keep.weight + reduce(total = 0.0, r IN extra | total + r.weight),
+    keep.last_reinforced = reduce(latest = keep.last_reinforced, r IN extra |
+        CASE WHEN r.last_reinforced > latest THEN r.last_reinforced ELSE latest END)
+FOREACH (r IN extra | DELETE r)
+"""
+
+# shared, name-keyed entities become one node per user that has facts about them
+COPY_ENTITIES_PER_USER = """
+MATCH (e:Entity)-[r:RELATED]-() WHERE e.user_id IS NULL AND r.user_id IS NOT NULL
+WITH DISTINCT e, r.user_id AS user_id
+MERGE (copy:Entity {user_id: user_id, name: e.name})
+ON CREATE SET copy.type = e.type
+"""
+
+MOVE_RELATIONS_TO_USER_ENTITIES = """
+MATCH (a:Entity)-[r:RELATED]->(b:Entity)
+WHERE (a.user_id IS NULL OR b.user_id IS NULL) AND r.user_id IS NOT NULL
+CALL {
+    WITH a, r, b
+    MATCH (source:Entity {user_id: r.user_id, name: a.name}), (target:Entity {user_id: r.user_id, name: b.name})
+    CREATE (source)-[moved:RELATED]->(target)
+    SET moved = properties(r)
+    DELETE r
+} IN TRANSACTIONS OF 10000 ROWS
+"""
+
+# edges from before RELATED.user_id belong to nobody and no read returns them
+DELETE_SHARED_ENTITIES = """
+MATCH (e:Entity) WHERE e.user_id IS NULL
+CALL { WITH e DETACH DELETE e } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+
+class GraphMigration(NamedTuple):
+    version: int
+    description: str
+    statements: List[str]
+
+
+MIGRATIONS = [
+    GraphMigration(1, "entity and relation lookup indexes", [
+        # MERGE / MATCH on Entity.name, without a label scan
+        "CREATE INDEX entity_name IF NOT EXISTS FOR (e:Entity) ON (e.name)",
+        "CREATE INDEX related_verb IF NOT EXISTS FOR ()-[r:RELATED]-() ON (r.verb)",
+        "CREATE INDEX related_user_id IF NOT EXISTS FOR ()-[r:RELATED]-() ON (r.user_id)",
+        "CREATE CONSTRAINT graph_schema_key IF NOT EXISTS FOR (s:GraphSchema) REQUIRE s.key IS UNIQUE",
+    ]),
+    GraphMigration(2, "user-scoped entity key and decay compaction index", [
+        # entities had no user_id yet, so this enforced nothing; migration 4 drops it and
+        # migration 6 recreates it once entities carry their user's id
+        "CREATE CONSTRAINT entity_user_name IF NOT EXISTS FOR (e:Entity) REQUIRE (e.user_id, e.name) IS UNIQUE",
+        "CREATE INDEX related_decayed_at IF NOT EXISTS FOR ()-[r:RELATED]-() ON (r.decayed_at)",
+    ]),
+    GraphMigration(3, "applied-facts markers for idempotent message redelivery", [
+        # MERGE on the key must not race into duplicates when a job is redelivered mid-run
+        "CREATE CONSTRAINT applied_facts_key IF NOT EXISTS FOR (m:AppliedFacts) REQUIRE m.key IS UNIQUE",
+        "CREATE INDEX applied_facts_applied_at IF NOT EXISTS FOR (m:AppliedFacts) ON (m.applied_at)",
+    ]),
+    GraphMigration(4, "unique entity names", [
+        # entities were shared and keyed by name here (until migration 6); MERGE races
+        # without a constraint can have left duplicates, so fold them into one node first
+        MERGE_DUPLICATE_ENTITIES,
+        MERGE_PARALLEL_RELATIONS,
+        "DROP CONSTRAINT entity_user_name IF EXISTS",
+        # the uniqueness constraint brings its own index and cannot coexist with this one
+        "DROP INDEX entity_name IF EXISTS",
+        "CREATE CONSTRAINT entity_name_unique IF NOT EXISTS FOR (e:Entity) REQUIRE e.name IS UNIQUE",
+    ]),
+    GraphMigration(5, "decay timestamps on pre-decay edges", [
+        # writes always set decayed_at; edges from before decay had none, which kept them out of
+        # the index-backed compaction range. An unset timestamp means undecayed, so stamping now
+        # leaves every effective weight as it was.
+        """
+        MATCH ()-[r:RELATED]->() WHERE r.decayed_at IS NULL
+        CALL { WITH r SET r.decayed_at = timestamp() } IN TRANSACTIONS OF 10000 ROWS
+        """,
+    ]),
+    GraphMigration(6, "user-scoped entities", [
+        # the name-only key would reject a second user's node with the same name
+        "DROP CONSTRAINT entity_name_unique IF EXISTS",
+        COPY_ENTITIES_PER_USER,
+        MOVE_RELATIONS_TO_USER_ENTITIES,
+        DELETE_SHARED_ENTITIES,
+        # brings the (user_id, name) index every MERGE and MATCH on an entity uses
+        "CREATE CONSTRAINT entity_user_name IF NOT EXISTS FOR (e:Entity) REQUIRE (e.user_id, e.name) IS UNIQUE",
+    ]),
+]
+
+HEAD = MIGRATIONS[-1].version
+
+
+def current_version(session) -> int:
+    record = session.run(
+        "MATCH (s:GraphSchema {key: $key}) RETURN s.version AS version", key=SCHEMA_KEY
+    ).single()
+    return record["version"] if record and record["version"] is not None else 0
+
+
+def _record_version(session, migration: GraphMigration):
+    session.run(
+        """
+        MERGE (s:GraphSchema {key: $key})
+        SET s.version = $version, s.description = $description, s.applied_at = timestamp()
+        """,
+        key=SCHEMA_KEY, version=migration.version, description=migration.description,
+    )
+
+
+def upgrade(driver, target: int = HEAD) -> List[int]:
+    """Apply every migration above the recorded version up to ``target``; returns the versions applied."""
+    applied = []
+    with driver.session() as session:
+        version = current_version(session)
+        for migration in MIGRATIONS:
+            if version < migration.version <= target:
+                # schema statements cannot share a transaction with data writes,
+                # so each runs in its own auto-commit transaction
+                for statement in migration.statements:
+                    session.run(statement)
+                _record_version(session, migration)
+                logger.info("graph schema upgraded to %d: %s", migration.version, migration.description)
+                applied.append(migration.version)
+    return applied
+
+
+def bootstrap():
+    """Startup hook: bring the graph schema to head, logging instead of failing if Neo4j is down."""
+    from .neo4j_client import driver
+
+    try:
+        return upgrade(driver)
+    except Exception:
+        logger.exception("graph schema bootstrap failed")
+        return []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply versioned Neo4j constraints and indexes")
+    parser.add_argument("command", choices=["upgrade", "current"])
+    parser.add_argument("--target", type=int, default=HEAD, help="version to upgrade to (default: head)")
+    args = parser.parse_args(argv)
+
+    from .neo4j_client import driver
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "upgrade":
+        applied = upgrade(driver, args.target)
+        print(f"applied {applied}" if applied else "graph schema already up to date")
+    with driver.session() as session:
+        print(f"graph schema version {current_version(session)} (head {HEAD}) at {settings.neo4j_bolt_uri}")
+    driver.close()
+
+
+if __name__ == "__main__":
+    main()
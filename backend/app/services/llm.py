@@ -0,0 +1,205 @@
+"""Shared client for LLM completions: concurrency limits, single-flight and batching.
+
+Every LLM call in the backend goes through ``llm_client``, which adds:
+
+- Concurrency limits. At most ``max_concurrency`` backend requests are in
+  flight at once. ``user_slot`` caps each user at
+  ``per_user_concurrency`` concurrent LLM-bound tasks, so one user's burst
+  cannot starve the others.
+- Single-flight. Identical prompts that are in flight at the same time
+  share one backend request. A caller that gives up does not cancel the
+  request for the others.
+- Micro-batching. When ``batch`` is on, prompts of up to ``batch_max_chars``
+  are coalesced by ``batching.MicroBatcher`` into one multi-prompt
+  request: a legacy ``/completions`` call whose ``prompt`` is a list. Only
+  enable it for backends that accept that shape. Chat-only models don't.
+
+The backend is any OpenAI-compatible HTTP API. ``benchmarks.llm_stub`` is
+a local stand-in that simulates latency, so all of this can be exercised
+offline.
+"""
+import asyncio
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from ..core import metrics
+from ..core.config import settings
+from .batching import MicroBatcher
+
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+
+class OpenAIChat:
+    """An OpenAI-compatible HTTP API: ``/chat/completions``, plus ``/completions`` for batches."""
+
+    def __init__(self, api_key: str, model: str, base_url: str, timeout: float = 60.0, transport=None):
+        self.model = model
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+            transport=transport,
+        )
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        response = await self.client.post(path, json=payload)
+        if response.is_error:
+            raise RuntimeError(f"LLM request failed ({response.status_code}): {response.text[:200]}")
+        return response.json()
+
+    async def complete(self, prompt: str) -> str:
+        data = await self._post("/chat/completions", {
+            "model": self.model,
+            "messages": [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+        })
+        return data["choices"][0]["message"]["content"]
+
+    async def complete_batch(self, prompts: Sequence[str]) -> List[str]:
+        data = await self._post("/completions", {"model": self.model, "prompt": list(prompts)})
+        choices = sorted(data["choices"], key=lambda choice: choice["index"])
+        return [choice["text"] for choice in choices]
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class _PromptBatcher(MicroBatcher):
+    def __init__(self, client: "LLMClient", window: float, max_batch: int):
+        super().__init__(window, max_batch)
+        self.client = client
+
+    async def _call(self, prompts: Sequence[str]) -> List[str]:
+        if len(prompts) == 1:
+            return [await self.client._request(self.client.backend.complete, prompts[0])]
+        return await self.client._request(self.client.backend.complete_batch, prompts)
+
+
+class LLMClient:
+    def __init__(self, backend=None, max_concurrency: int = 8, per_user_concurrency: int = 2,
+                 batch: bool = False, batch_window: float = 0.02, max_batch: int = 16,
+                 batch_max_chars: int = 1000):
+        self._backend = backend
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        self.batch = batch
+        self.batch_max_chars = batch_max_chars
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._user_slots: Dict[str, list] = {}  # user id -> [semaphore, holders + waiters]
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        self._batcher = _PromptBatcher(self, batch_window, max_batch)
+        self.calls = 0
+        self.coalesced = 0
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.waiting = 0
+        self.failures = 0
+        self.request_seconds = 0.0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = OpenAIChat(
+                settings.openai_api_key, settings.llm_model, settings.openai_base_url, settings.llm_timeout_seconds
+            )
+        return self._backend
+
+    @asynccontextmanager
+    async def user_slot(self, user_id):
+        """Hold one of ``user_id``'s ``per_user_concurrency`` slots; a no-op without a user."""
+        if user_id is None:
+            yield
+            return
+        key = str(user_id)
+        entry = self._user_slots.get(key)
+        if entry is None:
+            entry = self._user_slots[key] = [asyncio.Semaphore(self.per_user_concurrency), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_slots[key]
+
+    async def _request(self, call, *args):
+        """One backend request under the global concurrency limit."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        started = time.perf_counter()
+        try:
+            return await call(*args)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.requests += 1
+            self.request_seconds += time.perf_counter() - started
+            self.active -= 1
+            self._slots.release()
+
+    async def _complete(self, prompt: str) -> str:
+        if self.batch and len(prompt) <= self.batch_max_chars:
+            return await self._batcher.submit(prompt)
+        return await self._request(self.backend.complete, prompt)
+
+    async def complete(self, prompt: str, user_id=None) -> str:
+        """Completion text for ``prompt``; identical prompts in flight share one request."""
+        self.calls += 1
+        key = hashlib.sha256(prompt.encode("utf-8")).digest()
+        future = self._inflight.get(key)
+        if future is None:
+            async with self.user_slot(user_id):
+                future = self._inflight.get(key)  # may have started while we waited for the slot
+                if future is None:
+                    future = self._inflight[key] = asyncio.ensure_future(self._complete(prompt))
+                    future.add_done_callback(lambda _: self._inflight.pop(key, None))
+                    # shielded: one caller giving up must not cancel the request others share
+                    return await asyncio.shield(future)
+        self.coalesced += 1
+        return await asyncio.shield(future)
+
+    async def close(self):
+        await self._batcher.close()
+        if self._inflight:
+            await asyncio.gather(*self._inflight.values(), return_exceptions=True)
+        if self._backend is not None and hasattr(self._backend, "close"):
+            await self._backend.close()
+            self._backend = None
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "requests": self.requests,
+            "failures": self.failures,
+            "active": self.active,
+            "peak_active": self.peak_active,
+            "waiting": self.waiting,
+            "users_active": len(self._user_slots),
+            "request_seconds": self.request_seconds,
+            "batches": self._batcher.stats(),
+        }
+
+
+llm_client = LLMClient(
+    max_concurrency=settings.llm_max_concurrency,
+    per_user_concurrency=settings.llm_per_user_concurrency,
+    batch=settings.llm_batch_prompts,
+    batch_window=settings.llm_batch_window_ms / 1000,
+    max_batch=settings.llm_batch_max,
+    batch_max_chars=settings.llm_batch_max_chars,
+)
+metrics.register("llm", llm_client.stats)
@@ -0,0 +1,164 @@
+"""Per-user cache of entity neighbourhoods in front of the graph reads.
+
+An entry is keyed by ``(user_id, entity name)``. It holds the entity's
+outgoing and incoming ``RELATED`` edges that belong to the user, as
+``Edge`` tuples with the stored base weight and ``decayed_at``. Readers
+apply decay at read time, so an entry stays correct while it ages.
+
+Writes in ``neo4j_client`` call ``apply`` with the rows their MERGE
+returned. Those rows update cached entries in place, so a write never
+leaves a stale neighbourhood behind. If a write lands while a miss is
+being filled, that fill is discarded rather than cached. Eviction is LRU,
+bounded by entry count and by an estimate of the entries' memory.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..core import metrics
+from ..core.config import settings
+
+
+class Edge(NamedTuple):
+    outgoing: bool
+    relation: str
+    other: str
+    weight: float
+    decayed_at: Optional[int]
+
+
+Key = Tuple[str, str]
+
+_ENTRY_OVERHEAD = 200
+_EDGE_OVERHEAD = 150
+
+
+def _size(key: Key, edges: List[Edge]) -> int:
+    return _ENTRY_OVERHEAD + len(key[1]) + sum(
+        _EDGE_OVERHEAD + len(edge.relation) + len(edge.other) for edge in edges
+    )
+
+
+class NeighbourhoodCache:
+    def __init__(self, maxsize: int, max_bytes: int):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Key, Tuple[List[Edge], int]]" = OrderedDict()
+        self._filling: Dict[Key, list] = {}  # key -> [fills in flight, written since]
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.patches = 0
+        self.discarded_fills = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @staticmethod
+    def key(user_id, name: str) -> Key:
+        return (str(user_id), name)
+
+    def get(self, key: Key) -> Optional[List[Edge]]:
+        """Cached edges, or None after registering the caller as filling ``key``."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            self._filling.setdefault(key, [0, False])[0] += 1
+            return None
+
+    def fill(self, key: Key, edges: Iterable[Edge]):
+        """Store a neighbourhood read after a miss, unless a write raced with the read."""
+        edges = list(edges)
+        with self._lock:
+            filling = self._filling.get(key)
+            stale = filling is not None and filling[1]
+            if filling is not None:
+                filling[0] -= 1
+                if filling[0] <= 0:
+                    del self._filling[key]
+            if stale:
+                self.discarded_fills += 1
+                return
+            self._store(key, edges)
+
+    def abandon(self, key: Key):
+        """Release a miss whose read failed."""
+        with self._lock:
+            filling = self._filling.get(key)
+            if filling is not None:
+                filling[0] -= 1
+                if filling[0] <= 0:
+                    del self._filling[key]
+
+    def _store(self, key: Key, edges: List[Edge]):
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        size = _size(key, edges)
+        self._data[key] = (edges, size)
+        self.bytes += size
+        while self._data and (len(self._data) > self.maxsize or self.bytes > self.max_bytes):
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def apply(self, rows: Iterable[dict]):
+        """Patch cached entries with relation rows returned by a graph write.
+
+        Each row carries ``source``, ``relation``, ``target``, ``user_id``
+        (the edge's owner), ``weight`` and ``decayed_at``.
+        """
+        with self._lock:
+            for row in rows:
+                if row.get("user_id") is None:
+                    continue
+                user_id = str(row["user_id"])
+                for key, edge in (
+                    ((user_id, row["source"]), Edge(True, row["relation"], row["target"], row["weight"], row["decayed_at"])),
+                    ((user_id, row["target"]), Edge(False, row["relation"], row["source"], row["weight"], row["decayed_at"])),
+                ):
+                    filling = self._filling.get(key)
+                    if filling is not None:
+                        filling[1] = True
+                    entry = self._data.get(key)
+                    if entry is None:
+                        continue
+                    edges = [e for e in entry[0] if e[:3] != edge[:3]]
+                    edges.append(edge)
+                    self._store(key, edges)
+                    self.patches += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            for filling in self._filling.values():
+                filling[1] = True
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "patches": self.patches,
+            "discarded_fills": self.discarded_fills,
+        }
+
+
+neighbourhood_cache = NeighbourhoodCache(
+    maxsize=settings.neighbourhood_cache_size,
+    max_bytes=settings.neighbourhood_cache_max_bytes,
+)
+metrics.register("neighbourhood_cache", neighbourhood_cache.stats)
@@ -1,29 +1,306 @@
-from neo4j import GraphDatabase
+import time
+from neo4j import GraphDatabase, unit_of_work
 from ..core.config import settings
+from .events import publish_facts
+from .neighbourhood_cache import Edge, neighbourhood_cache
+from ..core import metrics
 
 driver = GraphDatabase.driver(settings.neo4j_bolt_uri, auth=(settings.neo4j_user, settings.neo4j_password))
 
-def upsert_entity(tx, name, entity_type="Thing"):
+# Fact decay: r.weight is the edge's weight as of r.decayed_at (epoch ms) and
+# halves every $half_life_ms after that. Reads compute the effective weight;
+# reinforcement and the compactor fold the decay back into r.weight.
+def effective_weight(now="timestamp()"):
+    return (
+        "r.weight * CASE WHEN $half_life_ms IS NULL OR r.decayed_at IS NULL THEN 1.0 "
+        f"ELSE 0.5 ^ (toFloat({now} - r.decayed_at) / $half_life_ms) END"
+    )
+
+def half_life_ms():
+    days = settings.fact_half_life_days
+    return days * 86400 * 1000 if days and days > 0 else None
+
+def decayed(weight, decayed_at, now_ms, half_life=None):
+    """Python twin of effective_weight() for weights read back from the graph."""
+    if half_life is None or decayed_at is None:
+        return weight
+    return weight * 0.5 ** ((now_ms - decayed_at) / half_life)
+
+# rows written relations hand back so neighbourhood_cache can patch itself
+RELATION_ROW = """
+        RETURN a.name AS source, r.verb AS relation, b.name AS target,
+               r.user_id AS user_id, r.weight AS weight, r.decayed_at AS decayed_at
+"""
+
+transaction_seconds = metrics.Histogram(
+    "graph_transaction_duration_seconds", "Neo4j transaction time including commit, by unit of work",
+    ("function", "mode"),
+)
+
+def _write(session, fn, *args):
+    started = time.perf_counter()
+    try:
+        return session.execute_write(fn, *args)
+    finally:
+        transaction_seconds.observe(time.perf_counter() - started, fn.__name__, "write")
+
+def _read(session, fn, *args, timeout=None):
+    """Run ``fn`` in a read transaction; with ``timeout`` (seconds) the server aborts it after that long."""
+    started = time.perf_counter()
+    try:
+        return session.execute_read(fn if timeout is None else unit_of_work(timeout=timeout)(fn), *args)
+    finally:
+        transaction_seconds.observe(time.perf_counter() - started, fn.__name__, "read")
+
+def upsert_entity(tx, name, entity_type="Thing", user_id=None):
     tx.run("""
-    MERGE (e:Entity {name: $name})
+    MERGE (e:Entity {user_id: $user_id, name: $name})
     ON CREATE SET e.type = $entity_type
     RETURN e
-    """, name=name, entity_type=entity_type)
+    """, name=name, entity_type=entity_type, user_id=user_id)
 
+# Entities belong to one user and are keyed by (user_id, name); a RELATED edge
+# between them carries the same user_id, so reads can filter on either.
 def upsert_relation(tx, source, relation, target, weight=1.0, user_id=None, session_id=None):
-    tx.run(
+    result = tx.run(
         """
-        MATCH (a:Entity {name: $source}), (b:Entity {name: $target})
-        MERGE (a)-[r:RELATED {verb: $relation}]->(b)
-        ON CREATE SET r.weight = $weight, r.user_id = $user_id, r.session_id = $session_id
-        ON MATCH SET r.weight = r.weight + $weight
-        RETURN r
-        """,
-        source=source, target=target, relation=relation, weight=weight, user_id=user_id, session_id=session_id
+        MATCH (a:Entity {user_id: $user_id, name: $source}), (b:Entity {user_id: $user_id, name: $target})
+        MERGE (a)-[r:RELATED {verb: $relation, user_id: $user_id}]->(b)
+        ON CREATE SET r.weight = $weight, r.session_id = $session_id,
+                      r.decayed_at = timestamp(), r.last_reinforced = timestamp()
+        ON MATCH SET r.weight = """ + effective_weight() + """ + $weight,
+                     r.decayed_at = timestamp(), r.last_reinforced = timestamp()
+        """ + RELATION_ROW,
+        source=source, target=target, relation=relation, weight=weight, user_id=user_id, session_id=session_id,
+        half_life_ms=half_life_ms()
     )
+    return result.data()
+
+def _owner(user_id) -> str:
+    if user_id is None:
+        raise ValueError("facts belong to a user: user_id is required")
+    return str(user_id)
 
 def insert_fact(source_name, relation, target_name, weight=1.0, user_id=None, session_id=None):
+    user_id = _owner(user_id)
+    with driver.session() as session:
+        _write(session, upsert_entity, source_name, "Thing", user_id)
+        _write(session, upsert_entity, target_name, "Thing", user_id)
+        rows = _write(session, upsert_relation, source_name, relation, target_name, weight, user_id, session_id)
+    neighbourhood_cache.apply(rows)
+    publish_facts(user_id, session_id, rows)
+
+# a replayed batch finds its marker and writes nothing, so redelivered messages reinforce once
+APPLIED_MARKER = """
+        MERGE (m:AppliedFacts {key: $marker})
+        ON CREATE SET m.applied_at = timestamp(), m.replayed = false
+        ON MATCH SET m.replayed = true
+        WITH m WHERE NOT m.replayed
+"""
+
+def upsert_facts(tx, facts, user_id=None, session_id=None, marker=None):
+    # one statement per batch: entity upserts and relation merges are folded
+    # into a single UNWIND so N facts cost one round trip instead of 3N
+    result = tx.run(
+        (APPLIED_MARKER if marker is not None else "") + """
+        UNWIND $facts AS fact
+        MERGE (a:Entity {user_id: $user_id, name: fact.source})
+        ON CREATE SET a.type = fact.source_type
+        MERGE (b:Entity {user_id: $user_id, name: fact.target})
+        ON CREATE SET b.type = fact.target_type
+        MERGE (a)-[r:RELATED {verb: fact.relation, user_id: $user_id}]->(b)
+        ON CREATE SET r.weight = fact.weight, r.session_id = $session_id,
+                      r.decayed_at = timestamp(), r.last_reinforced = timestamp()
+        ON MATCH SET r.weight = """ + effective_weight() + """ + fact.weight,
+                     r.decayed_at = timestamp(), r.last_reinforced = timestamp()
+        """ + RELATION_ROW,
+        facts=facts, user_id=user_id, session_id=session_id, marker=marker, half_life_ms=half_life_ms()
+    )
+    return result.data()
+
+def _fact_params(triplet, weight):
+    if isinstance(triplet, dict):
+        source, relation, target = triplet["source"], triplet["relation"], triplet["target"]
+        weight = triplet.get("weight", weight)
+        source_type = triplet.get("source_type", "Thing")
+        target_type = triplet.get("target_type", "Thing")
+    else:
+        source, relation, target = triplet[:3]
+        weight = triplet[3] if len(triplet) > 3 else weight
+        source_type = target_type = "Thing"
+    return {
+        "source": source, "relation": relation, "target": target, "weight": weight,
+        "source_type": source_type, "target_type": target_type,
+    }
+
+def insert_facts(triplets, user_id=None, session_id=None, weight=1.0, batch_size=None, message_id=None):
+    """Insert many (source, relation, target[, weight]) triplets, one transaction per batch.
+
+    Triplets may also be dicts with ``source``/``relation``/``target`` and
+    optional ``weight``, ``source_type`` and ``target_type`` keys. Repeated
+    facts are reinforced exactly as with ``insert_fact``. With
+    ``message_id``, each batch commits an ``AppliedFacts`` marker, and
+    inserting the same message again skips the batches already applied.
+    """
+    batch_size = batch_size or settings.neo4j_fact_batch_size
+    facts = [_fact_params(t, weight) for t in triplets]
+    user_id = _owner(user_id)
+    session_id = str(session_id) if session_id is not None else None
+    with driver.session() as session:
+        for start in range(0, len(facts), batch_size):
+            marker = f"{message_id}:{start}" if message_id is not None else None
+            rows = _write(session, upsert_facts, facts[start:start + batch_size], user_id, session_id, marker)
+            neighbourhood_cache.apply(rows)
+            # the rows carry the reinforced total, not the increment that was added
+            publish_facts(user_id, session_id, rows)
+
+def fetch_user_facts(tx, user_id, limit):
+    result = tx.run(
+        """
+        MATCH (a:Entity)-[r:RELATED {user_id: $user_id}]->(b:Entity)
+        RETURN a.name AS source, r.verb AS relation, b.name AS target,
+               """ + effective_weight() + """ AS weight
+        ORDER BY weight DESC
+        LIMIT $limit
+        """,
+        user_id=user_id, limit=limit, half_life_ms=half_life_ms()
+    )
+    return result.data()
+
+def get_user_facts(user_id, limit=20, timeout=None):
+    """Strongest facts recorded for a user, giving up after ``timeout`` seconds if one is set."""
+    with driver.session() as session:
+        return _read(session, fetch_user_facts, str(user_id), limit, timeout=timeout)
+
+USER_ENTITIES = """
+        MATCH (e:Entity {user_id: $user_id})
+        RETURN e.name AS name, e.type AS entity_type
+        """
+
+USER_RELATIONS = """
+        MATCH (a:Entity)-[r:RELATED {user_id: $user_id}]->(b:Entity)
+        RETURN a.name AS source, r.verb AS relation, b.name AS target,
+               """ + effective_weight() + """ AS weight,
+               r.session_id AS session_id, r.last_reinforced AS last_reinforced
+        """
+
+def stream_user_graph(user_id, batch_size=1000):
+    """Yield ("entity" | "relation", rows) batches of a user's subgraph, entities first.
+
+    Results are pulled from the server ``batch_size`` records at a time and
+    handed on as they arrive, so memory stays flat however large the graph
+    is. Close the generator to abandon the stream early.
+    """
+    queries = (("entity", USER_ENTITIES, {}), ("relation", USER_RELATIONS, {"half_life_ms": half_life_ms()}))
+    with driver.session(fetch_size=batch_size) as session:
+        for kind, query, params in queries:
+            batch = []
+            for record in session.run(query, user_id=str(user_id), **params):
+                batch.append(dict(record))
+                if len(batch) >= batch_size:
+                    yield kind, batch
+                    batch = []
+            if batch:
+                yield kind, batch
+
+def fetch_neighbourhood(tx, user_id, entity, limit):
+    result = tx.run(
+        """
+        MATCH (e:Entity {user_id: $user_id, name: $entity})-[r:RELATED {user_id: $user_id}]-(other:Entity)
+        RETURN startNode(r) = e AS outgoing, r.verb AS relation, other.name AS other,
+               r.weight AS weight, r.decayed_at AS decayed_at
+        ORDER BY """ + effective_weight() + """ DESC
+        LIMIT $limit
+        """,
+        entity=entity, user_id=user_id, limit=limit, half_life_ms=half_life_ms()
+    )
+    return [Edge(**row) for row in result.data()]
+
+def get_entity_neighbourhood(user_id, name, limit=None):
+    """Outgoing and incoming facts of one entity for a user, strongest first.
+
+    Served from neighbourhood_cache when possible; decay is applied on read.
+    """
+    key = neighbourhood_cache.key(user_id, name)
+    edges = neighbourhood_cache.get(key)
+    if edges is None:
+        try:
+            with driver.session() as session:
+                edges = _read(
+                    session, fetch_neighbourhood, str(user_id), name, settings.neighbourhood_max_edges
+                )
+        except BaseException:
+            neighbourhood_cache.abandon(key)
+            raise
+        neighbourhood_cache.fill(key, edges)
+    now, half_life = int(time.time() * 1000), half_life_ms()
+    outgoing, incoming = [], []
+    for edge in edges:
+        weight = decayed(edge.weight, edge.decayed_at, now, half_life)
+        if edge.outgoing:
+            outgoing.append({"relation": edge.relation, "target": edge.other, "weight": weight})
+        else:
+            incoming.append({"source": edge.other, "relation": edge.relation, "weight": weight})
+    outgoing.sort(key=lambda fact: fact["weight"], reverse=True)
+    incoming.sort(key=lambda fact: fact["weight"], reverse=True)
+    return {"entity": name, "outgoing": outgoing[:limit], "incoming": incoming[:limit]}
+
+def compact_relations(tx, cutoff, now, batch_size, threshold):
+    result = tx.run(
+        """
+        MATCH ()-[r:RELATED]->()
+        WHERE r.decayed_at < $cutoff
+        WITH r LIMIT $batch_size
+        SET r.weight = """ + effective_weight("$now") + """, r.decayed_at = $now
+        WITH count(r) AS compacted, collect(CASE WHEN r.weight < $threshold THEN r END) AS doomed
+        FOREACH (r IN doomed | DELETE r)
+        RETURN compacted, size(doomed) AS pruned
+        """,
+        cutoff=cutoff, now=now, batch_size=batch_size, threshold=threshold, half_life_ms=half_life_ms()
+    )
+    record = result.single()
+    return (record["compacted"], record["pruned"]) if record else (0, 0)
+
+def delete_markers(tx, applied_before, batch_size):
+    result = tx.run(
+        """
+        MATCH (m:AppliedFacts) WHERE m.applied_at < $applied_before
+        WITH m LIMIT $batch_size
+        DELETE m
+        RETURN count(*) AS deleted
+        """,
+        applied_before=applied_before, batch_size=batch_size
+    )
+    record = result.single()
+    return record["deleted"] if record else 0
+
+def prune_markers(applied_before_ms, batch_size):
+    """Delete ``AppliedFacts`` markers older than any redelivery, one bounded batch per transaction."""
+    deleted = 0
+    with driver.session() as session:
+        while True:
+            count = _write(session, delete_markers, applied_before_ms, batch_size)
+            deleted += count
+            if count < batch_size:
+                return deleted
+
+def compact_facts(now_ms, min_age_ms, batch_size, threshold, max_batches=None):
+    """Fold decay into stored weights and prune weak edges, one bounded batch per transaction.
+
+    Only edges not folded within ``min_age_ms`` are touched, so a run ends
+    once every edge has been visited. Returns (compacted, pruned).
+    """
+    compacted = pruned = batches = 0
     with driver.session() as session:
-        session.write_transaction(upsert_entity, source_name)
-        session.write_transaction(upsert_entity, target_name)
-        session.write_transaction(upsert_relation, source_name, relation, target_name, weight, user_id, session_id)
+        while max_batches is None or batches < max_batches:
+            count, removed = _write(
+                session, compact_relations, now_ms - min_age_ms, now_ms, batch_size, threshold
+            )
+            compacted += count
+            pruned += removed
+            batches += 1
+            if count < batch_size:
+                break
+    if pruned:
+        neighbourhood_cache.clear()  # pruned edges may sit in cached neighbourhoods
+    return compacted, pruned
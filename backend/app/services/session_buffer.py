@@ -0,0 +1,150 @@
+"""Per-session ring buffers of the most recent chat messages.
+
+``create_chat_message`` appends every stored message to its session's
+buffer, so context assembly can usually read the last N turns without
+touching the database. A session the buffer has not seen is warmed from
+the database on first read. Rows written while that read is in flight are
+merged in, not lost.
+
+A buffer filled only by writes holds just the session's tail. It can
+answer a read only when it already holds as many messages as the reader
+asked for. Idle sessions are evicted least recently used first, under a
+global byte budget. Like the vector index, the buffer is per process: it
+sees only the writes made by its own process.
+"""
+import datetime
+import threading
+import uuid
+from collections import OrderedDict, deque
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from ..core import metrics
+from ..core.config import settings
+
+_SESSION_OVERHEAD = 400
+_MESSAGE_OVERHEAD = 250
+
+
+class BufferedMessage(NamedTuple):
+    """The ChatHistory columns context assembly reads, without the ORM instance."""
+    id: uuid.UUID
+    role: str
+    message_text: str
+    timestamp: Optional[datetime.datetime]
+
+    @classmethod
+    def from_row(cls, row) -> "BufferedMessage":
+        return cls(row.id, row.role, row.message_text, row.timestamp)
+
+
+def _size(message: BufferedMessage) -> int:
+    return _MESSAGE_OVERHEAD + len(message.message_text)
+
+
+def _order(message: BufferedMessage):
+    return (message.timestamp or datetime.datetime.min, message.id)
+
+
+class _Session:
+    __slots__ = ("messages", "complete", "bytes")
+
+    def __init__(self, capacity: int):
+        self.messages: deque = deque(maxlen=capacity)
+        self.complete = False  # True once warmed: holds the whole history up to capacity
+        self.bytes = _SESSION_OVERHEAD
+
+
+class SessionBuffer:
+    def __init__(self, capacity: int, max_bytes: int):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[Tuple[str, str], _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _put(self, entry: _Session, messages: Iterable[BufferedMessage]):
+        merged = {message.id: message for message in entry.messages}
+        merged.update((message.id, message) for message in messages)
+        ordered = sorted(merged.values(), key=_order)[-self.capacity:]
+        self.bytes -= entry.bytes
+        entry.messages.clear()
+        entry.messages.extend(ordered)
+        entry.bytes = _SESSION_OVERHEAD + sum(_size(message) for message in ordered)
+        self.bytes += entry.bytes
+
+    def _entry(self, key) -> _Session:
+        entry = self._sessions.get(key)
+        if entry is None:
+            entry = self._sessions[key] = _Session(self.capacity)
+            self.bytes += entry.bytes
+        self._sessions.move_to_end(key)
+        return entry
+
+    def _evict(self):
+        while len(self._sessions) > 1 and self.bytes > self.max_bytes:
+            _, entry = self._sessions.popitem(last=False)
+            self.bytes -= entry.bytes
+            self.evictions += 1
+
+    def append(self, user_id, session_id, message: BufferedMessage):
+        """Record a message that was just stored."""
+        with self._lock:
+            entry = self._entry((str(user_id), str(session_id)))
+            if entry.messages and _order(message) < _order(entry.messages[-1]):
+                self._put(entry, [message])  # arrived out of order
+            else:
+                if len(entry.messages) == entry.messages.maxlen:
+                    entry.bytes -= _size(entry.messages[0])
+                    self.bytes -= _size(entry.messages[0])
+                entry.messages.append(message)
+                entry.bytes += _size(message)
+                self.bytes += _size(message)
+            self._evict()
+
+    def get(self, user_id, session_id, limit: int) -> Optional[List[BufferedMessage]]:
+        """Up to ``limit`` most recent messages, oldest first, or None if the buffer cannot answer."""
+        with self._lock:
+            entry = self._sessions.get((str(user_id), str(session_id)))
+            if entry is not None and limit <= self.capacity and (entry.complete or len(entry.messages) >= limit):
+                self._sessions.move_to_end((str(user_id), str(session_id)))
+                self.hits += 1
+                return list(entry.messages)[-limit:] if limit else []
+            self.misses += 1
+            return None
+
+    def warm(self, user_id, session_id, rows: Iterable):
+        """Merge the session's latest ``capacity`` rows read from the database."""
+        with self._lock:
+            entry = self._entry((str(user_id), str(session_id)))
+            self._put(entry, [BufferedMessage.from_row(row) for row in rows])
+            entry.complete = True
+            self._evict()
+
+    def discard(self, user_id, session_id):
+        with self._lock:
+            entry = self._sessions.pop((str(user_id), str(session_id)), None)
+            if entry is not None:
+                self.bytes -= entry.bytes
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+session_buffer = SessionBuffer(
+    capacity=settings.session_buffer_size,
+    max_bytes=settings.session_buffer_max_bytes,
+)
+metrics.register("session_buffer", session_buffer.stats)
@@ -0,0 +1,488 @@
+"""Bulk import of chat transcripts from JSONL, streamed and resumable.
+
+Each line of the input is one of two things:
+
+- An Open WebUI chat, as found in its chat export: ``{"id", "chat":
+  {"messages": [...]}}``, or the same with ``messages`` at the top level.
+  The chat id becomes the session id. Ids that are not UUIDs are mapped
+  to a stable UUIDv5.
+- A single message: ``{"session_id", "role", "content", "timestamp"}``.
+  ``chat_id`` and ``message`` are accepted as aliases.
+
+Only ``user`` and ``assistant`` messages are kept. Lines that cannot be
+parsed are counted as skipped and do not stop the import. The output of
+``services.export`` is accepted as well; its non-message lines are ignored.
+
+The input is read in blocks, never as a whole, and cut into chunks of
+about ``chunk_size`` messages on line boundaries. Up to ``workers``
+chunks are embedded and classified concurrently. The writer commits them
+in input order, one transaction per chunk. Each transaction holds three
+writes:
+
+- the chunk's ``chat_history`` rows, with a Postgres ``COPY`` or a
+  SQLite ``executemany``;
+- a ``message_jobs`` row for every user statement, so fact extraction
+  runs on the durable work queue's workers;
+- the ``transcript_imports`` checkpoint: the byte offset just past the
+  chunk's last line.
+
+A chunk is therefore either fully imported or not at all. Re-running an
+interrupted import with the same key skips everything up to the
+checkpoint. The CLI seeks past it; the endpoint discards the re-sent
+prefix. A chunk only commits if the checkpoint is still where its run
+last left it, so two runs of one import never both write it. Extraction
+jobs are only written while the queue's backlog stays under
+``queue_share`` of ``queue_max_depth``, so an import cannot push live
+chat traffic into ``QueueFull``.
+
+From the command line, run from ``backend``::
+
+    python -m app.services.transcript_import chats.jsonl --user someone@example.com
+
+The CLI runs the work queue in-process and waits for it to drain. Jobs it
+leaves behind are picked up by the server's queue.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, List, Optional, Sequence
+
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+
+from ..core import metrics
+from ..core.config import settings
+from ..db import crud
+from ..db.database import AsyncSessionLocal
+from ..db.models import ChatHistory, MessageJob, TranscriptImport
+from ..db.writer import fill_defaults
+from . import vector_index
+from .classifier import STATEMENT, message_classifier
+from .embeddings import EmbeddingService, embedding_service
+from .session_buffer import session_buffer
+from .work_queue import WorkQueue, message_queue
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("user", "assistant")
+EXPORT_LINE_TYPES = ("export", "entity", "relation", "end", "error")  # see services/export
+_SESSION_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "relevantic-recall:transcript-session")
+
+
+class ImportInProgress(Exception):
+    pass
+
+
+class _Chunk:
+    __slots__ = ("rows", "jobs", "lines", "end", "skipped")
+
+    def __init__(self):
+        self.rows: List[dict] = []
+        self.jobs: List[dict] = []
+        self.lines = 0
+        self.end = 0
+        self.skipped = 0
+
+
+async def read_file(path: str, offset: int = 0, block_size: int = 1 << 20) -> AsyncIterator[bytes]:
+    """Blocks of ``path`` from byte ``offset`` on, read off the event loop."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            block = await asyncio.to_thread(f.read, block_size)
+            if not block:
+                return
+            yield block
+
+
+async def _lines(blocks: AsyncIterator[bytes], position: int, resume_at: int):
+    """``(line, end offset)`` for every line of ``blocks`` that ends past ``resume_at``.
+
+    ``position`` is the offset of the first block in the whole transcript.
+    """
+    pending = bytearray()
+    async for block in blocks:
+        pending += block
+        start = 0
+        while True:
+            end = pending.find(b"\n", start)
+            if end == -1:
+                break
+            position += end + 1 - start
+            if position > resume_at:
+                yield bytes(pending[start:end]), position
+            start = end + 1
+        del pending[:start]
+    if pending:
+        position += len(pending)
+        if position > resume_at:
+            yield bytes(pending), position
+
+
+def _session_id(value) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return uuid.uuid5(_SESSION_NAMESPACE, str(value))
+
+
+def _timestamp(value) -> Optional[datetime.datetime]:
+    """Naive UTC, like the rest of the schema, from epoch seconds/milliseconds or ISO 8601."""
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            seconds = value / 1000 if value > 1e11 else value
+            parsed = datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc)
+        elif isinstance(value, str):
+            parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        else:
+            return None
+    except (ValueError, OverflowError, OSError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _text(content) -> str:
+    if isinstance(content, list):  # multimodal messages: keep the text parts
+        content = "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content.strip() if isinstance(content, str) else ""
+
+
+def parse_line(line: bytes, fallback_session: str):
+    """``(session_id, message, default timestamp)`` tuples from one line; raises ``ValueError`` if malformed."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("not a JSON object")
+    if record.get("type") in EXPORT_LINE_TYPES:
+        return []  # header, graph and trailer lines of an export
+    chat = record.get("chat") if isinstance(record.get("chat"), dict) else record
+    if isinstance(chat.get("messages"), list):
+        session = _session_id(record.get("id") or chat.get("id") or fallback_session)
+        started = _timestamp(record.get("created_at") or chat.get("timestamp"))
+        return [(session, message, started) for message in chat["messages"] if isinstance(message, dict)]
+    session = record.get("session_id") or record.get("chat_id")
+    if not session or "role" not in record:
+        raise ValueError("neither a chat nor a message with a session_id")
+    return [(_session_id(session), record, None)]
+
+
+class TranscriptImporter:
+    def __init__(self, chunk_size: int = 1000, workers: int = 4, queue_share: float = 0.5,
+                 embedder: Optional[EmbeddingService] = None, queue: Optional[WorkQueue] = None,
+                 session_factory=None):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.queue_share = queue_share
+        self.embedder = embedder or embedding_service
+        self.queue = queue or message_queue
+        self.session_factory = session_factory or AsyncSessionLocal
+        self._active = set()
+        self.imports = 0
+        self.lines = 0
+        self.messages = 0
+        self.jobs = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.embedding_failures = 0
+        self.throttled_seconds = 0.0
+        self.write_seconds = 0.0
+
+    async def checkpoint(self, user_id, key: str) -> TranscriptImport:
+        """The checkpoint of ``key`` for ``user_id``, created at offset 0 if new."""
+        query = sa.select(TranscriptImport).where(TranscriptImport.user_id == user_id, TranscriptImport.key == key)
+        async with self.session_factory() as db:
+            found = (await db.execute(query)).scalar_one_or_none()
+            if found is not None:
+                return found
+            db.add(TranscriptImport(user_id=user_id, key=key))
+            try:
+                await db.commit()
+            except IntegrityError:  # created concurrently
+                await db.rollback()
+            return (await db.execute(query)).scalar_one()
+
+    async def run(self, user_id, key: str, blocks: AsyncIterator[bytes], position: int = 0) -> dict:
+        """Import ``blocks`` for ``user_id`` under ``key``, resuming after its checkpoint.
+
+        ``position`` is the byte offset at which ``blocks`` starts. It is 0
+        for a re-sent stream, or the checkpoint offset for a file that was
+        already seeked past it. Raises ``ImportInProgress`` if the same
+        import is already running, in this process or, once its checkpoint
+        moves underneath this run, in another one.
+        """
+        token = (str(user_id), key)
+        if token in self._active:
+            raise ImportInProgress(f"import {key!r} is already running")
+        self._active.add(token)
+        started = time.perf_counter()
+        job = await self.checkpoint(user_id, key)
+        resumed_from = job.byte_offset
+        written = 0
+        pending = deque()
+        try:
+            if job.status != "done":
+                self.imports += 1
+                chunks = self._chunks(user_id, key, _lines(blocks, position, job.byte_offset))
+                # up to `workers` chunks are embedded ahead of the writer, which commits them in order
+                async for chunk in chunks:
+                    pending.append(asyncio.create_task(self._prepare(chunk)))
+                    if len(pending) >= self.workers:
+                        written += await self._write(job, await pending.popleft())
+                while pending:
+                    written += await self._write(job, await pending.popleft())
+                async with self.session_factory() as db:
+                    await db.execute(
+                        sa.update(TranscriptImport).where(TranscriptImport.id == job.id)
+                        .values(status="done", updated_at=datetime.datetime.utcnow())
+                    )
+                    await db.commit()
+                job.status = "done"
+        finally:
+            for task in pending:
+                task.cancel()
+            self._active.discard(token)
+            if written:
+                # imported rows are older than the index's watermark; rebuild on the next query
+                vector_index.discard(user_id)
+        return {
+            "key": key,
+            "status": job.status,
+            "resumed_from": resumed_from,
+            "byte_offset": job.byte_offset,
+            "lines": job.lines,
+            "messages": job.messages,
+            "jobs": job.jobs,
+            "skipped": job.skipped,
+            "imported_now": written,
+            "seconds": time.perf_counter() - started,
+        }
+
+    async def _chunks(self, user_id, key: str, lines) -> AsyncIterator[_Chunk]:
+        chunk = _Chunk()
+        last = {}  # session id -> timestamp of its latest message
+        async for line, end in lines:
+            chunk.lines += 1
+            chunk.end = end
+            if line.strip():
+                try:
+                    messages = parse_line(line, f"{key}:{end}")
+                except ValueError as exc:
+                    logger.warning("skipping transcript line ending at byte %d: %s", end, exc)
+                    chunk.skipped += 1
+                    messages = []
+                for session_id, message, default in messages:
+                    role, text = message.get("role"), _text(message.get("content", message.get("message")))
+                    if role not in ROLES or not text:
+                        continue
+                    # keep the original order within a session even when timestamps tie
+                    timestamp = _timestamp(message.get("timestamp")) or last.get(session_id) or default \
+                        or datetime.datetime.utcnow()
+                    if session_id in last and timestamp <= last[session_id]:
+                        timestamp = last[session_id] + datetime.timedelta(microseconds=1)
+                    last[session_id] = timestamp
+                    chunk.rows.append(fill_defaults(ChatHistory, dict(
+                        user_id=user_id, session_id=session_id, message_text=text, role=role,
+                        embedding=None, timestamp=timestamp,
+                        source_metadata=json.dumps({"import": key, "id": message.get("id")}),
+                    )))
+            if len(chunk.rows) >= self.chunk_size:
+                yield chunk
+                chunk = _Chunk()
+        if chunk.lines:
+            yield chunk
+
+    async def _embed(self, texts: Sequence[str]):
+        backend, step = self.embedder.backend, self.embedder.max_batch
+        vectors = []
+        for i in range(0, len(texts), step):
+            vectors.extend(await backend.embed(texts[i:i + step]))
+        return vectors
+
+    async def _prepare(self, chunk: _Chunk) -> _Chunk:
+        if not chunk.rows:
+            return chunk
+        texts = [row["message_text"] for row in chunk.rows]
+        try:
+            for row, vector in zip(chunk.rows, await self._embed(texts)):
+                row["embedding"] = vector
+        except Exception:
+            # like POST /api/chat: a failing backend must not lose the messages
+            logger.exception("embedding an import chunk failed; storing it without embeddings")
+            self.embedding_failures += 1
+        user_rows = [row for row in chunk.rows if row["role"] == "user"]
+        labels = await asyncio.to_thread(message_classifier.classify_many, [row["message_text"] for row in user_rows])
+        chunk.jobs = [
+            fill_defaults(MessageJob, dict(
+                message_id=row["id"], user_id=row["user_id"], session_id=row["session_id"],
+                message_text=row["message_text"], role=row["role"],
+            ))
+            for row, label in zip(user_rows, labels) if label.label == STATEMENT
+        ]
+        return chunk
+
+    async def _throttle(self, jobs: int):
+        """Wait until ``jobs`` more extraction jobs fit in this import's share of the queue."""
+        limit = int(settings.queue_max_depth * self.queue_share)
+        started = time.perf_counter()
+        # an empty queue always takes a chunk, however large
+        while True:
+            backlog = await self.queue.backlog()
+            if backlog == 0 or backlog + jobs <= limit:
+                break
+            await asyncio.sleep(settings.queue_poll_interval_seconds)
+        self.throttled_seconds += time.perf_counter() - started
+
+    async def _write(self, job: TranscriptImport, chunk: _Chunk) -> int:
+        if chunk.jobs:
+            await self._throttle(len(chunk.jobs))
+        started = time.perf_counter()
+        async with self.session_factory() as db:
+            values = dict(
+                byte_offset=chunk.end,
+                lines=TranscriptImport.lines + chunk.lines,
+                messages=TranscriptImport.messages + len(chunk.rows),
+                jobs=TranscriptImport.jobs + len(chunk.jobs),
+                skipped=TranscriptImport.skipped + chunk.skipped,
+                updated_at=datetime.datetime.utcnow(),
+            )
+            # the checkpoint goes first: it opens the transaction that COPY then joins on Postgres.
+            # It only moves from where this run left it, so a second run of the same import
+            # (another worker or process) cannot write the chunk twice.
+            result = await db.execute(
+                sa.update(TranscriptImport)
+                .where(TranscriptImport.id == job.id, TranscriptImport.byte_offset == job.byte_offset)
+                .values(**values)
+            )
+            if result.rowcount == 0:
+                await db.rollback()
+                raise ImportInProgress(f"import {job.key!r} was advanced past byte {job.byte_offset} by another run")
+            connection = await db.connection()
+            await copy_rows(connection, ChatHistory.__table__, chunk.rows)
+            await copy_rows(connection, MessageJob.__table__, chunk.jobs)
+            await db.commit()
+        self.write_seconds += time.perf_counter() - started
+        job.byte_offset = chunk.end
+        job.lines += chunk.lines
+        job.messages += len(chunk.rows)
+        job.jobs += len(chunk.jobs)
+        job.skipped += chunk.skipped
+        self.chunks += 1
+        self.lines += chunk.lines
+        self.messages += len(chunk.rows)
+        self.jobs += len(chunk.jobs)
+        self.skipped += chunk.skipped
+        if chunk.jobs:
+            self.queue.notify()
+        for user_id, session_id in {(row["user_id"], row["session_id"]) for row in chunk.rows}:
+            session_buffer.discard(user_id, session_id)
+        logger.info("import %s: %d lines, %d messages, %d extraction jobs", job.key, job.lines, job.messages, job.jobs)
+        return len(chunk.rows)
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._active),
+            "imports": self.imports,
+            "chunks": self.chunks,
+            "lines": self.lines,
+            "messages": self.messages,
+            "jobs": self.jobs,
+            "skipped": self.skipped,
+            "embedding_failures": self.embedding_failures,
+            "throttled_seconds": self.throttled_seconds,
+            "write_seconds": self.write_seconds,
+        }
+
+
+async def copy_rows(connection, table: sa.Table, rows: List[dict]):
+    """Bulk-insert ``rows`` (all with the same keys) inside ``connection``'s transaction.
+
+    Postgres gets a binary ``COPY`` through the asyncpg connection; values
+    skip SQLAlchemy's bind processing and use the codecs registered on
+    connect (including ``vector``). Other databases get an ``executemany``.
+    """
+    if not rows:
+        return
+    if connection.dialect.name == "postgresql":
+        columns = list(rows[0])
+        raw = (await connection.get_raw_connection()).driver_connection
+        await raw.copy_records_to_table(
+            table.name, records=[tuple(row[column] for column in columns) for row in rows], columns=columns
+        )
+    else:
+        await connection.execute(sa.insert(table), rows)
+
+
+transcript_importer = TranscriptImporter(
+    chunk_size=settings.import_chunk_size,
+    workers=settings.import_workers,
+    queue_share=settings.import_queue_share,
+)
+metrics.register("transcript_import", transcript_importer.stats)
+
+
+async def _find_user(user: str):
+    async with AsyncSessionLocal() as db:
+        try:
+            found = await crud.get_user(db, uuid.UUID(user))
+        except ValueError:
+            found = await crud.get_user_by_email(db, user)
+    if found is None:
+        raise SystemExit(f"no user {user!r}")
+    return found.id
+
+
+async def _import(args):
+    from .extraction import extraction_service
+    from .extraction_cache import extraction_cache
+    from .llm import llm_client
+
+    user_id = await _find_user(args.user)
+    key = args.key or os.path.abspath(args.path)
+    importer = TranscriptImporter(args.chunk_size, args.workers, settings.import_queue_share)
+    job = await importer.checkpoint(user_id, key)
+    if job.status == "done":
+        print(f"{key} was already imported")
+    elif job.byte_offset:
+        print(f"resuming {key} at byte {job.byte_offset} ({job.messages} messages already imported)")
+    await asyncio.to_thread(message_classifier.ensure_trained)
+    if args.process:
+        await message_queue.start()
+    try:
+        summary = await importer.run(user_id, key, read_file(args.path, job.byte_offset), position=job.byte_offset)
+        print(json.dumps(summary))
+        while args.process and args.wait and await message_queue.backlog():
+            print(f"waiting for {message_queue.depth} extraction jobs")
+            await asyncio.sleep(5)
+    finally:
+        await message_queue.stop()
+        await extraction_service.close()
+        extraction_cache.close()
+        await llm_client.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import chat transcripts from a JSONL file")
+    parser.add_argument("path", help="JSONL file: Open WebUI chats or single messages, one per line")
+    parser.add_argument("--user", required=True, help="id or email of the user to import for")
+    parser.add_argument("--key", help="checkpoint name (default: the file's absolute path)")
+    parser.add_argument("--chunk-size", type=int, default=settings.import_chunk_size)
+    parser.add_argument("--workers", type=int, default=settings.import_workers)
+    parser.add_argument("--no-process", dest="process", action="store_false",
+                        help="only queue extraction jobs; leave them to the server's workers")
+    parser.add_argument("--no-wait", dest="wait", action="store_false",
+                        help="exit once the messages are stored, without draining the extraction jobs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_import(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+"""Per-user approximate nearest neighbour search over ChatHistory embeddings.
+
+Each user gets an independent IVF (inverted file) index: vectors are
+clustered around ``sqrt(n)`` k-means centroids and a query scans only the
+``nprobe`` closest clusters. Partitions never share state, so a search can
+only ever return the caller's own messages.
+
+An index is built lazily on a user's first query, loaded from its on-disk
+snapshot when there is one and then caught up from the database. The
+build is a background task shielded from the query that started it: a
+query cancelled at its deadline leaves the build running, and later
+queries wait on the same build until it is done. New messages are
+appended incrementally via ``add`` into preallocated arrays that double
+when full. Messages added while a build is running are held back and
+applied once it installs, since the build's catch-up query may already
+have run without them. Snapshots are written after a build, every
+``persist_every`` additions and on shutdown.
+
+Clustering, snapshot writes and catch-up builds run in worker threads.
+Rows are only ever appended past the end of a snapshot's views and
+retraining installs fresh arrays, so a thread's view stays consistent
+while the event loop keeps adding and searching. Resident indexes are
+evicted least recently used first, under a global byte budget; an
+evicted index is written out and reloaded on its user's next query.
+"""
+import asyncio
+import datetime
+import os
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import sqlalchemy as sa
+
+from ..core import metrics
+from ..core.config import settings
+from ..db.database import AsyncSessionLocal
+from ..db.models import ChatHistory
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _keys(keys) -> np.ndarray:
+    """Pack 16-byte UUIDs into a fixed-width array (``S16`` would strip trailing NULs)."""
+    return np.frombuffer(b"".join(keys), dtype="V16")
+
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+
+def _cluster(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """``sqrt(n)`` centroids for ``vectors`` and each vector's list."""
+    centroids = _kmeans(vectors, max(1, int(np.sqrt(len(vectors)))))
+    return centroids, _assign(vectors, centroids)
+
+
+def _grow(buffer: np.ndarray, capacity: int, size: int) -> np.ndarray:
+    grown = np.empty((capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+    grown[:size] = buffer[:size]
+    return grown
+
+
+def _write(path: str, state: dict):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+    np.savez(tmp, **state)
+    os.replace(tmp, path)
+
+
+class UserIndex:
+    """IVF index over one user's message embeddings (cosine similarity)."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.size = 0
+        self._ids = np.empty(0, dtype="V16")
+        self._sessions = np.empty(0, dtype="V16")
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._assignments = np.empty(0, dtype=np.int32)
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self.watermark: Optional[datetime.datetime] = None
+        self._positions: Dict[bytes, int] = {}
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self.size]
+
+    @property
+    def sessions(self) -> np.ndarray:
+        return self._sessions[:self.size]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self.size]
+
+    @property
+    def assignments(self) -> np.ndarray:
+        return self._assignments[:self.size]
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self._ids, self._sessions, self._vectors, self._assignments)
+        return sum(array.nbytes for array in arrays) + (self.centroids.nbytes if self.centroids is not None else 0)
+
+    def _reserve(self, size: int):
+        if size <= len(self._ids):
+            return
+        capacity = max(size, 2 * len(self._ids), 64)
+        self._ids = _grow(self._ids, capacity, self.size)
+        self._sessions = _grow(self._sessions, capacity, self.size)
+        self._vectors = _grow(self._vectors, capacity, self.size)
+        self._assignments = _grow(self._assignments, capacity, self.size)
+
+    def add(self, ids, sessions, vectors, timestamps=()):
+        """Append rows, skipping ids that are already indexed."""
+        keep = [i for i, key in enumerate(ids) if key not in self._positions]
+        if keep:
+            ids = _keys([ids[i] for i in keep])
+            vectors = _normalize(np.asarray(vectors, dtype=np.float32)[keep])
+            start, end = self.size, self.size + len(keep)
+            self._reserve(end)
+            for offset, key in enumerate(ids):
+                self._positions[bytes(key)] = start + offset
+            self._ids[start:end] = ids
+            self._sessions[start:end] = _keys([sessions[i] for i in keep])
+            self._vectors[start:end] = vectors
+            if self.centroids is not None:
+                self._assignments[start:end] = _assign(vectors, self.centroids)
+            self.size = end
+        for ts in timestamps:
+            if ts is not None and (self.watermark is None or ts > self.watermark):
+                self.watermark = ts
+
+    def needs_training(self) -> bool:
+        return len(self) >= settings.vector_index_min_train and len(self) >= 2 * self.trained_size
+
+    def install(self, centroids: np.ndarray, assignments: np.ndarray):
+        """Switch to a clustering of the first ``len(assignments)`` rows, assigning the rows appended since."""
+        trained = len(assignments)
+        fresh = np.empty(len(self._ids), dtype=np.int32)
+        fresh[:trained] = assignments
+        fresh[trained:self.size] = _assign(self._vectors[trained:self.size], centroids)
+        self._assignments = fresh  # a new array, so snapshots taken earlier stay consistent
+        self.centroids = centroids
+        self.trained_size = trained
+
+    def train(self):
+        self.install(*_cluster(self.vectors))
+
+    def search(self, query, k: int = 10, session_id: Optional[bytes] = None) -> List[Tuple[bytes, float]]:
+        if not len(self):
+            return []
+        query = _normalize(np.asarray(query, dtype=np.float32))
+        mask = None
+        if self.centroids is not None:
+            nprobe = min(settings.vector_index_nprobe, len(self.centroids))
+            probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+            mask = np.isin(self.assignments, probe)
+        if session_id is not None:
+            in_session = self.sessions == _keys([session_id])[0]
+            # a narrow session can fall outside the probed lists; scan all of it then
+            if mask is None or np.count_nonzero(mask & in_session) < k:
+                mask = in_session
+            else:
+                mask &= in_session
+        candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if not len(candidates):
+            return []
+        scores = self.vectors[candidates] @ query
+        top = min(k, len(candidates))
+        best = np.argpartition(-scores, top - 1)[:top]
+        best = best[np.argsort(-scores[best])]
+        return [(bytes(self.ids[candidates[i]]), float(scores[i])) for i in best]
+
+    def state(self) -> dict:
+        """The arrays ``save`` writes, as views that later appends do not touch."""
+        return dict(
+            ids=self.ids,
+            sessions=self.sessions,
+            vectors=self.vectors,
+            centroids=self.centroids if self.centroids is not None else np.empty((0, self.dim), np.float32),
+            assignments=self.assignments,
+            trained_size=np.int64(self.trained_size),
+            watermark=np.array(self.watermark.isoformat() if self.watermark else ""),
+        )
+
+    def save(self, path: str):
+        _write(path, self.state())
+
+    @classmethod
+    def load(cls, path: str, dim: int) -> "UserIndex":
+        index = cls(dim)
+        with np.load(path) as data:
+            index._ids = data["ids"]
+            index._sessions = data["sessions"]
+            index._vectors = data["vectors"]
+            index.size = len(index._ids)
+            if len(data["centroids"]):
+                index.centroids = data["centroids"]
+                index._assignments = data["assignments"]
+            else:
+                index._assignments = np.empty(index.size, dtype=np.int32)
+            index.trained_size = int(data["trained_size"])
+            watermark = str(data["watermark"])
+        index.watermark = datetime.datetime.fromisoformat(watermark) if watermark else None
+        index._positions = {bytes(key): i for i, key in enumerate(index.ids)}
+        return index
+
+
+class VectorIndex:
+    """Registry of lazily built per-user indexes."""
+
+    def __init__(self, directory: str, dim: int, max_bytes: int, persist_every: int = 256):
+        self.directory = directory
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.persist_every = persist_every
+        self._indexes: "OrderedDict[uuid.UUID, UserIndex]" = OrderedDict()
+        self._pending: Dict[uuid.UUID, int] = {}
+        self._builds: Dict[uuid.UUID, asyncio.Task] = {}
+        self._held: Dict[uuid.UUID, List[tuple]] = {}  # add() calls made while the user's build runs
+        self._training: Set[uuid.UUID] = set()
+        self._saving: Set[uuid.UUID] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._epochs: Dict[uuid.UUID, int] = {}  # bumped by discard, to drop work started before it
+        self.bytes = 0
+        self.builds = 0
+        self.trainings = 0
+        self.saves = 0
+        self.evictions = 0
+        self.failures = 0
+
+    def _path(self, user_id: uuid.UUID) -> str:
+        return os.path.join(self.directory, f"{user_id.hex}.npz")
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _build(self, user_id: uuid.UUID, rows) -> UserIndex:
+        path = self._path(user_id)
+        index = UserIndex.load(path, self.dim) if os.path.exists(path) else UserIndex(self.dim)
+        if rows:
+            index.add(
+                [row.id.bytes for row in rows],
+                [row.session_id.bytes for row in rows],
+                np.stack([row.embedding for row in rows]),
+                [row.timestamp for row in rows],
+            )
+            if index.needs_training():
+                index.train()
+            self._save(user_id, index)
+        return index
+
+    async def _load(self, user_id: uuid.UUID) -> UserIndex:
+        index = self._indexes.get(user_id)
+        if index is not None:
+            self._indexes.move_to_end(user_id)
+            return index
+        build = self._builds.get(user_id)
+        if build is None:
+            self._held[user_id] = []
+            build = self._builds[user_id] = self._spawn(self._load_in_background(user_id))
+        # a caller cancelled at its deadline must not take the build down with it
+        return await asyncio.shield(build)
+
+    async def _load_in_background(self, user_id: uuid.UUID) -> UserIndex:
+        epoch = self._epochs.get(user_id, 0)
+        try:
+            # pick up anything written since the snapshot (or everything, on first build)
+            query = sa.select(
+                ChatHistory.id, ChatHistory.session_id, ChatHistory.embedding, ChatHistory.timestamp
+            ).where(ChatHistory.user_id == user_id, ChatHistory.embedding.isnot(None))
+            watermark = await asyncio.to_thread(self._watermark, user_id)
+            if watermark is not None:
+                query = query.where(ChatHistory.timestamp >= watermark)
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(query)).all()
+            index = await asyncio.to_thread(self._build, user_id, rows)
+        except Exception:
+            self.failures += 1
+            logger.exception("building the vector index of user %s failed", user_id)
+            raise
+        finally:
+            self._builds.pop(user_id, None)
+            held = self._held.pop(user_id, [])
+        self.builds += 1
+        if self._epochs.get(user_id, 0) != epoch:
+            self._remove(user_id)  # discarded mid-build: answer, but keep neither index nor snapshot
+            return index
+        self._indexes[user_id] = index
+        self.bytes += index.nbytes
+        # rows the catch-up query already returned are skipped by id
+        for args in held:
+            self.add(user_id, *args)
+        self._evict()
+        return index
+
+    def _watermark(self, user_id: uuid.UUID) -> Optional[datetime.datetime]:
+        path = self._path(user_id)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            watermark = str(data["watermark"])
+        return datetime.datetime.fromisoformat(watermark) if watermark else None
+
+    def _save(self, user_id: uuid.UUID, index: UserIndex):
+        os.makedirs(self.directory, exist_ok=True)
+        index.save(self._path(user_id))
+        self._pending[user_id] = 0
+        self.saves += 1
+
+    async def _save_in_background(self, user_id: uuid.UUID, state: dict):
+        epoch = self._epochs.get(user_id, 0)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            await asyncio.to_thread(_write, self._path(user_id), state)
+            self.saves += 1
+            if self._epochs.get(user_id, 0) != epoch:
+                self._remove(user_id)
+        except Exception:
+            self.failures += 1
+            logger.exception("saving the vector index of user %s failed", user_id)
+        finally:
+            self._saving.discard(user_id)
+
+    def _persist(self, user_id: uuid.UUID, index: UserIndex):
+        """Write a snapshot from a worker thread, at most one at a time per user."""
+        if user_id in self._saving:
+            return  # still counted as pending, so a later add retries
+        self._saving.add(user_id)
+        self._pending[user_id] = 0
+        self._spawn(self._save_in_background(user_id, index.state()))
+
+    async def _train_in_background(self, user_id: uuid.UUID, index: UserIndex):
+        try:
+            clustering = await asyncio.to_thread(_cluster, index.vectors)
+            before = index.nbytes
+            index.install(*clustering)
+            if self._indexes.get(user_id) is index:
+                self.bytes += index.nbytes - before
+            self.trainings += 1
+        except Exception:
+            self.failures += 1
+            logger.exception("training the vector index of user %s failed", user_id)
+        finally:
+            self._training.discard(user_id)
+
+    def _evict(self):
+        while len(self._indexes) > 1 and self.bytes > self.max_bytes:
+            user_id, index = self._indexes.popitem(last=False)
+            self.bytes -= index.nbytes
+            if self._pending.pop(user_id, 0):
+                self._persist(user_id, index)
+            self.evictions += 1
+
+    async def search(
+        self, user_id: uuid.UUID, query, k: int = 10, session_id: Optional[uuid.UUID] = None
+    ) -> List[Tuple[uuid.UUID, float]]:
+        """Return up to ``k`` (message id, cosine similarity) pairs, best first."""
+        index = await self._load(user_id)
+        hits = index.search(query, k, session_id.bytes if session_id is not None else None)
+        return [(uuid.UUID(bytes=key), score) for key, score in hits]
+
+    def add(self, user_id: uuid.UUID, message_id: uuid.UUID, session_id: uuid.UUID, embedding, timestamp=None):
+        """Index a newly stored message if the user's index is loaded or being built.
+
+        Unloaded users are skipped; their next query catches up from the database.
+        """
+        index = self._indexes.get(user_id)
+        if index is None:
+            if user_id in self._held:
+                self._held[user_id].append((message_id, session_id, embedding, timestamp))
+            return
+        self._indexes.move_to_end(user_id)
+        before = index.nbytes
+        index.add([message_id.bytes], [session_id.bytes], np.asarray(embedding)[None, :], [timestamp])
+        self.bytes += index.nbytes - before
+        if index.needs_training() and user_id not in self._training:
+            self._training.add(user_id)
+            self._spawn(self._train_in_background(user_id, index))
+        self._pending[user_id] = self._pending.get(user_id, 0) + 1
+        if self._pending[user_id] >= self.persist_every:
+            self._persist(user_id, index)
+        if self.bytes > self.max_bytes:
+            self._evict()
+
+    def discard(self, user_id: uuid.UUID):
+        """Forget a user's index and snapshot, e.g. after back-dated rows were bulk-inserted.
+
+        The watermark only catches up on rows newer than the snapshot, so
+        the next query rebuilds the index from the database instead.
+        """
+        self._epochs[user_id] = self._epochs.get(user_id, 0) + 1
+        index = self._indexes.pop(user_id, None)
+        if index is not None:
+            self.bytes -= index.nbytes
+        self._pending.pop(user_id, None)
+        if user_id in self._held:
+            self._held[user_id] = []  # the build in flight is dropped anyway
+        self._remove(user_id)
+
+    def _remove(self, user_id: uuid.UUID):
+        try:
+            os.remove(self._path(user_id))
+        except FileNotFoundError:
+            pass
+
+    def save_all(self):
+        for user_id, pending in list(self._pending.items()):
+            if pending and user_id in self._indexes:
+                self._save(user_id, self._indexes[user_id])
+
+    async def close(self):
+        """Wait for background training and snapshot writes, then save what is still pending."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.to_thread(self.save_all)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._indexes),
+            "vectors": sum(len(index) for index in self._indexes.values()),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "builds": self.builds,
+            "trainings": self.trainings,
+            "building": len(self._builds),
+            "training": len(self._training),
+            "saves": self.saves,
+            "evictions": self.evictions,
+            "failures": self.failures,
+        }
+
+
+index = VectorIndex(settings.vector_index_dir, settings.embedding_dim, settings.vector_index_max_bytes)
+metrics.register("vector_index", index.stats)
+
+
+async def search(user_id, query, k=10, session_id=None):
+    return await index.search(user_id, query, k, session_id)
+
+
+def add(user_id, message_id, session_id, embedding, timestamp=None):
+    index.add(user_id, message_id, session_id, embedding, timestamp)
+
+
+def discard(user_id):
+    index.discard(user_id)
+
+
+def save_all():
+    index.save_all()
+
+
+async def close():
+    await index.close()
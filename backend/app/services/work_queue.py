@@ -0,0 +1,243 @@
+"""Durable, bounded work queue for background message processing.
+
+Jobs live in the ``message_jobs`` table, so queued work survives restarts.
+A dispatcher claims due jobs by leasing them (``status='running'`` with a
+``locked_until`` deadline) and runs them on a bounded pool of asyncio
+tasks. A job whose worker died is re-delivered once its lease lapses.
+Each job is keyed by its chat message id, so the same message is never
+queued twice and a stale worker cannot overwrite a newer attempt. Failures
+are retried with exponential backoff, up to ``queue_max_attempts``; after
+that the job is parked as ``failed``.
+
+Producers insert the job row themselves, in the same transaction as the
+message it belongs to, inside ``reserve()``. That is refused with
+``QueueFull`` once the backlog reaches ``queue_max_depth``; callers turn
+that into a 503.
+
+Delivery is at least once, so the handler receives the message id and
+must make its side effects idempotent per message (fact inserts are).
+"""
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, Set
+
+import sqlalchemy as sa
+
+from ..core import metrics
+from ..core.config import settings
+from ..db import crud
+from ..db.database import AsyncSessionLocal
+from ..db.models import MessageJob
+
+logger = logging.getLogger(__name__)
+
+_BACKLOG = sa.select(sa.func.count()).select_from(MessageJob).where(MessageJob.status.in_(("pending", "running")))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class WorkQueue:
+    def __init__(self, handler: Callable[..., Awaitable], concurrency: int, max_depth: int):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.depth = 0
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+        self.errors = 0
+        self._latencies = deque(maxlen=1024)  # enqueue -> done, seconds
+        self._durations = deque(maxlen=1024)  # handler run time, seconds
+        self._tasks: Set[asyncio.Task] = set()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    # producer side
+
+    @contextlib.asynccontextmanager
+    async def reserve(self):
+        """Count one job that the block inserts; raises ``QueueFull`` under backpressure.
+
+        The count is given back if the block fails, and the dispatcher is
+        woken once it succeeds.
+        """
+        self.check_capacity()
+        self.depth += 1
+        try:
+            yield
+        except BaseException:
+            self.depth -= 1
+            raise
+        self.notify()
+
+    def notify(self):
+        """Wake the dispatcher; for producers that insert ``message_jobs`` rows themselves."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def backlog(self) -> int:
+        """Refresh ``depth`` from the table: jobs pending or running, across every process."""
+        async with AsyncSessionLocal() as db:
+            self.depth = (await db.execute(_BACKLOG)).scalar_one()
+        return self.depth
+
+    def check_capacity(self):
+        if self.depth >= self.max_depth:
+            self.rejected += 1
+            raise QueueFull(f"message queue is full ({self.depth} jobs pending)")
+
+    # consumer side
+
+    def _claimable(self, now):
+        return sa.or_(
+            sa.and_(MessageJob.status == "pending", MessageJob.available_at <= now),
+            sa.and_(MessageJob.status == "running", MessageJob.locked_until < now),
+        )
+
+    async def _claim(self, limit: int):
+        now = datetime.datetime.utcnow()
+        lease = now + datetime.timedelta(seconds=settings.queue_visibility_timeout_seconds)
+        claimed = []
+        async with AsyncSessionLocal() as db:
+            self.depth = (await db.execute(_BACKLOG)).scalar_one()
+            candidates = (await db.execute(
+                sa.select(MessageJob.id).where(self._claimable(now))
+                .order_by(MessageJob.available_at).limit(limit)
+            )).scalars().all()
+            for job_id in candidates:
+                # conditional update: only one dispatcher (or process) wins each job
+                result = await db.execute(
+                    sa.update(MessageJob)
+                    .where(MessageJob.id == job_id, self._claimable(now))
+                    .values(status="running", attempts=MessageJob.attempts + 1, locked_until=lease)
+                )
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            await db.commit()
+            if not claimed:
+                return []
+            return (await db.execute(sa.select(MessageJob).where(MessageJob.id.in_(claimed)))).scalars().all()
+
+    async def _finish(self, job: MessageJob, **values):
+        # guard on the attempt number so a worker whose lease lapsed cannot clobber a re-delivery
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                sa.update(MessageJob)
+                .where(MessageJob.id == job.id, MessageJob.status == "running", MessageJob.attempts == job.attempts)
+                .values(locked_until=None, **values)
+            )
+            await db.commit()
+
+    async def _run_job(self, job: MessageJob):
+        started = time.perf_counter()
+        try:
+            await self.handler(job.session_id, job.user_id, job.message_text, job.role, message_id=job.message_id)
+        except asyncio.CancelledError:
+            # shutting down: hand the job straight back instead of waiting out the lease
+            await self._finish(job, status="pending", attempts=job.attempts - 1)
+            raise
+        except Exception as exc:
+            logger.warning("message job %s attempt %d failed: %r", job.id, job.attempts, exc)
+            if job.attempts >= settings.queue_max_attempts:
+                self.failed += 1
+                await self._finish(job, status="failed", last_error=repr(exc), finished_at=datetime.datetime.utcnow())
+            else:
+                self.retried += 1
+                delay = min(
+                    settings.queue_retry_base_seconds * 2 ** (job.attempts - 1),
+                    settings.queue_retry_max_seconds,
+                )
+                await self._finish(
+                    job, status="pending", last_error=repr(exc),
+                    available_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=delay),
+                )
+        else:
+            finished = datetime.datetime.utcnow()
+            await self._finish(job, status="done", finished_at=finished)
+            self.processed += 1
+            self._durations.append(time.perf_counter() - started)
+            self._latencies.append((finished - job.created_at).total_seconds())
+
+    async def _dispatch(self):
+        while not self._stopping:
+            free = self.concurrency - len(self._tasks)
+            jobs = []
+            if free > 0:
+                try:
+                    jobs = await self._claim(free)
+                except Exception:
+                    logger.exception("claiming message jobs failed")
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._job_done)
+            if (not jobs or len(jobs) < free) and not self._stopping:
+                # idle, or every worker slot is busy: sleep until a job finishes or new work arrives
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.queue_poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _job_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # handler errors are retried inside _run_job; this is bookkeeping (e.g. _finish) failing
+            self.errors += 1
+            logger.error("message job task failed", exc_info=task.exception())
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._dispatcher is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self, grace: float = 10.0):
+        """Stop claiming, give running jobs ``grace`` seconds, then hand the rest back."""
+        if self._dispatcher is not None:
+            # let a claim in progress commit: cancelling it mid-transaction can leave the row locks
+            # (or, on SQLite, the database lock) held by a connection nobody is using any more
+            self._stopping = True
+            self._wakeup.set()
+            await self._dispatcher
+            self._dispatcher = None
+        if self._tasks:
+            done, pending = await asyncio.wait(set(self._tasks), timeout=grace)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "in_flight": len(self._tasks),
+            "concurrency": self.concurrency,
+            "processed": self.processed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "latency_p50_seconds": metrics.percentile(self._latencies, 0.5),
+            "latency_p95_seconds": metrics.percentile(self._latencies, 0.95),
+            "processing_p50_seconds": metrics.percentile(self._durations, 0.5),
+            "processing_p95_seconds": metrics.percentile(self._durations, 0.95),
+        }
+
+
+message_queue = WorkQueue(
+    crud.process_message_async,
+    concurrency=settings.queue_workers,
+    max_depth=settings.queue_max_depth,
+)
+metrics.register("message_queue", message_queue.stats)
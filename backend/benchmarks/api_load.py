@@ -0,0 +1,236 @@
+"""Concurrent load benchmark for the main API endpoints, with baseline comparison.
+
+The app runs in-process behind httpx's ASGI transport, including its
+startup and shutdown hooks. It uses a throwaway aiosqlite database, the
+hashing embedder and the in-process graph stand-in. JWTs are minted with
+``create_access_token``, so no OAuth round trip is needed. Requests are
+drawn from a weighted, seeded mix of:
+
+- ``chat``: ``POST /api/chat/``
+- ``context``: ``GET /api/context/{session_id}``
+- ``resolve``: ``POST /api/entity/resolve``
+
+Throughput and p50/p95/p99 are reported per endpoint. Run from ``backend``::
+
+    python -m benchmarks.api_load --requests 3000 --concurrency 32
+    python -m benchmarks.api_load --output results.json --baseline benchmarks/baselines/api_load.json
+    python -m benchmarks.api_load --save-baseline benchmarks/baselines/api_load.json
+
+A baseline only means something on the machine it was recorded on.
+Re-record it with ``--save-baseline`` before comparing changes on new
+hardware. With ``--baseline``, the exit status is 1 when any endpoint's p95
+or p99 rose by more than ``--tolerance``, or its throughput fell by more
+than that.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+ENTITY_NAMES = ["Ann", "Bob", "Acme", "Berlin", "Tea", "Oslo", "Globex", "Carol", "Python", "Lisbon"]
+MESSAGES = [
+    "My sister {a} works at {b}.",
+    "I moved to {b} last year with {a}.",
+    "Where does {a} live?",
+    "{a} really likes {b}.",
+    "thanks!",
+    "What did I say about {b}?",
+]
+
+
+def _configure(tmp, args):
+    """Point settings at throwaway stores; must run before ``app`` is imported."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tmp}/bench.db?timeout=30")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["VECTOR_INDEX_DIR"] = f"{tmp}/vector_index"
+    os.environ["EMBEDDING_BACKEND"] = "hashing"
+    os.environ["QUEUE_MAX_DEPTH"] = str(max(10000, args.requests * 2))
+
+
+def _percentiles(latencies):
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99)}
+
+
+async def _seed(args, rng):
+    from app.core.security import create_access_token
+    from app.db import crud
+    from app.db.database import AsyncSessionLocal
+    from app.schemas.user import UserCreate
+    from app.services import neo4j_client
+
+    users = []
+    async with AsyncSessionLocal() as db:
+        for name in ENTITY_NAMES:
+            await crud.create_entity(db, name, name, "Thing")
+        for i in range(args.users):
+            user = await crud.create_user(db, UserCreate(
+                email=f"bench{i}-{uuid.uuid4().hex[:8]}@example.com", provider="bench", provider_id=uuid.uuid4().hex,
+            ))
+            users.append({
+                "id": user.id,
+                "headers": {"Authorization": f"Bearer {create_access_token(str(user.id))}"},
+                "sessions": [uuid.uuid4() for _ in range(args.sessions)],
+            })
+    for user in users:
+        facts = [(rng.choice(ENTITY_NAMES), "RELATED_TO", rng.choice(ENTITY_NAMES)) for _ in range(args.facts)]
+        await asyncio.to_thread(neo4j_client.insert_facts, facts, user["id"], user["sessions"][0])
+    return users
+
+
+def _request(kind, user, rng):
+    session_id = str(rng.choice(user["sessions"]))
+    a, b = rng.sample(ENTITY_NAMES, 2)
+    if kind == "chat":
+        message = rng.choice(MESSAGES).format(a=a, b=b)
+        return "POST", "/api/chat/", {"session_id": session_id, "message": message}
+    if kind == "context":
+        return "GET", f"/api/context/{session_id}", None
+    return "POST", "/api/entity/resolve", {"mention": rng.choice([a, a.lower(), "Unknown Person"])}
+
+
+async def run(args):
+    import httpx
+
+    from app.db.database import engine
+    from app.db.models import Base
+    from app.main import app
+    from app.services import neo4j_client
+
+    from .graph_standin import StandInGraph
+
+    neo4j_client.driver = StandInGraph(rtt=args.graph_rtt_ms / 1000)
+    rng = random.Random(args.seed)
+    mix = dict(part.split("=") for part in args.mix.split(","))
+    kinds, weights = list(mix), [float(weight) for weight in mix.values()]
+
+    # tables must exist before startup: the message queue starts polling immediately
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if engine.dialect.name == "sqlite":
+            # readers never block the writers; without WAL the queue and chat writer time out on the lock
+            await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    async with app.router.lifespan_context(app):
+        users = await _seed(args, rng)
+        plan = [(rng.choices(kinds, weights)[0], rng.choice(users)) for _ in range(args.warmup + args.requests)]
+        requests = [(kind, user, _request(kind, user, rng)) for kind, user in plan]
+        results = {kind: {"latencies": [], "errors": 0} for kind in kinds}
+        cursor = iter(enumerate(requests))
+
+        async def client(http):
+            for i, (kind, user, (method, url, body)) in cursor:
+                started = time.perf_counter()
+                try:
+                    response = await http.request(method, url, headers=user["headers"], json=body)
+                    failed = response.status_code >= 400
+                except Exception:  # the ASGI transport re-raises unhandled app errors
+                    failed = True
+                elapsed = time.perf_counter() - started
+                if i < args.warmup:
+                    continue
+                results[kind]["latencies"].append(elapsed)
+                if failed:
+                    results[kind]["errors"] += 1
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+            wall = time.perf_counter()
+            await asyncio.gather(*(client(http) for _ in range(args.concurrency)))
+            wall = time.perf_counter() - wall
+
+    endpoints = {}
+    for kind, result in results.items():
+        endpoints[kind] = {
+            "requests": len(result["latencies"]),
+            "errors": result["errors"],
+            "throughput_rps": len(result["latencies"]) / wall,
+            **_percentiles(result["latencies"]),
+        }
+    return {
+        "benchmark": "api_load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "baseline", "save_baseline")},
+        "wall_seconds": wall,
+        "endpoints": endpoints,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of ``results`` against ``baseline``."""
+    regressions = []
+    for kind, current in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(kind)
+        if not previous:
+            continue
+        for key in ("p95_ms", "p99_ms"):
+            if previous[key] and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{kind} {key} {previous[key]:.1f} -> {current[key]:.1f}")
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{kind} throughput {previous['throughput_rps']:.0f} -> {current['throughput_rps']:.0f} req/s"
+            )
+    return regressions
+
+
+def report(results, baseline=None):
+    print(f"{'endpoint':<10} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for kind, row in results["endpoints"].items():
+        line = (f"{kind:<10} {row['requests']:>6} {row['errors']:>4} {row['throughput_rps']:>8.0f} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+        previous = (baseline or {}).get("endpoints", {}).get(kind)
+        if previous and previous["p99_ms"]:
+            line += f"   p99 {(row['p99_ms'] / previous['p99_ms'] - 1) * 100:+.0f}% vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default="chat=4,context=3,resolve=3", help="endpoint=weight,...")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=3, help="sessions per user")
+    parser.add_argument("--facts", type=int, default=200, help="graph facts seeded per user")
+    parser.add_argument("--graph-rtt-ms", type=float, default=1.0, help="stand-in round trip per transaction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a stored results file")
+    parser.add_argument("--save-baseline", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.35, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure(tmp, args)
+        results = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
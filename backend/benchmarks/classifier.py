@@ -0,0 +1,118 @@
+"""Accuracy and throughput of the local message classifier, and the LLM calls it saves.
+
+Accuracy is measured by k-fold cross-validation on the bundled sample set.
+Each fold's model is trained on the other folds only, with the rules
+applied as in production. Throughput is measured for one message per call
+and for whole batches.
+
+The last section replays the sample set as concurrent messages. It counts
+LLM calls for two pipelines: the original one, with one classification
+and one extraction call per message, and the routed one, where only
+statements reach a batched extractor. The extractor is a stub that sleeps
+``--llm-ms`` per call. Run from ``backend``::
+
+    python -m benchmarks.classifier --folds 5 --llm-ms 400
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.classifier import LABELS, STATEMENT, MessageClassifier, load_samples
+from app.services.extraction import ExtractionService
+
+
+class SleepingExtractor:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def extract(self, statements):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return [[] for _ in statements]
+
+
+def cross_validate(texts, labels, folds, seed):
+    order = list(range(len(texts)))
+    random.Random(seed).shuffle(order)
+    confusion = {(truth, predicted): 0 for truth in LABELS for predicted in LABELS}
+    decided_by = {}
+    for k in range(folds):
+        held_out = order[k::folds]
+        held = set(held_out)
+        train = [i for i in order if i not in held]
+        model = MessageClassifier().fit([texts[i] for i in train], [labels[i] for i in train])
+        for i, result in zip(held_out, model.classify_many([texts[i] for i in held_out])):
+            confusion[labels[i], result.label] += 1
+            rule = result.rule or "model"
+            decided_by[rule] = decided_by.get(rule, 0) + 1
+    return confusion, decided_by
+
+
+def throughput(model, texts, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            model.classify(text)
+    single = repeat * len(texts) / (time.perf_counter() - started)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        model.classify_many(texts)
+    batched = repeat * len(texts) / (time.perf_counter() - started)
+    return single, batched
+
+
+async def replay(model, texts, args):
+    backend = SleepingExtractor(args.llm_ms / 1000)
+    service = ExtractionService(backend, window=args.window_ms / 1000, max_batch=args.max_batch)
+    statements = [text for text, result in zip(texts, model.classify_many(texts)) if result.label == STATEMENT]
+    started = time.perf_counter()
+    await asyncio.gather(*(service.extract(text) for text in statements))
+    elapsed = time.perf_counter() - started
+    await service.close()
+    return len(statements), backend.calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the sample set for throughput")
+    parser.add_argument("--llm-ms", type=float, default=400.0, help="simulated extraction call latency")
+    parser.add_argument("--window-ms", type=float, default=50.0)
+    parser.add_argument("--max-batch", type=int, default=16)
+    args = parser.parse_args()
+
+    texts, labels = load_samples()
+    print(f"{len(texts)} samples: " + ", ".join(f"{label} {labels.count(label)}" for label in LABELS))
+
+    confusion, decided_by = cross_validate(texts, labels, args.folds, args.seed)
+    correct = sum(confusion[label, label] for label in LABELS)
+    print(f"\n{args.folds}-fold accuracy {correct / len(texts):.1%}   decided by "
+          + ", ".join(f"{rule} {count}" for rule, count in sorted(decided_by.items())))
+    print(f"{'truth':<10} " + " ".join(f"{label:>10}" for label in LABELS) + f" {'recall':>8}")
+    for truth in LABELS:
+        row = [confusion[truth, predicted] for predicted in LABELS]
+        print(f"{truth:<10} " + " ".join(f"{count:>10}" for count in row)
+              + f" {confusion[truth, truth] / max(sum(row), 1):>8.1%}")
+    for label in LABELS:
+        predicted = sum(confusion[truth, label] for truth in LABELS)
+        print(f"precision {label:<10} {confusion[label, label] / max(predicted, 1):.1%}")
+
+    model = MessageClassifier()
+    started = time.perf_counter()
+    model.fit(texts, labels)
+    print(f"\ntraining on all samples: {(time.perf_counter() - started) * 1000:.0f} ms")
+    single, batched = throughput(model, texts, args.repeat)
+    print(f"throughput: {single:,.0f} msg/s one at a time, {batched:,.0f} msg/s batched")
+
+    statements, calls, elapsed = asyncio.run(replay(model, texts, args))
+    print(f"\nreplaying {len(texts)} messages with a {args.llm_ms:.0f} ms extractor:")
+    print(f"  LLM per message (classify + extract): {2 * len(texts)} calls")
+    print(f"  local classifier + batched extraction: {calls} calls for {statements} statements, "
+          f"{elapsed:.2f} s wall")
+
+
+if __name__ == "__main__":
+    main()
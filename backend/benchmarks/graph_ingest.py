@@ -0,0 +1,77 @@
+"""Compare per-fact and batched fact ingestion.
+
+Run from ``backend``::
+
+    python -m benchmarks.graph_ingest --facts 2000 --rtt-ms 1
+    python -m benchmarks.graph_ingest --neo4j-uri bolt://localhost:7687 --neo4j-password ...
+
+Without ``--neo4j-uri`` the in-process stand-in from ``graph_standin`` is used.
+"""
+import argparse
+import random
+import time
+
+from app.services import neo4j_client
+
+from .graph_standin import StandInGraph
+
+VERBS = ["LIKES", "KNOWS", "LOCATED_IN", "WORKS_AT", "OWNS"]
+
+
+def make_triplets(count, entities, seed=0):
+    rng = random.Random(seed)
+    names = [f"bench-entity-{i}" for i in range(entities)]
+    return [(rng.choice(names), rng.choice(VERBS), rng.choice(names)) for _ in range(count)]
+
+
+def run_per_fact(triplets, user_id, session_id):
+    for source, relation, target in triplets:
+        neo4j_client.insert_fact(source, relation, target, user_id=user_id, session_id=session_id)
+
+
+def run_batched(triplets, user_id, session_id, batch_size):
+    neo4j_client.insert_facts(triplets, user_id=user_id, session_id=session_id, batch_size=batch_size)
+
+
+def timed(label, fn, facts):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:10.1f} ms  {facts / elapsed:12.0f} facts/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--facts", type=int, default=2000)
+    parser.add_argument("--entities", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, action="append")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="stand-in round trip per transaction")
+    parser.add_argument("--neo4j-uri")
+    parser.add_argument("--neo4j-user", default="neo4j")
+    parser.add_argument("--neo4j-password", default="")
+    args = parser.parse_args()
+
+    if args.neo4j_uri:
+        from neo4j import GraphDatabase
+        neo4j_client.driver = GraphDatabase.driver(args.neo4j_uri, auth=(args.neo4j_user, args.neo4j_password))
+        describe = args.neo4j_uri
+    else:
+        neo4j_client.driver = StandInGraph(rtt=args.rtt_ms / 1000)
+        describe = f"in-process stand-in, {args.rtt_ms} ms per transaction"
+
+    triplets = make_triplets(args.facts, args.entities)
+    print(f"{args.facts} facts over {args.entities} entities ({describe})")
+    baseline = timed("per-fact", lambda: run_per_fact(triplets, "bench-user", "bench-per-fact"), args.facts)
+    for batch_size in args.batch_size or [100, 500, 1000]:
+        elapsed = timed(
+            f"batched ({batch_size})",
+            lambda: run_batched(triplets, "bench-user", "bench-batched", batch_size),
+            args.facts,
+        )
+        print(f"{'':<24} {baseline / elapsed:10.1f}x faster")
+    neo4j_client.driver.close()
+
+
+if __name__ == "__main__":
+    main()
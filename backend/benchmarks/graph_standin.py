@@ -0,0 +1,211 @@
+"""In-process stand-in for the Neo4j driver used by ``app.services.neo4j_client``.
+
+It does not parse Cypher. Each unit-of-work function in ``neo4j_client`` is
+recognised by the parameters it passes to ``tx.run`` and applied to plain
+dicts with the same MERGE / reinforcement semantics. Every transaction
+sleeps for ``rtt`` seconds to model the network round trip plus commit that
+dominates ingestion cost against a real server. Edge weights decay with
+the same lazy half-life arithmetic as the Cypher in ``neo4j_client``.
+The Cypher itself is exercised by ``tests/test_neo4j_integration.py``
+against a real server.
+"""
+import time
+from collections import defaultdict
+
+
+class StandInGraph:
+    def __init__(self, rtt=0.001):
+        self.rtt = rtt
+        self.entities = {}  # (user_id, name) -> entity
+        self.relations = {}
+        self.markers = {}  # AppliedFacts key -> applied_at
+        self.transactions = 0
+        self.statements = 0
+        self.schema_version = None
+
+    # driver API
+    def session(self, **kwargs):
+        return _Session(self)
+
+    def close(self):
+        pass
+
+    # graph operations
+    def merge_entity(self, name, entity_type="Thing", user_id=None):
+        self.entities.setdefault((user_id, name), {"name": name, "type": entity_type, "user_id": user_id})
+
+    @staticmethod
+    def effective(rel, now, half_life_ms):
+        if half_life_ms is None or rel["decayed_at"] is None:
+            return rel["weight"]
+        return rel["weight"] * 0.5 ** ((now - rel["decayed_at"]) / half_life_ms)
+
+    def merge_relation(self, source, verb, target, weight, user_id=None, session_id=None, half_life_ms=None):
+        if (user_id, source) not in self.entities or (user_id, target) not in self.entities:
+            return None
+        key = (source, verb, target, user_id)  # both ends are the user's own entities
+        rel = self.relations.get(key)
+        now = int(time.time() * 1000)
+        if rel is None:
+            self.relations[key] = {
+                "weight": weight, "user_id": user_id, "session_id": session_id,
+                "decayed_at": now, "last_reinforced": now,
+            }
+        else:
+            rel["weight"] = self.effective(rel, now, half_life_ms) + weight
+            rel["decayed_at"] = rel["last_reinforced"] = now
+        rel = self.relations[key]
+        return {
+            "source": source, "relation": verb, "target": target,
+            "user_id": rel["user_id"], "weight": rel["weight"], "decayed_at": rel["decayed_at"],
+        }
+
+    def compact(self, cutoff, now, batch_size, threshold, half_life_ms=None):
+        batch = [
+            key for key, rel in self.relations.items() if rel["decayed_at"] is not None and rel["decayed_at"] < cutoff
+        ][:batch_size]
+        pruned = 0
+        for key in batch:
+            rel = self.relations[key]
+            rel["weight"] = self.effective(rel, now, half_life_ms)
+            rel["decayed_at"] = now
+            if rel["weight"] < threshold:
+                del self.relations[key]
+                pruned += 1
+        return {"compacted": len(batch), "pruned": pruned}
+
+    def run(self, query, params):
+        self.statements += 1
+        if "facts" in params:
+            marker = params.get("marker")
+            if marker is not None:
+                if marker in self.markers:
+                    return _Result([])
+                self.markers[marker] = int(time.time() * 1000)
+            rows = []
+            for fact in params["facts"]:
+                self.merge_entity(fact["source"], fact["source_type"], params.get("user_id"))
+                self.merge_entity(fact["target"], fact["target_type"], params.get("user_id"))
+                rows.append(self.merge_relation(
+                    fact["source"], fact["relation"], fact["target"], fact["weight"],
+                    params.get("user_id"), params.get("session_id"), params.get("half_life_ms"),
+                ))
+            return _Result(rows)
+        elif "threshold" in params:
+            return _Result([self.compact(**params)])
+        elif "applied_before" in params:
+            doomed = [key for key, at in self.markers.items() if at < params["applied_before"]]
+            for key in doomed[:params["batch_size"]]:
+                del self.markers[key]
+            return _Result([{"deleted": min(len(doomed), params["batch_size"])}])
+        elif "relation" in params:
+            row = self.merge_relation(
+                params["source"], params["relation"], params["target"], params["weight"],
+                params.get("user_id"), params.get("session_id"), params.get("half_life_ms"),
+            )
+            return _Result([row] if row else [])
+        elif "entity" in params:
+            return _Result(self.neighbourhood(
+                params["user_id"], params["entity"], params["limit"], params.get("half_life_ms")
+            ))
+        elif "key" in params:
+            # graph_schema version bookkeeping; schema statements themselves are no-ops
+            if "version" in params:
+                self.schema_version = params["version"]
+            return _Result([{"version": self.schema_version}])
+        elif "name" in params:
+            self.merge_entity(params["name"], params.get("entity_type", "Thing"), params.get("user_id"))
+        elif "limit" in params:
+            return _Result(self.user_facts(params["user_id"], params["limit"], params.get("half_life_ms")))
+        elif "user_id" in params:
+            # export: the relation listing carries the decay parameter, the entity listing does not
+            if "half_life_ms" in params:
+                return _Result(self.user_relations(params["user_id"], params["half_life_ms"]))
+            return _Result(self.user_entities(params["user_id"]))
+        return _Result([])
+
+    def neighbourhood(self, user_id, name, limit, half_life_ms=None):
+        now = int(time.time() * 1000)
+        edges = []
+        for (source, verb, target, _), rel in self.relations.items():
+            if rel["user_id"] != user_id:
+                continue
+            for outgoing, this, other in ((True, source, target), (False, target, source)):
+                if this == name:
+                    edges.append({
+                        "outgoing": outgoing, "relation": verb, "other": other,
+                        "weight": rel["weight"], "decayed_at": rel["decayed_at"],
+                        "strength": self.effective(rel, now, half_life_ms),
+                    })
+        edges.sort(key=lambda edge: edge.pop("strength"), reverse=True)
+        return edges[:limit]
+
+    def user_facts(self, user_id, limit, half_life_ms=None):
+        now = int(time.time() * 1000)
+        facts = [
+            {"source": source, "relation": verb, "target": target, "weight": self.effective(rel, now, half_life_ms)}
+            for (source, verb, target, _), rel in self.relations.items()
+            if rel["user_id"] == user_id
+        ]
+        facts.sort(key=lambda fact: fact["weight"], reverse=True)
+        return facts[:limit]
+
+    def user_entities(self, user_id):
+        return [
+            {"name": entity["name"], "entity_type": entity["type"]}
+            for (owner, _), entity in self.entities.items() if owner == user_id
+        ]
+
+    def user_relations(self, user_id, half_life_ms=None):
+        now = int(time.time() * 1000)
+        return [
+            {
+                "source": source, "relation": verb, "target": target,
+                "weight": self.effective(rel, now, half_life_ms),
+                "session_id": rel["session_id"], "last_reinforced": rel["last_reinforced"],
+            }
+            for (source, verb, target, _), rel in self.relations.items()
+            if rel["user_id"] == user_id
+        ]
+
+
+class _Result(list):
+    def single(self):
+        return self[0] if self else None
+
+    def data(self):
+        return list(self)
+
+
+class _Transaction:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def run(self, query, parameters=None, **kwargs):
+        return self.graph.run(query, {**(parameters or {}), **kwargs})
+
+
+class _Session:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _transaction(self, fn, *args, **kwargs):
+        self.graph.transactions += 1
+        if self.graph.rtt:
+            time.sleep(self.graph.rtt)
+        return fn(_Transaction(self.graph), *args, **kwargs)
+
+    execute_write = _transaction
+    execute_read = _transaction
+
+    def run(self, query, parameters=None, **kwargs):
+        return self._transaction(lambda tx: tx.run(query, parameters, **kwargs))
+
+    def close(self):
+        pass
@@ -0,0 +1,119 @@
+"""A burst of LLM prompts: unbounded fan-out vs. the shared ``LLMClient``.
+
+``--prompts`` prompts arrive at once from ``--users`` users. One user
+sends ``--heavy-share`` of them, and ``--duplicates`` of the prompts
+repeat another prompt verbatim. Three modes run against
+``benchmarks.llm_stub``, mounted in-process and answering 429 beyond
+``--capacity`` concurrent requests:
+
+- ``unbounded``: every prompt is its own backend request, all at once.
+  This is per-message fan-out without a shared client.
+- ``client``: ``LLMClient`` with its global and per-user limits and
+  single-flight.
+- ``client+batch``: the same, plus micro-batching of short prompts into
+  multi-prompt requests.
+
+For each mode the benchmark reports backend requests, rate-limited
+(failed) prompts, peak concurrent requests at the stub, wall time, and
+p50/p95 latency overall and for the light users only. Run from
+``backend``::
+
+    python -m benchmarks.llm_client --prompts 300 --users 20 --latency-ms 200 --capacity 16
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from app.services.llm import LLMClient, OpenAIChat
+
+from .llm_stub import create_app
+
+
+def _workload(args):
+    rng = random.Random(args.seed)
+    heavy = max(1, int(args.prompts * args.heavy_share))
+    users = [0] * heavy + [rng.randrange(1, args.users) for _ in range(args.prompts - heavy)]
+    rng.shuffle(users)
+    prompts = []
+    for i in range(args.prompts):
+        if prompts and rng.random() < args.duplicates:
+            prompts.append(rng.choice(prompts))
+        else:
+            prompts.append(f"Summarise message {i}: the quick brown fox #{rng.randrange(10 ** 9)}")
+    return list(zip(users, prompts))
+
+
+def _pick(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else 0.0
+
+
+async def run_mode(mode, args, workload):
+    stub = create_app(args.latency_ms, args.per_prompt_ms, args.jitter_ms, args.capacity, args.seed)
+    backend = OpenAIChat("stub", "stub-model", "http://stub/v1", transport=httpx.ASGITransport(app=stub))
+    client = LLMClient(
+        backend, max_concurrency=args.max_concurrency, per_user_concurrency=args.per_user,
+        batch=mode == "client+batch", batch_window=args.window_ms / 1000, max_batch=args.max_batch,
+    )
+    latencies, failed = {}, 0
+
+    async def one(i, user, prompt):
+        nonlocal failed
+        started = time.perf_counter()
+        try:
+            if mode == "unbounded":
+                await backend.complete(prompt)
+            else:
+                await client.complete(prompt, user_id=user)
+        except RuntimeError:
+            failed += 1
+            return
+        latencies[i] = (user, time.perf_counter() - started)
+
+    wall = time.perf_counter()
+    await asyncio.gather(*(one(i, user, prompt) for i, (user, prompt) in enumerate(workload)))
+    wall = time.perf_counter() - wall
+    await client.close()
+    everyone = sorted(elapsed for _, elapsed in latencies.values())
+    light = sorted(elapsed for user, elapsed in latencies.values() if user != 0)
+    stats = stub.state.stats
+    return {
+        "requests": stats["requests"] + stats["rejected"], "failed": failed,
+        "peak": stats["peak_in_flight"], "wall": wall,
+        "p50": _pick(everyone, 0.5), "p95": _pick(everyone, 0.95), "light_p95": _pick(light, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=300)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--heavy-share", type=float, default=0.3, help="share of prompts sent by one user")
+    parser.add_argument("--duplicates", type=float, default=0.2, help="share of prompts repeating an earlier one")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--per-prompt-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--capacity", type=int, default=16, help="stub's concurrent request limit")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--per-user", type=int, default=4)
+    parser.add_argument("--window-ms", type=float, default=20.0)
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workload = _workload(args)
+    print(f"{args.prompts} prompts from {args.users} users ({len(set(p for _, p in workload))} distinct), "
+          f"{args.latency_ms:.0f} ms backend taking {args.capacity or 'unlimited'} concurrent requests, "
+          f"client limits {args.max_concurrency} global / {args.per_user} per user")
+    print(f"{'mode':<14} {'requests':>8} {'failed':>6} {'peak':>5} {'wall s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'light p95':>10}")
+    for mode in ("unbounded", "client", "client+batch"):
+        row = asyncio.run(run_mode(mode, args, workload))
+        print(f"{mode:<14} {row['requests']:>8} {row['failed']:>6} {row['peak']:>5} {row['wall']:>7.2f} "
+              f"{row['p50']:>8.0f} {row['p95']:>8.0f} {row['light_p95']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Local stand-in for an OpenAI-compatible LLM API that simulates latency.
+
+It serves ``POST /v1/chat/completions`` and ``POST /v1/completions``. The
+``/v1/completions`` endpoint accepts a list of prompts, so the client's
+batching path can be exercised. Each request sleeps ``latency-ms``, plus
+``per-prompt-ms`` for every prompt after the first and up to
+``jitter-ms`` of random jitter. Beyond ``capacity`` concurrent requests
+it answers 429, like a rate-limited provider. Extraction prompts get an
+empty triple list; anything else gets a short echo. ``GET /stats``
+reports requests, prompts, rejections and the peak number in flight. Run
+from ``backend``::
+
+    python -m benchmarks.llm_stub --port 8089 --latency-ms 400
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 EXTRACTION_BACKEND=openai uvicorn app.main:app
+
+Benchmarks mount ``create_app()`` through httpx's ASGI transport instead
+of listening on a port.
+"""
+import argparse
+import asyncio
+import random
+
+from fastapi import FastAPI, HTTPException, Request
+
+
+def _answer(prompt: str) -> str:
+    if "Subject-Verb-Object" in prompt:
+        return "```json\n[]\n```"
+    return f"stub completion for: {prompt[:40]}"
+
+
+def create_app(latency_ms: float = 400.0, per_prompt_ms: float = 20.0, jitter_ms: float = 50.0,
+               capacity: int = 0, seed: int = 0):
+    """``capacity`` of 0 accepts any number of concurrent requests."""
+    app = FastAPI(title="LLM stub")
+    rng = random.Random(seed)
+    app.state.stats = {"requests": 0, "prompts": 0, "rejected": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    async def serve(count: int):
+        stats = app.state.stats
+        if capacity and stats["in_flight"] >= capacity:
+            stats["rejected"] += 1
+            raise HTTPException(status_code=429, detail="rate limited", headers={"Retry-After": "1"})
+        stats["requests"] += 1
+        stats["prompts"] += count
+        stats["in_flight"] += 1
+        stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep((latency_ms + per_prompt_ms * (count - 1) + rng.uniform(0, jitter_ms)) / 1000)
+        finally:
+            stats["in_flight"] -= 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await serve(1)
+        content = _answer(body["messages"][-1]["content"])
+        return {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+    @app.post("/v1/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+        await serve(len(prompts))
+        return {"choices": [{"index": i, "text": _answer(prompt)} for i, prompt in enumerate(prompts)]}
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=400.0)
+    parser.add_argument("--per-prompt-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--capacity", type=int, default=0, help="concurrent requests before 429s; 0 is unlimited")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.per_prompt_ms, args.jitter_ms, args.capacity, args.seed),
+                host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
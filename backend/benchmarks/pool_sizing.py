@@ -0,0 +1,128 @@
+"""Load test of ``POST /api/chat`` latency across database pool sizes.
+
+Each pool configuration runs in a fresh subprocess, because the engine is
+built from settings at import time. The app is driven in-process through
+httpx's ASGI transport by ``--concurrency`` clients. The user cache is
+disabled unless ``--user-cache`` is given, so every request checks out a
+connection for its user lookup, as it does right after a restart. Run from
+``backend``::
+
+    DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.pool_sizing --pool-sizes 1,2,5,10,20
+
+Without ``DATABASE_URL`` a throwaway SQLite file is used.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+
+async def worker(args):
+    import httpx
+
+    from app.core import metrics
+    from app.core.security import create_access_token
+    from app.db import crud
+    from app.db.database import AsyncSessionLocal, engine
+    from app.db.models import Base
+    from app.db.writer import chat_writer
+    from app.main import app
+    from app.schemas.user import UserCreate
+    from app.services.embeddings import embedding_service
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        user = await crud.create_user(db, UserCreate(
+            email=f"{uuid.uuid4().hex}@example.com", provider="bench", provider_id=uuid.uuid4().hex,
+        ))
+    headers = {"Authorization": f"Bearer {create_access_token(str(user.id))}"}
+    sessions = [str(uuid.uuid4()) for _ in range(args.sessions)]
+    latencies, errors = [], 0
+    remaining = iter(range(args.requests))
+
+    async def client(http):
+        nonlocal errors
+        for i in remaining:
+            started = time.perf_counter()
+            response = await http.post("/api/chat/", headers=headers, json={
+                "session_id": sessions[i % len(sessions)], "message": f"benchmark message {i}",
+            })
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as http:
+        wall = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(args.concurrency)))
+        wall = time.perf_counter() - wall
+    await chat_writer.close()
+    await embedding_service.close()
+    pool = metrics.snapshot().get("db_pool", {})
+    await engine.dispose()
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(json.dumps({
+        "throughput": len(latencies) / wall,
+        "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+        "errors": errors,
+        "peak_in_use": pool.get("peak_in_use"), "peak_overflow": pool.get("peak_overflow"),
+        "wait_p99_ms": (pool.get("wait_p99_seconds") or 0) * 1000,
+    }))
+
+
+def run(args, pool_size, database_url):
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        DB_POOL_SIZE=str(pool_size),
+        DB_MAX_OVERFLOW=str(args.max_overflow),
+        QUEUE_MAX_DEPTH=str(args.requests * 2),
+        NEO4J_SCHEMA_BOOTSTRAP="false",
+        SECRET_KEY=os.environ.get("SECRET_KEY", "benchmark"),
+    )
+    if not args.user_cache:
+        env["USER_CACHE_TTL_SECONDS"] = "0"
+    command = [sys.executable, "-m", "benchmarks.pool_sizing", "--worker",
+               "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+               "--sessions", str(args.sessions)]
+    output = subprocess.run(command, env=env, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise SystemExit(output.stderr)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", default="1,2,5,10,20")
+    parser.add_argument("--max-overflow", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--user-cache", action="store_true", help="keep the authenticated-user cache on")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(worker(args))
+        return
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, max_overflow {args.max_overflow}")
+    print(f"{'pool':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'wait p99':>9} {'peak':>5} {'errors':>6}")
+    for pool_size in [int(size) for size in args.pool_sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = os.environ.get("DATABASE_URL") or f"sqlite+aiosqlite:///{tmp}/bench.db"
+            result = run(args, pool_size, database_url)
+        print(f"{pool_size:>5} {result['throughput']:>9.0f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f} {result['wait_p99_ms']:>9.1f} {result['peak_in_use']:>5} {result['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Memory and CPU cost of idle SSE subscribers on the in-process event bus.
+
+Each simulated subscriber runs the same wait/drain loop as
+``/api/events/{session_id}`` (minus the HTTP framing). Run from ``backend``::
+
+    python -m benchmarks.sse_subscribers --subscribers 5000 --idle 5
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+
+from app.core.config import settings
+from app.services.events import event_bus
+
+
+async def subscriber_loop(user_id, session_id, received):
+    subscriber, _, _ = event_bus.subscribe(user_id, session_id)
+    try:
+        while not subscriber.dropped:
+            try:
+                await asyncio.wait_for(subscriber.ready.wait(), settings.event_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                continue
+            received[0] += len(subscriber.drain())
+    finally:
+        event_bus.unsubscribe(user_id, session_id, subscriber)
+
+
+async def main(args):
+    user_id = uuid.uuid4()
+    sessions = [uuid.uuid4() for _ in range(args.sessions)]
+    received = [0]
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tasks = [
+        asyncio.create_task(subscriber_loop(user_id, sessions[i % len(sessions)], received))
+        for i in range(args.subscribers)
+    ]
+    await asyncio.sleep(0.1)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{args.subscribers} subscribers over {args.sessions} sessions")
+    print(f"memory per idle subscriber   {(after - before) / args.subscribers:10.0f} bytes")
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.sleep(args.idle)
+    cpu_used = time.process_time() - cpu
+    print(f"CPU while idle               {cpu_used / (time.perf_counter() - wall) * 100:10.2f} % of one core")
+
+    start = time.perf_counter()
+    for i in range(args.events):
+        event_bus.publish(user_id, sessions[0], "fact_update", {"n": i}, key=("bench", i % 8))
+    elapsed = time.perf_counter() - start
+    fanout = args.subscribers // len(sessions)
+    await asyncio.sleep(0.1)
+    print(f"publish to {fanout} subscribers  {elapsed / args.events * 1e6:10.1f} us/event")
+    print(f"events received              {received[0]:10d}")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--idle", type=float, default=5.0, help="seconds to measure idle CPU")
+    parser.add_argument("--events", type=int, default=1000)
+    asyncio.run(main(parser.parse_args()))
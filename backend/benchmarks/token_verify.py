@@ -0,0 +1,37 @@
+"""Per-request JWT verification cost with and without the verified-token cache.
+
+Run from ``backend``::
+
+    python -m benchmarks.token_verify --requests 20000
+"""
+import argparse
+import time
+
+from app.core.cache import token_cache
+from app.core.security import create_access_token, verify_token
+
+
+def measure(token, requests, cold):
+    start = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            token_cache.clear()
+        verify_token(token)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = create_access_token("00000000-0000-0000-0000-000000000001")
+    uncached = measure(token, args.requests, cold=True)
+    cached = measure(token, args.requests, cold=False)
+    print(f"jwt.decode every request {uncached * 1e6:8.2f} us/request")
+    print(f"verified-token cache     {cached * 1e6:8.2f} us/request")
+    print(f"speedup                  {uncached / cached:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,12 +9,13 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 from dotenv import load_dotenv
 
-# Import our models and Base
-from app.db.models import Base
-
+# Load .env before importing models: they read app settings (e.g. embedding size)
 print("Loading environment variables from .env file for scripts")
 load_dotenv("../.env")
 
+# Import our models and Base
+from app.db.models import Base
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
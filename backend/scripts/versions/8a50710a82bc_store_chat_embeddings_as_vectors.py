@@ -0,0 +1,109 @@
+"""Store chat_history.embedding as a native vector
+
+Revision ID: 8a50710a82bc
+Revises: c55d2d5f4865
+Create Date: 2026-10-18 09:12:41.207315
+
+"""
+import base64
+import binascii
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8a50710a82bc'
+down_revision: Union[str, Sequence[str], None] = 'c55d2d5f4865'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# fixed at the width this revision created; later config changes must not alter what it does
+EMBEDDING_DIM = 1536
+BATCH_SIZE = 1000
+
+def _uuid_columns():
+    # SQLite reflects UUID columns as NUMERIC, so batch mode would recreate the table with the
+    # wrong id types; spell out the originals
+    return [
+        sa.Column('id', sa.UUID(), primary_key=True),
+        sa.Column('user_id', sa.UUID(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('session_id', sa.UUID(), nullable=False),
+    ]
+
+
+def _is_postgres() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _decode_text(value: str):
+    """Parse the MVP text encodings: a JSON array or base64 of float32s; None if malformed."""
+    value = value.strip()
+    try:
+        if value.startswith("["):
+            vector = np.asarray(json.loads(value), dtype="<f4")
+        else:
+            vector = np.frombuffer(base64.b64decode(value, validate=True), dtype="<f4")
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    return vector if vector.shape == (EMBEDDING_DIM,) else None
+
+
+def _copy_in_batches(source: str, target: str, convert, value_sql: str = ":value") -> None:
+    """Convert ``source`` into ``target``, keyset-walking chat_history by id.
+
+    Ids are bound back exactly as the driver returned them, so the same loop
+    works for native UUIDs on Postgres and CHAR(32) ids on SQLite.
+    """
+    bind = op.get_bind()
+    select_sql = f"SELECT id, {source} FROM chat_history WHERE {source} IS NOT NULL"
+    first_batch = sa.text(select_sql + " ORDER BY id LIMIT :limit")
+    next_batch = sa.text(select_sql + " AND id > :last_id ORDER BY id LIMIT :limit")
+    update = sa.text(f"UPDATE chat_history SET {target} = {value_sql} WHERE id = :id")
+    rows = bind.execute(first_batch, {"limit": BATCH_SIZE}).fetchall()
+    while rows:
+        bind.execute(update, [{"id": row_id, "value": convert(value)} for row_id, value in rows])
+        rows = bind.execute(next_batch, {"last_id": rows[-1][0], "limit": BATCH_SIZE}).fetchall()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _is_postgres():
+        op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        op.execute(f"ALTER TABLE chat_history ADD COLUMN embedding_vec vector({EMBEDDING_DIM})")
+
+        def convert(value):
+            vector = _decode_text(value)
+            return None if vector is None else "[" + ",".join(map(repr, vector.tolist())) + "]"
+
+        _copy_in_batches("embedding", "embedding_vec", convert, "CAST(:value AS vector)")
+    else:
+        op.add_column('chat_history', sa.Column('embedding_vec', sa.LargeBinary(), nullable=True))
+
+        def convert(value):
+            vector = _decode_text(value)
+            return None if vector is None else vector.tobytes()
+
+        _copy_in_batches("embedding", "embedding_vec", convert)
+
+    with op.batch_alter_table('chat_history', reflect_args=_uuid_columns()) as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_vec', new_column_name='embedding')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('chat_history', sa.Column('embedding_text', sa.Text(), nullable=True))
+    if _is_postgres():
+        # vector's text form is already a JSON array
+        _copy_in_batches("embedding::text", "embedding_text", str)
+    else:
+        _copy_in_batches(
+            "embedding", "embedding_text", lambda value: json.dumps(np.frombuffer(value, dtype="<f4").tolist())
+        )
+
+    with op.batch_alter_table('chat_history', reflect_args=_uuid_columns()) as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_text', new_column_name='embedding')
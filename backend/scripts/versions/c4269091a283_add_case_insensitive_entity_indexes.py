@@ -0,0 +1,30 @@
+"""Add case-insensitive entity_dictionary indexes
+
+Revision ID: c4269091a283
+Revises: 64806e1956db
+Create Date: 2026-10-18 10:41:52.918406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4269091a283'
+down_revision: Union[str, Sequence[str], None] = '64806e1956db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_entity_dictionary_lower_name', 'entity_dictionary', [sa.text('lower(name)')], unique=False)
+    op.create_index('ix_entity_dictionary_lower_canonical_form', 'entity_dictionary', [sa.text('lower(canonical_form)')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_entity_dictionary_lower_canonical_form', table_name='entity_dictionary')
+    op.drop_index('ix_entity_dictionary_lower_name', table_name='entity_dictionary')
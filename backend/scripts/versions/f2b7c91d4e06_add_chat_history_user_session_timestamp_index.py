@@ -0,0 +1,28 @@
+"""Add composite chat_history (user_id, session_id, timestamp) index
+
+Revision ID: f2b7c91d4e06
+Revises: c4269091a283
+Create Date: 2026-10-18 11:24:37.104519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7c91d4e06'
+down_revision: Union[str, Sequence[str], None] = 'c4269091a283'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_chat_history_user_session_timestamp', 'chat_history', ['user_id', 'session_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chat_history_user_session_timestamp', table_name='chat_history')
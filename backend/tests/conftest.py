@@ -0,0 +1,37 @@
+"""Shared fixtures. Settings are read at import time, so the environment is set before any app module loads."""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="relevantic-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{_TMP}/app.db",
+    "SECRET_KEY": "test",
+    "VECTOR_INDEX_DIR": f"{_TMP}/vector_index",
+    "EXTRACTION_CACHE_PATH": f"{_TMP}/extraction_cache.sqlite3",
+    "NEO4J_SCHEMA_BOOTSTRAP": "false",
+    "EMBEDDING_BACKEND": "hashing",
+    "EXTRACTION_BACKEND": "none",
+})
+
+import pytest  # noqa: E402
+
+from app.db.database import engine  # noqa: E402
+from app.db.models import Base  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """A fresh schema for each test."""
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    try:
+        yield engine
+    finally:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
@@ -0,0 +1,33 @@
+import argparse
+
+import pytest
+
+from app.services import neo4j_client
+from benchmarks import api_load
+
+
+@pytest.mark.anyio
+async def test_small_run_succeeds_on_every_endpoint(db, monkeypatch):
+    monkeypatch.setattr(neo4j_client, "driver", neo4j_client.driver)  # run() installs the stand-in
+    args = argparse.Namespace(
+        requests=40, warmup=5, concurrency=4, mix="chat=1,context=1,resolve=1",
+        users=2, sessions=2, facts=5, graph_rtt_ms=0, seed=0,
+    )
+    results = await api_load.run(args)
+
+    endpoints = results["endpoints"]
+    assert set(endpoints) == {"chat", "context", "resolve"}
+    assert sum(row["requests"] for row in endpoints.values()) == 40
+    assert all(row["errors"] == 0 and row["p99_ms"] >= row["p50_ms"] for row in endpoints.values())
+
+
+def test_regressions_beyond_tolerance_are_reported():
+    row = {"requests": 100, "errors": 0, "throughput_rps": 100.0, "p50_ms": 5.0, "p95_ms": 10.0, "p99_ms": 20.0}
+    baseline = {"endpoints": {"chat": row, "context": row}}
+    results = {"endpoints": {
+        "chat": {**row, "p99_ms": 26.0, "throughput_rps": 80.0},  # within 35%
+        "context": {**row, "p95_ms": 14.0, "throughput_rps": 60.0},
+    }}
+    assert api_load.compare(results, baseline, 0.35) == [
+        "context p95_ms 10.0 -> 14.0", "context throughput 100 -> 60 req/s"
+    ]
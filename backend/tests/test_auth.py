@@ -0,0 +1,70 @@
+import datetime
+import time
+import uuid
+
+import httpx
+import pytest
+
+from app.api import auth as auth_api
+from app.core.cache import token_cache, user_cache
+from app.core.security import create_access_token, verify_token
+from app.db import crud
+from app.db.database import AsyncSessionLocal
+from app.main import app
+from app.schemas.user import UserCreate, UserUpdate
+
+
+class _Google:
+    def __init__(self, userinfo: dict):
+        self.userinfo = userinfo
+
+    async def authorize_access_token(self, request):
+        return {"userinfo": self.userinfo}
+
+
+async def _me(client, token):
+    response = await client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.anyio
+async def test_cached_user_is_dropped_when_the_row_changes(db, monkeypatch):
+    async with AsyncSessionLocal() as session:
+        user = await crud.create_user(
+            session, UserCreate(email="someone@example.com", full_name="Before", provider="github", provider_id="1")
+        )
+    token = create_access_token(user.id)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        assert (await _me(client, token))["full_name"] == "Before"
+        assert user.id in user_cache
+        async with AsyncSessionLocal() as session:
+            await crud.update_user(session, user.id, UserUpdate(full_name="After"))
+        assert (await _me(client, token))["full_name"] == "After"
+
+        # signing in with another provider for the same email relinks the cached user
+        userinfo = {"email": "someone@example.com", "name": "After", "sub": "g-1", "picture": "https://example.com/a.png"}
+        monkeypatch.setattr(auth_api.oauth, "create_client", lambda provider: _Google(userinfo))
+        response = await client.get("/api/auth/callback/google", follow_redirects=False)
+        assert response.status_code == 307
+        me = await _me(client, token)
+    assert (me["provider"], me["provider_id"], me["avatar_url"]) == ("google", "g-1", "https://example.com/a.png")
+
+
+def test_verified_tokens_are_cached_until_they_expire(monkeypatch):
+    subject = str(uuid.uuid4())
+    token = create_access_token(subject, expires_delta=datetime.timedelta(minutes=5))
+    before = token_cache.stats()
+    assert verify_token(token) == subject and verify_token(token) == subject
+    after = token_cache.stats()
+    assert (after["misses"] - before["misses"], after["hits"] - before["hits"]) == (1, 1)
+
+    # past the token's exp the entry is gone, so the next check decodes the token again
+    monkeypatch.setattr(token_cache, "clock", lambda: time.time() + 600)
+    verify_token(token)
+    expired = token_cache.stats()
+    assert (expired["misses"] - after["misses"], expired["expirations"] - after["expirations"]) == (1, 1)
+
+    stale = create_access_token(subject, expires_delta=datetime.timedelta(minutes=-1))
+    assert verify_token(stale) is None and len(token_cache) == expired["size"]
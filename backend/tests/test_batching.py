@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from app.services.batching import MicroBatcher
+
+
+class Doubler(MicroBatcher):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.active = self.peak = 0
+
+    async def _call(self, items):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return [ValueError(item) if item < 0 else item * 2 for item in items]
+
+
+def test_call_is_abstract():
+    with pytest.raises(TypeError):
+        MicroBatcher()
+
+
+@pytest.mark.anyio
+async def test_flushes_are_bounded_and_failures_are_per_item():
+    batcher = Doubler(window=0, max_batch=1, concurrency=2)
+    results = await asyncio.gather(*(batcher.submit(item) for item in [1, 2, -3, 4, 5, 6]), return_exceptions=True)
+    await batcher.close()
+
+    assert results[:2] == [2, 4] and results[3:] == [8, 10, 12]
+    assert isinstance(results[2], ValueError)
+    assert batcher.peak == 2
+    assert batcher.stats()["requests"] == 6 and batcher.stats()["in_flight"] == 0
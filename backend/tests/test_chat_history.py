@@ -0,0 +1,67 @@
+import datetime
+import json
+import uuid
+
+import httpx
+import pytest
+import sqlalchemy as sa
+
+from app.core.deps import get_current_active_user
+from app.db.database import AsyncSessionLocal
+from app.db.models import ChatHistory
+from app.db.writer import fill_defaults
+from app.main import app
+from app.schemas.user import User
+
+
+@pytest.fixture
+def user():
+    now = datetime.datetime.utcnow()
+    user = User(id=uuid.uuid4(), email="someone@example.com", created_at=now, updated_at=now)
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    try:
+        yield user
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+
+async def _pages(client, session_id, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(f"/api/chat/history/{session_id}", params=params)
+        assert response.status_code == 200
+        *messages, trailer = [json.loads(line) for line in response.text.splitlines()]
+        assert trailer["count"] == len(messages)
+        pages.append([message["message"] for message in messages])
+        cursor = trailer["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.anyio
+async def test_history_pages_follow_the_cursor_through_timestamp_ties(db, user):
+    session_id, start = uuid.uuid4(), datetime.datetime(2024, 1, 1)
+    # three messages share a timestamp: only the id keeps them apart
+    stamps = [start, start + datetime.timedelta(seconds=1)] + [start + datetime.timedelta(seconds=2)] * 3
+    rows = [
+        fill_defaults(ChatHistory, dict(user_id=user.id, session_id=session_id, role="user",
+                                        message_text=f"message {i}", timestamp=stamp))
+        for i, stamp in enumerate(stamps)
+    ]
+    rows.append(fill_defaults(ChatHistory, dict(user_id=user.id, session_id=uuid.uuid4(), role="user",
+                                                message_text="elsewhere", timestamp=start)))
+    async with AsyncSessionLocal() as session:
+        await session.execute(sa.insert(ChatHistory), rows)
+        await session.commit()
+    newest_first = [row["message_text"] for row in sorted(rows[:5], key=lambda row: (row["timestamp"], row["id"]),
+                                                          reverse=True)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        pages = await _pages(client, session_id, limit=2)
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert sum(pages, []) == newest_first
+        assert await _pages(client, session_id, limit=5) == [newest_first]
+        response = await client.get(f"/api/chat/history/{session_id}", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
@@ -0,0 +1,42 @@
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.db.database import InstrumentedPool, engine
+
+
+@pytest.mark.anyio
+async def test_pool_reports_checkouts_and_peak_use(db):
+    telemetry = engine.sync_engine.pool.telemetry
+    before = telemetry.stats()
+    async with engine.connect() as first, engine.connect() as second:
+        await first.execute(sa.text("SELECT 1"))
+        await second.execute(sa.text("SELECT 1"))
+        assert telemetry.stats()["in_use"] == before["in_use"] + 2
+    after = telemetry.stats()
+
+    assert after["checkouts"] == before["checkouts"] + 2
+    assert after["peak_in_use"] >= 2 and after["in_use"] == before["in_use"]
+    assert after["size"] == settings.db_pool_size
+
+
+@pytest.mark.anyio
+async def test_exhausted_pool_counts_waits_and_failed_checkouts(tmp_path):
+    small = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedPool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    telemetry = small.sync_engine.pool.telemetry
+    try:
+        async with small.connect() as held:
+            await held.execute(sa.text("SELECT 1"))
+            with pytest.raises(sa.exc.TimeoutError):
+                async with small.connect():
+                    pass
+    finally:
+        await small.dispose()
+
+    stats = telemetry.stats()
+    assert (stats["failed_checkouts"], stats["waited"]) == (1, 1)
+    assert stats["wait_max_seconds"] >= 0.05
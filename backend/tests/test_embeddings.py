@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+from app.services.embeddings import EmbeddingService, HashingEmbedder, OpenAIEmbedder
+
+DIM = 32
+
+
+class Recording(HashingEmbedder):
+    def __init__(self):
+        super().__init__(DIM)
+        self.batches = []
+
+    async def embed(self, texts):
+        self.batches.append(list(texts))
+        return await super().embed(texts)
+
+
+@pytest.mark.anyio
+async def test_concurrent_embeds_share_backend_requests():
+    backend = Recording()
+    service = EmbeddingService(backend, window=0.01, max_batch=4)
+    texts = [f"message number {i}" for i in range(10)]
+    vectors = await service.embed_many(texts)
+    await service.close()
+
+    assert sorted(len(batch) for batch in backend.batches) == [2, 4, 4]
+    np.testing.assert_allclose(np.stack(vectors), HashingEmbedder(DIM).embed_sync(texts))
+
+
+@pytest.mark.anyio
+async def test_openai_batch_is_one_request_in_input_order():
+    requests = []
+
+    def handler(request):
+        texts = json.loads(request.content)["input"]
+        requests.append(texts)
+        data = [{"index": i, "embedding": [float(len(text))] * DIM} for i, text in enumerate(texts)]
+        return httpx.Response(200, json={"data": data[::-1]})  # the API does not promise order
+
+    embedder = OpenAIEmbedder(DIM, "key", "model", "https://example.com/v1")
+    embedder.client = httpx.AsyncClient(base_url="https://example.com/v1", transport=httpx.MockTransport(handler))
+    service = EmbeddingService(embedder, window=0.01, max_batch=8)
+    vectors = await asyncio.gather(service.embed("a"), service.embed("bbb"))
+    await service.close()
+    await embedder.client.aclose()
+
+    assert requests == [["a", "bbb"]]
+    assert [vector[0] for vector in vectors] == [1.0, 3.0]
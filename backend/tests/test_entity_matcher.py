@@ -0,0 +1,94 @@
+import datetime
+import json
+import uuid
+
+import httpx
+import pytest
+import sqlalchemy as sa
+
+from app.api import entity as entity_api
+from app.core.deps import get_current_active_user
+from app.db import crud
+from app.db.database import AsyncSessionLocal
+from app.db.models import EntityDictionary
+from app.services import entity_matcher as matcher_module
+from app.main import app
+from app.schemas.user import User
+from app.services.entity_matcher import AhoCorasick, EntityMatcher, Entry, PatternLayer
+
+
+def _found(layer, text):
+    return sorted((start, end, entry.canonical) for start, end, entry in layer.scan(text))
+
+
+def test_incremental_additions_match_like_a_full_build(monkeypatch):
+    monkeypatch.setattr(matcher_module.settings, "entity_matcher_delta_min", 1000)
+    layer = PatternLayer({"new york": Entry("New York", "Place")})
+    names = ["york", "new york city", "ork", "paris", "par", "is", "yorkshire"]
+    for name in names:
+        layer.add(name, Entry(name.title(), None))
+    # pending additions sit in deltas sized like the bits of their count
+    assert [len(patterns) for patterns in layer.delta_patterns] == [4, 2, 1]
+
+    text = "from new york city to paris via yorkshire"
+    assert _found(layer, text) == _found(AhoCorasick(layer.patterns), text)
+
+    layer.add("Paris", Entry("Paris, France", "Place"))  # a new canonical form shadows the old one
+    assert [canonical for start, end, canonical in _found(layer, "paris") if (start, end) == (0, 5)] == ["Paris, France"]
+
+
+def test_deltas_fold_into_the_main_automaton(monkeypatch):
+    monkeypatch.setattr(matcher_module.settings, "entity_matcher_delta_min", 4)
+    layer = PatternLayer()
+    for i in range(5):
+        layer.add(f"entity {i}", Entry(f"Entity {i}", None))
+    assert (len(layer.main), layer.pending) == (5, 0)
+    assert len(_found(layer, "entity 0 and entity 4")) == 2
+
+
+@pytest.mark.anyio
+async def test_rows_stored_by_another_process_are_picked_up(db, monkeypatch):
+    monkeypatch.setattr(matcher_module.settings, "entity_matcher_refresh_seconds", 0)
+    monkeypatch.setattr(crud, "entity_matcher", EntityMatcher())
+    user_id = uuid.uuid4()
+    ours, theirs = crud.entity_matcher, EntityMatcher()
+    async with AsyncSessionLocal() as session:
+        assert await theirs.find(session, user_id, "I moved to Lisbon") == []
+        await crud.create_entity(session, "Lisbon", entity_type="Place", user_id=user_id)
+        assert [match.canonical for match in await ours.find(session, user_id, "I moved to Lisbon")] == ["Lisbon"]
+        assert ours.reloads == 0  # its own addition is already in the layer
+
+        # another worker's matcher loaded the layer before the row existed
+        assert [match.canonical for match in await theirs.find(session, user_id, "I moved to Lisbon")] == ["Lisbon"]
+        assert theirs.reloads == 1
+        await session.execute(sa.insert(EntityDictionary).values(id=uuid.uuid4(), name="Porto"))
+        await session.commit()
+        assert [match.scope for match in await theirs.find(session, user_id, "Porto")] == ["global"]
+
+
+@pytest.mark.anyio
+async def test_batch_resolve_folds_non_ascii_names(db, monkeypatch):
+    monkeypatch.setattr(entity_api, "entity_matcher", EntityMatcher())
+    now = datetime.datetime.utcnow()
+    user = User(id=uuid.uuid4(), email="someone@example.com", created_at=now, updated_at=now)
+    async with AsyncSessionLocal() as session:
+        await session.execute(sa.insert(EntityDictionary).values(id=uuid.uuid4(), name="Ärzte", user_id=user.id))
+        await session.execute(
+            sa.insert(EntityDictionary).values(id=uuid.uuid4(), name="Zürich", canonical_form="Zürich, CH")
+        )
+        await session.commit()
+
+    app.dependency_overrides[get_current_active_user] = lambda: user
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/entity/resolve/batch", json={"mentions": ["ÄRZTE", " zürich ", "Nowhere"]})
+            blank = await client.post("/api/entity/resolve/batch", json={"mentions": ["Zürich", "  "]})
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["canonical"], line["resolved"]) for line in lines[:3]] == [
+        ("Ärzte", True), ("Zürich, CH", True), ("Nowhere", False)
+    ]
+    assert lines[3]["unresolved"] == ["Nowhere"]
+    assert blank.status_code == 422
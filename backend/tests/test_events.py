@@ -0,0 +1,47 @@
+import uuid
+
+import pytest
+
+from app.db import crud
+from app.db.database import AsyncSessionLocal
+from app.services import neo4j_client
+from app.services.events import EventBus, event_bus
+from benchmarks.graph_standin import StandInGraph
+
+
+@pytest.mark.anyio
+async def test_questions_publish_recalled_facts_not_updates(db, monkeypatch):
+    monkeypatch.setattr(neo4j_client, "driver", StandInGraph(rtt=0))
+    user_id, session_id = uuid.uuid4(), uuid.uuid4()
+    neo4j_client.insert_facts([("alice", "likes", "tea")], user_id, session_id)
+    async with AsyncSessionLocal() as session:
+        await crud.create_entity(session, "alice", "alice", "Person", user_id)
+
+    subscriber, _, _ = event_bus.subscribe(user_id, session_id)
+    try:
+        await crud.process_message_async(session_id, user_id, "What does alice like?", "user")
+    finally:
+        event_bus.unsubscribe(user_id, session_id, subscriber)
+
+    events = [(event.type, event.data) for event in subscriber.buffer]
+    assert [kind for kind, _ in events] == ["facts_recalled", "message_processed"]
+    assert events[0][1]["entity"] == "alice"
+    assert events[0][1]["outgoing"][0]["target"] == "tea"
+    assert events[1][1]["kind"] == "question" and events[1][1]["facts"] == 1
+
+
+@pytest.mark.anyio
+async def test_sessions_without_subscribers_keep_no_history():
+    bus = EventBus(history=4, buffer=4, max_channels=10)
+    user_id, watched, unwatched = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    subscriber, _, _ = bus.subscribe(user_id, watched)
+    bus.unsubscribe(user_id, watched, subscriber)
+    for session_id in (watched, unwatched):
+        bus.publish(user_id, session_id, "fact_update", {"n": 1})
+    assert bus.stats()["channels"] == 1 and bus.stats()["published"] == 2
+
+    # a client resuming on the watched session replays; the other is told to resync
+    _, replay, gap = bus.subscribe(user_id, watched, last_event_id=0)
+    assert [event.data for event in replay] == [{"n": 1}] and not gap
+    _, replay, gap = bus.subscribe(user_id, unwatched, last_event_id=0)
+    assert replay == [] and gap
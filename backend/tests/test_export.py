@@ -0,0 +1,59 @@
+import datetime
+import gzip
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import ChatHistory
+from app.db.writer import fill_defaults
+from app.services import neo4j_client
+from app.services.export import Exporter
+from app.services.transcript_import import TranscriptImporter
+from app.services.work_queue import WorkQueue
+from benchmarks.graph_standin import StandInGraph
+
+
+async def _history(user_id):
+    query = (
+        sa.select(ChatHistory.session_id, ChatHistory.role, ChatHistory.message_text, ChatHistory.timestamp)
+        .where(ChatHistory.user_id == user_id)
+        .order_by(ChatHistory.session_id, ChatHistory.timestamp)
+    )
+    async with AsyncSessionLocal() as db:
+        return [tuple(row) for row in await db.execute(query)]
+
+
+async def _blocks(data: bytes, size: int = 100):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.anyio
+async def test_an_export_imports_back_into_the_same_history(db, monkeypatch):
+    monkeypatch.setattr(neo4j_client, "driver", StandInGraph(rtt=0))
+    source, copy = uuid.uuid4(), uuid.uuid4()
+    start = datetime.datetime(2024, 1, 1, 12)
+    rows = [
+        fill_defaults(ChatHistory, dict(user_id=source, session_id=session_id, role=role, message_text=text,
+                                        timestamp=start + datetime.timedelta(minutes=minute)))
+        for session_id in (uuid.uuid4(), uuid.uuid4())
+        for minute, (role, text) in enumerate([("user", "I live in Paris"), ("assistant", "Noted: Paris. ✓")])
+    ]
+    async with AsyncSessionLocal() as session:
+        await session.execute(sa.insert(ChatHistory), rows)
+        await session.commit()
+    neo4j_client.insert_facts([("I", "live_in", "Paris")], str(source))
+
+    exporter = Exporter(batch_size=3)
+    compressed = b"".join([block async for block in exporter.stream(source, compress=True)])
+    lines = [json.loads(line) for line in gzip.decompress(compressed).splitlines()]
+    assert [line["type"] for line in lines] == ["export"] + ["message"] * 4 + ["entity"] * 2 + ["relation", "end"]
+    assert lines[-1] == {"type": "end", "complete": True, "messages": 4, "entities": 2, "relations": 1}
+
+    importer = TranscriptImporter(chunk_size=3, workers=2, queue=WorkQueue(None, concurrency=1, max_depth=100))
+    summary = await importer.run(copy, "export", _blocks(gzip.decompress(compressed)))
+    assert (summary["messages"], summary["skipped"], summary["status"]) == (4, 0, "done")
+    assert await _history(copy) == await _history(source)
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from app.services.extraction import ExtractionService
+
+
+class _RecordingExtractor:
+    version = None
+
+    def __init__(self):
+        self.prompts = []
+
+    async def extract(self, statements):
+        self.prompts.append(list(statements))
+        if "fail" in statements:
+            raise RuntimeError("backend down")
+        return [[{"source": "User", "relation": "SAID", "target": text}] for text in statements]
+
+
+@pytest.mark.anyio
+async def test_a_prompt_never_mixes_users():
+    backend = _RecordingExtractor()
+    service = ExtractionService(backend, window=0.05, max_batch=16)
+    try:
+        results = await asyncio.gather(
+            service.extract("my dog is Rex", "alice"),
+            service.extract("he likes tea", "bob"),
+            service.extract("she lives in Paris", "alice"),
+            service.extract("fail", "carol"),
+            return_exceptions=True,
+        )
+    finally:
+        await service.close()
+
+    assert sorted(backend.prompts) == [["fail"], ["he likes tea"], ["my dog is Rex", "she lives in Paris"]]
+    assert [triples[0]["target"] for triples in results[:3]] == ["my dog is Rex", "he likes tea", "she lives in Paris"]
+    assert isinstance(results[3], RuntimeError)
+    assert service.batches == 1
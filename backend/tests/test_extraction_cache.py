@@ -0,0 +1,31 @@
+import itertools
+import types
+
+from app.services import extraction_cache as cache_module
+from app.services.extraction_cache import ExtractionCache, text_hash
+
+
+def test_full_cache_evicts_the_least_recently_used_tenth(tmp_path, monkeypatch):
+    clock = itertools.count(1)
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(time=lambda: float(next(clock))))
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_entries=10)
+    keys = [text_hash(f"I have {i} cats") for i in range(11)]
+    try:
+        for i, key in enumerate(keys[:10]):
+            cache.put_sync("v1", key, [{"subject": "I", "relation": "have", "object": f"{i} cats"}])
+        assert cache.get_sync("v1", keys[0]) is not None  # now the most recently used
+        assert cache.evictions == 0
+
+        cache.put_sync("v1", keys[10], [])
+        assert (cache.entries, cache.evictions) == (9, 2)
+        assert [i for i, key in enumerate(keys) if cache.get_sync("v1", key) is None] == [1, 2]
+        assert cache.get_sync("v2", keys[0]) is None  # another extractor version misses
+    finally:
+        cache.close()
+
+    reopened = ExtractionCache(cache.path, max_entries=10)
+    try:
+        assert reopened.get_sync("v1", text_hash("i have 0 CATS.")) is not None
+        assert reopened.entries == 9
+    finally:
+        reopened.close()
@@ -0,0 +1,68 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.services.llm import LLMClient
+
+
+class Backend:
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.prompts = []
+        self.batches = []
+        self.active = self.peak = 0
+
+    async def complete(self, prompt):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        return prompt.upper()
+
+    async def complete_batch(self, prompts):
+        self.batches.append(list(prompts))
+        return [prompt.upper() for prompt in prompts]
+
+
+@pytest.mark.anyio
+async def test_identical_prompts_in_flight_share_one_request():
+    backend = Backend()
+    client = LLMClient(backend)
+    results = await asyncio.gather(client.complete("hi"), client.complete("hi"), client.complete("other"))
+
+    assert results == ["HI", "HI", "OTHER"]
+    assert sorted(backend.prompts) == ["hi", "other"]
+    assert client.stats()["coalesced"] == 1 and client.stats()["requests"] == 2
+
+    # a caller giving up does not cancel the request it shares
+    shared = asyncio.ensure_future(client.complete("slow"))
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(client.complete("slow"), 0.001)
+    assert await shared == "SLOW" and backend.prompts.count("slow") == 1
+
+
+@pytest.mark.anyio
+async def test_each_user_is_held_to_their_slots():
+    backend = Backend()
+    client = LLMClient(backend, max_concurrency=8, per_user_concurrency=1)
+    busy, other = uuid.uuid4(), uuid.uuid4()
+    calls = [client.complete(f"busy {i}", user_id=busy) for i in range(4)]
+    await asyncio.gather(*calls, client.complete("other", user_id=other))
+
+    assert backend.peak == 2  # one of the busy user's prompts, alongside the other user's
+    assert client.stats()["users_active"] == 0
+
+
+@pytest.mark.anyio
+async def test_short_prompts_are_batched_when_enabled():
+    backend = Backend()
+    client = LLMClient(backend, batch=True, batch_window=0.01, batch_max_chars=10)
+    results = await asyncio.gather(client.complete("a"), client.complete("b"), client.complete("long prompt here"))
+    await client.close()
+
+    assert results == ["A", "B", "LONG PROMPT HERE"]
+    assert backend.batches == [["a", "b"]] and backend.prompts == ["long prompt here"]
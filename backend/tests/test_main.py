@@ -0,0 +1,27 @@
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.main import app, lifespan, request_seconds
+
+
+@pytest.mark.anyio
+async def test_requests_are_labelled_by_route_template():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for session_id in ("chat", "history", "1"):
+            await client.get(f"/api/chat/history/{session_id}")
+        await client.get("/healthz")
+        await client.get("/nowhere")
+
+    routes = {labels[1] for labels in request_seconds.collect()}
+    assert {"/api/chat/history/{session_id}", "/healthz", "unmatched"} <= routes
+    assert {route for route in routes if "history" in route} == {"/api/chat/history/{session_id}"}
+
+
+@pytest.mark.anyio
+async def test_startup_rejects_an_embedding_size_the_schema_cannot_store(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_dim", 768)
+    with pytest.raises(RuntimeError, match="768"):
+        async with lifespan(app):
+            pass
@@ -0,0 +1,77 @@
+import base64
+import json
+import sqlite3
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+from alembic import command
+from alembic.config import Config
+
+from app.db.models import EMBEDDING_DIM
+
+SCRIPTS = Path(__file__).resolve().parent.parent / "scripts"
+
+
+@pytest.fixture
+def migrate(tmp_path, monkeypatch):
+    """Run alembic against a scratch SQLite database, returning a sqlite3 connection to it."""
+    path = tmp_path / "migrations.db"
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{path}")
+    config = Config()  # no ini file, so env.py leaves logging alone
+    config.set_main_option("script_location", str(SCRIPTS))
+
+    def run(step, revision):
+        step(config, revision)
+        return sqlite3.connect(path)
+    return run
+
+
+def _column_types(connection, table):
+    return {row[1]: row[2] for row in connection.execute(f"PRAGMA table_info({table})")}
+
+
+def test_embedding_migration_decodes_text_and_skips_malformed(migrate):
+    connection = migrate(command.upgrade, "c55d2d5f4865")
+    user_id, session_id = uuid.uuid4().hex, uuid.uuid4().hex
+    vector = np.arange(EMBEDDING_DIM, dtype="<f4") / EMBEDDING_DIM
+    rows = {
+        "json": json.dumps(vector.tolist()),
+        "base64": base64.b64encode(vector.tobytes()).decode(),
+        "garbage": "garbage",
+        "bad_json": "[1, 2,",
+        "short": json.dumps([0.5, 0.5]),
+        "empty": None,
+    }
+    with connection:
+        connection.execute("INSERT INTO users (id, email) VALUES (?, ?)", (user_id, "someone@example.com"))
+        connection.executemany(
+            "INSERT INTO chat_history (id, user_id, session_id, message_text, role, embedding) VALUES (?, ?, ?, ?, ?, ?)",
+            [(uuid.uuid4().hex, user_id, session_id, name, "user", value) for name, value in rows.items()],
+        )
+    connection.close()
+
+    connection = migrate(command.upgrade, "8a50710a82bc")
+    embeddings = dict(connection.execute("SELECT message_text, embedding FROM chat_history"))
+    assert set(embeddings) == set(rows)
+    for name in ("json", "base64"):
+        np.testing.assert_array_equal(np.frombuffer(embeddings[name], dtype="<f4"), vector)
+    for name in ("garbage", "bad_json", "short", "empty"):
+        assert embeddings[name] is None
+
+    types = _column_types(connection, "chat_history")
+    assert (types["id"], types["user_id"], types["session_id"]) == ("UUID", "UUID", "UUID")
+    assert types["embedding"] == "BLOB"
+    foreign_keys = [(row[2], row[3], row[4]) for row in connection.execute("PRAGMA foreign_key_list(chat_history)")]
+    assert foreign_keys == [("users", "user_id", "id")]
+    connection.close()
+
+
+def test_embedding_migration_downgrade_keeps_uuid_columns(migrate):
+    migrate(command.upgrade, "8a50710a82bc").close()
+    connection = migrate(command.downgrade, "c55d2d5f4865")
+    types = _column_types(connection, "chat_history")
+    assert (types["id"], types["user_id"], types["session_id"]) == ("UUID", "UUID", "UUID")
+    assert types["embedding"] == "TEXT"
+    connection.close()
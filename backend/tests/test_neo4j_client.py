@@ -0,0 +1,131 @@
+import asyncio
+import re
+
+import pytest
+
+from app.services import graph_schema, neo4j_client
+from app.services.events import event_bus
+from benchmarks import graph_standin
+from benchmarks.graph_standin import StandInGraph
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    graph = StandInGraph(rtt=0)
+    monkeypatch.setattr(neo4j_client, "driver", graph)
+    return graph
+
+
+def test_user_facts_carry_the_transaction_timeout(graph, monkeypatch):
+    timeouts = []
+    transaction = graph_standin._Session._transaction
+
+    def recording(self, fn, *args, **kwargs):
+        timeouts.append(getattr(fn, "timeout", None))
+        return transaction(self, fn, *args, **kwargs)
+
+    monkeypatch.setattr(graph_standin._Session, "execute_read", recording)
+    neo4j_client.insert_facts([("alice", "likes", "tea")], user_id="u1")
+
+    assert neo4j_client.get_user_facts("u1", 5, timeout=0.2)[0]["target"] == "tea"
+    neo4j_client.get_user_facts("u1", 5)
+    assert timeouts == [0.2, None]
+
+
+def test_facts_are_kept_per_user(graph):
+    neo4j_client.insert_facts([("alice", "likes", "tea"), ("alice", "likes", "tea")], user_id="u1")
+    neo4j_client.insert_facts([("alice", "likes", "tea")], user_id="u2")
+
+    assert neo4j_client.get_user_facts("u1")[0]["weight"] == pytest.approx(2.0, rel=1e-3)
+    assert neo4j_client.get_user_facts("u2")[0]["weight"] == pytest.approx(1.0, rel=1e-3)
+    assert list(graph.entities) == [("u1", "alice"), ("u1", "tea"), ("u2", "alice"), ("u2", "tea")]
+    with pytest.raises(ValueError):
+        neo4j_client.insert_facts([("alice", "likes", "tea")])
+
+
+def test_entities_belong_to_their_user(graph):
+    neo4j_client.insert_facts([{"source": "User", "relation": "owns", "target": "Rex", "target_type": "Dog"}], "u1")
+    neo4j_client.insert_facts([{"source": "User", "relation": "named", "target": "Rex", "target_type": "Car"}], "u2")
+
+    [(kind, entities)] = [batch for batch in neo4j_client.stream_user_graph("u2") if batch[0] == "entity"]
+    assert {entity["name"]: entity["entity_type"] for entity in entities} == {"User": "Thing", "Rex": "Car"}
+    assert neo4j_client.get_entity_neighbourhood("u2", "Rex")["incoming"] == [
+        {"source": "User", "relation": "named", "weight": pytest.approx(1.0, rel=1e-3)}
+    ]
+
+def test_graph_schema_upgrades_to_head(graph):
+    assert graph_schema.upgrade(graph) == [migration.version for migration in graph_schema.MIGRATIONS]
+    assert graph_schema.upgrade(graph) == []
+    assert graph.schema_version == graph_schema.HEAD
+
+
+@pytest.mark.anyio
+async def test_fact_updates_carry_the_reinforced_weight(graph):
+    subscriber, _, _ = event_bus.subscribe("u1", "s1")
+    try:
+        for _ in range(3):
+            await asyncio.to_thread(neo4j_client.insert_facts, [("alice", "likes", "tea")], "u1", "s1")
+        await asyncio.sleep(0)  # publishes from the worker thread hop back onto the loop
+        weights = [event.data["weight"] for event in subscriber.buffer]
+    finally:
+        event_bus.unsubscribe("u1", "s1", subscriber)
+    assert weights == pytest.approx([1.0, 2.0, 3.0], rel=1e-3)
+
+
+def test_compaction_folds_old_edges_only(graph, monkeypatch):
+    monkeypatch.setattr(neo4j_client.settings, "fact_half_life_days", 1.0)
+    neo4j_client.insert_facts([("alice", "likes", "tea"), ("bob", "likes", "coffee")], "u1")
+    day = 86400 * 1000
+    old, fresh = graph.relations[("alice", "likes", "tea", "u1")], graph.relations[("bob", "likes", "coffee", "u1")]
+    old["decayed_at"] -= 2 * day
+
+    compacted, pruned = neo4j_client.compact_facts(fresh["decayed_at"], day, batch_size=10, threshold=0.01)
+    assert (compacted, pruned) == (1, 0)
+    assert old["weight"] == pytest.approx(0.25, rel=1e-3) and old["decayed_at"] == fresh["decayed_at"]
+    assert fresh["weight"] == 1.0
+
+
+def test_neighbourhood_keeps_the_strongest_edges(graph, monkeypatch):
+    monkeypatch.setattr(neo4j_client.settings, "fact_half_life_days", 1.0)
+    monkeypatch.setattr(neo4j_client.settings, "neighbourhood_max_edges", 2)
+    neo4j_client.insert_facts([("alice", "likes", "tea"), ("alice", "likes", "jam")], "u1")
+    neo4j_client.insert_facts([("alice", "likes", "cake")] * 3, "u1")
+    # heaviest on paper, but three half-lives old
+    graph.relations[("alice", "likes", "tea", "u1")]["weight"] = 5.0
+    graph.relations[("alice", "likes", "tea", "u1")]["decayed_at"] -= 3 * 86400 * 1000
+
+    facts = neo4j_client.get_entity_neighbourhood("u1", "alice")
+    assert [fact["target"] for fact in facts["outgoing"]] == ["cake", "jam"]
+
+
+class _RecordingTransaction:
+    def __init__(self):
+        self.statements = []
+
+    def run(self, query, **params):
+        self.statements.append((query, params))
+        return graph_standin._Result([])
+
+
+def test_every_query_parameter_is_passed():
+    tx = _RecordingTransaction()
+    facts = [neo4j_client._fact_params(("alice", "likes", "tea"), 1.0)]
+    neo4j_client.upsert_entity(tx, "alice", "Person", "u1")
+    neo4j_client.upsert_relation(tx, "alice", "likes", "tea", 1.0, "u1", "s1")
+    neo4j_client.upsert_facts(tx, facts, "u1", "s1")
+    neo4j_client.upsert_facts(tx, facts, "u1", "s1", marker="m1:0")
+    neo4j_client.fetch_user_facts(tx, "u1", 20)
+    neo4j_client.fetch_neighbourhood(tx, "u1", "alice", 50)
+    neo4j_client.compact_relations(tx, 1, 2, 100, 0.01)
+    neo4j_client.delete_markers(tx, 1, 100)
+    tx.run(neo4j_client.USER_ENTITIES, user_id="u1")
+    tx.run(neo4j_client.USER_RELATIONS, user_id="u1", half_life_ms=None)
+    for migration in graph_schema.MIGRATIONS:
+        for statement in migration.statements:
+            tx.run(statement)
+
+    for query, params in tx.statements:
+        assert set(re.findall(r"\$(\w+)", query)) <= set(params), query
+    assert "AppliedFacts" not in tx.statements[2][0] and "$marker" in tx.statements[3][0]
+    neighbourhood = tx.statements[5][0]
+    assert neighbourhood.index("ORDER BY") < neighbourhood.index("LIMIT")
@@ -0,0 +1,154 @@
+"""The Cypher in neo4j_client and graph_schema, run against a real Neo4j.
+
+The stand-in graph only mimics these queries, so this is what catches a
+broken statement. Set NEO4J_TEST_URI (and NEO4J_TEST_USER /
+NEO4J_TEST_PASSWORD) to a disposable server: every test wipes it.
+"""
+import os
+import time
+
+import pytest
+from neo4j import GraphDatabase
+from neo4j.exceptions import ConstraintError
+
+from app.services import graph_schema, neo4j_client
+from app.services.neighbourhood_cache import neighbourhood_cache
+
+NEO4J_TEST_URI = os.environ.get("NEO4J_TEST_URI")
+DAY_MS = 86400 * 1000
+
+pytestmark = [
+    pytest.mark.neo4j,
+    pytest.mark.skipif(not NEO4J_TEST_URI, reason="NEO4J_TEST_URI is not set"),
+]
+
+
+@pytest.fixture
+def neo4j(monkeypatch):
+    """An empty server with no schema, used by neo4j_client."""
+    driver = GraphDatabase.driver(
+        NEO4J_TEST_URI, auth=(os.environ.get("NEO4J_TEST_USER", "neo4j"), os.environ.get("NEO4J_TEST_PASSWORD", ""))
+    )
+    with driver.session() as session:
+        session.run("MATCH (n) DETACH DELETE n").consume()
+        for name in session.run("SHOW CONSTRAINTS YIELD name RETURN name").value():
+            session.run(f"DROP CONSTRAINT {name}").consume()
+        for name in session.run("SHOW INDEXES YIELD name, type WHERE type <> 'LOOKUP' RETURN name").value():
+            session.run(f"DROP INDEX {name}").consume()
+    monkeypatch.setattr(neo4j_client, "driver", driver)
+    neighbourhood_cache.clear()
+    try:
+        yield driver
+    finally:
+        neighbourhood_cache.clear()
+        driver.close()
+
+
+@pytest.fixture
+def graph(neo4j):
+    graph_schema.upgrade(neo4j)
+    return neo4j
+
+
+def _rows(driver, query, **params):
+    with driver.session() as session:
+        return session.run(query, **params).data()
+
+
+def _age(driver, target, days):
+    _rows(driver, "MATCH ()-[r:RELATED]->(:Entity {name: $target}) SET r.decayed_at = r.decayed_at - $age",
+          target=target, age=days * DAY_MS)
+
+
+def test_batched_upserts_reinforce_and_replays_apply_once(graph):
+    facts = [("alice", "likes", "tea"), ("alice", "likes", "tea"), {"source": "alice", "relation": "owns",
+                                                                     "target": "Rex", "target_type": "Dog"}]
+    neo4j_client.insert_facts(facts, "u1", "s1", message_id="m1")
+    neo4j_client.insert_facts(facts, "u1", "s1", message_id="m1")  # redelivered
+    neo4j_client.insert_facts([("alice", "likes", "tea")], "u2", message_id="m2")
+
+    weights = {(fact["target"], fact["relation"]): fact["weight"] for fact in neo4j_client.get_user_facts("u1")}
+    assert weights == pytest.approx({("tea", "likes"): 2.0, ("Rex", "owns"): 1.0}, rel=1e-3)
+    assert neo4j_client.get_user_facts("u2")[0]["weight"] == pytest.approx(1.0, rel=1e-3)
+    assert _rows(graph, "MATCH (m:AppliedFacts) RETURN m.key AS key ORDER BY key") == [{"key": "m1:0"}, {"key": "m2:0"}]
+    assert _rows(graph, "MATCH (e:Entity) RETURN e.user_id AS user_id, count(*) AS entities ORDER BY user_id") == [
+        {"user_id": "u1", "entities": 3}, {"user_id": "u2", "entities": 2},
+    ]
+
+    batches = dict(neo4j_client.stream_user_graph("u1"))
+    assert {entity["name"]: entity["entity_type"] for entity in batches["entity"]} == {
+        "alice": "Thing", "tea": "Thing", "Rex": "Dog",
+    }
+    assert len(batches["relation"]) == 2
+    neighbourhood = neo4j_client.get_entity_neighbourhood("u1", "alice")
+    assert [fact["target"] for fact in neighbourhood["outgoing"]] == ["tea", "Rex"]
+
+
+def test_single_fact_upserts(graph):
+    neo4j_client.insert_fact("alice", "likes", "tea", user_id="u1", session_id="s1")
+    neo4j_client.insert_fact("alice", "likes", "tea", weight=0.5, user_id="u1", session_id="s1")
+    [fact] = neo4j_client.get_user_facts("u1")
+    assert (fact["source"], fact["target"], fact["weight"]) == ("alice", "tea", pytest.approx(1.5, rel=1e-3))
+
+
+def test_decay_and_compaction(graph, monkeypatch):
+    monkeypatch.setattr(neo4j_client.settings, "fact_half_life_days", 1.0)
+    neo4j_client.insert_facts([("alice", "likes", "tea"), ("bob", "likes", "coffee")], "u1")
+    _age(graph, "tea", 2)
+
+    weights = {fact["target"]: fact["weight"] for fact in neo4j_client.get_user_facts("u1")}
+    assert weights == pytest.approx({"tea": 0.25, "coffee": 1.0}, rel=1e-3)
+
+    now = int(time.time() * 1000)
+    assert neo4j_client.compact_facts(now, DAY_MS, batch_size=10, threshold=0.01) == (1, 0)
+    [tea] = _rows(graph, "MATCH ()-[r:RELATED]->(:Entity {name: 'tea'}) RETURN r.weight AS weight, r.decayed_at AS at")
+    assert (tea["weight"], tea["at"]) == (pytest.approx(0.25, rel=1e-3), now)
+
+    _age(graph, "coffee", 10)
+    assert neo4j_client.compact_facts(int(time.time() * 1000), DAY_MS, batch_size=10, threshold=0.01) == (1, 1)
+    assert [fact["target"] for fact in neo4j_client.get_user_facts("u1")] == ["tea"]
+
+
+def test_old_markers_are_pruned_in_batches(graph):
+    for message_id in ("m1", "m2", "m3"):
+        neo4j_client.insert_facts([("alice", "likes", "tea")], "u1", message_id=message_id)
+    _rows(graph, "MATCH (m:AppliedFacts) WHERE m.key <> 'm3:0' SET m.applied_at = 0")
+
+    assert neo4j_client.prune_markers(1, batch_size=1) == 2
+    assert _rows(graph, "MATCH (m:AppliedFacts) RETURN m.key AS key") == [{"key": "m3:0"}]
+
+
+def test_migrations_fold_duplicates_and_split_shared_entities(neo4j):
+    assert graph_schema.upgrade(neo4j, target=3) == [1, 2, 3]
+    # the shape left by the name-keyed schema: a duplicate from a MERGE race, edges per user
+    _rows(neo4j, """
+        CREATE (:Entity {name: 'alice', type: 'Person'}), (:Entity {name: 'alice', type: 'Person'}),
+               (:Entity {name: 'tea', type: 'Drink'})
+        """)
+    _rows(neo4j, """
+        MATCH (a:Entity {name: 'alice'}), (t:Entity {name: 'tea'})
+        CREATE (a)-[:RELATED {verb: 'likes', user_id: 'u1', weight: 1.0, last_reinforced: 1}]->(t)
+        """)
+    _rows(neo4j, """
+        MATCH (a:Entity {name: 'alice'}), (t:Entity {name: 'tea'})
+        WITH a, t LIMIT 1
+        CREATE (a)-[:RELATED {verb: 'likes', user_id: 'u2', weight: 1.0, last_reinforced: 1}]->(t)
+        """)
+
+    assert graph_schema.upgrade(neo4j) == [4, 5, 6]
+    assert _rows(neo4j, """
+        MATCH (a:Entity)-[r:RELATED]->(b:Entity)
+        RETURN a.user_id AS source_user, r.user_id AS user_id, b.user_id AS target_user, a.name AS source,
+               b.name AS target, b.type AS target_type, r.weight AS weight, r.decayed_at IS NOT NULL AS stamped
+        ORDER BY user_id
+        """) == [
+        {"source_user": user, "user_id": user, "target_user": user, "source": "alice", "target": "tea",
+         "target_type": "Drink", "weight": weight, "stamped": True}
+        for user, weight in (("u1", 2.0), ("u2", 1.0))
+    ]
+    assert _rows(neo4j, "MATCH (e:Entity) WHERE e.user_id IS NULL RETURN e") == []
+    constraints = set(_rows(neo4j, "SHOW CONSTRAINTS YIELD name RETURN collect(name) AS names")[0]["names"])
+    assert {"entity_user_name", "applied_facts_key"} <= constraints and "entity_name_unique" not in constraints
+    with pytest.raises(ConstraintError):
+        _rows(neo4j, "CREATE (:Entity {user_id: 'u1', name: 'alice'})")
+    assert graph_schema.upgrade(neo4j) == []
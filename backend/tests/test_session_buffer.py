@@ -0,0 +1,70 @@
+import datetime
+import uuid
+
+import pytest
+
+from app.db import crud
+from app.db.database import AsyncSessionLocal
+from app.services.session_buffer import BufferedMessage, SessionBuffer, session_buffer
+
+START = datetime.datetime(2026, 1, 1)
+
+
+def _message(second: int, text: str = "hello") -> BufferedMessage:
+    return BufferedMessage(uuid.uuid4(), "user", text, START + datetime.timedelta(seconds=second))
+
+
+def _texts(messages):
+    return [message.message_text for message in messages]
+
+
+def test_ring_keeps_the_tail_in_order():
+    buffer = SessionBuffer(capacity=3, max_bytes=1 << 20)
+    user_id, session_id = uuid.uuid4(), uuid.uuid4()
+    for second in (0, 1, 3, 4):
+        buffer.append(user_id, session_id, _message(second, str(second)))
+    buffer.append(user_id, session_id, _message(2, "2"))  # committed late
+
+    assert _texts(buffer.get(user_id, session_id, 3)) == ["2", "3", "4"]
+    assert buffer.get(user_id, session_id, 4) is None  # beyond capacity
+    assert buffer.bytes == sum(entry.bytes for entry in buffer._sessions.values())
+
+
+def test_unwarmed_session_answers_only_what_it_holds():
+    buffer = SessionBuffer(capacity=5, max_bytes=1 << 20)
+    user_id, session_id = uuid.uuid4(), uuid.uuid4()
+    buffer.append(user_id, session_id, _message(10, "new"))
+    assert buffer.get(user_id, session_id, 2) is None  # older rows may exist in the database
+
+    # a write that lands while the warming read is in flight is merged, not lost
+    buffer.warm(user_id, session_id, [_message(1, "old")])
+    assert _texts(buffer.get(user_id, session_id, 5)) == ["old", "new"]
+    assert (buffer.hits, buffer.misses) == (1, 1)
+
+
+def test_least_recently_used_sessions_are_evicted_under_the_byte_budget():
+    buffer = SessionBuffer(capacity=10, max_bytes=3500)
+    user_id, sessions = uuid.uuid4(), [uuid.uuid4() for _ in range(3)]
+    for session_id in sessions:
+        buffer.append(user_id, session_id, _message(0, "x" * 400))
+    buffer.get(user_id, sessions[0], 1)
+    buffer.append(user_id, sessions[2], _message(1, "x" * 400))
+
+    assert buffer.bytes <= buffer.max_bytes and buffer.evictions == 1
+    assert buffer.get(user_id, sessions[1], 1) is None
+    assert buffer.get(user_id, sessions[0], 1) is not None
+
+
+@pytest.mark.anyio
+async def test_recent_messages_are_served_from_the_buffer_once_warm(db):
+    user_id, session_id = uuid.uuid4(), uuid.uuid4()
+    for text in ("one", "two"):
+        await crud.create_chat_message(session_id, user_id, text)
+    session_buffer.discard(user_id, session_id)  # as after a bulk import
+
+    async with AsyncSessionLocal() as session:
+        misses = session_buffer.misses
+        assert _texts(await crud.get_recent_messages_buffered(session, user_id, session_id, 5)) == ["one", "two"]
+        await crud.create_chat_message(session_id, user_id, "three")
+        assert _texts(await crud.get_recent_messages_buffered(session, user_id, session_id, 5)) == ["one", "two", "three"]
+        assert session_buffer.misses == misses + 1
@@ -0,0 +1,48 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import ChatHistory
+from app.services.transcript_import import ImportInProgress, TranscriptImporter
+from app.services.work_queue import WorkQueue
+
+
+def _transcript(session_id, count):
+    return b"".join(
+        json.dumps({"session_id": str(session_id), "role": "assistant", "content": f"reply {i}"}).encode() + b"\n"
+        for i in range(count)
+    )
+
+
+@pytest.mark.anyio
+async def test_a_second_run_cannot_import_a_chunk_twice(db):
+    user_id = uuid.uuid4()
+    lines = _transcript(uuid.uuid4(), 4).splitlines(keepends=True)
+    paused, release = asyncio.Event(), asyncio.Event()
+
+    async def stalled():
+        yield b"".join(lines[:2])
+        paused.set()
+        await release.wait()
+        yield b"".join(lines[2:])
+
+    async def whole():
+        yield b"".join(lines)
+
+    # separate importers share no in-process guard, like two workers or processes
+    first, second = (TranscriptImporter(chunk_size=2, workers=1, queue=WorkQueue(None, concurrency=1, max_depth=100)) for _ in range(2))
+    running = asyncio.create_task(first.run(user_id, "chats", stalled()))
+    await paused.wait()
+    summary = await second.run(user_id, "chats", whole())
+    assert (summary["resumed_from"], summary["imported_now"], summary["status"]) == (len(b"".join(lines[:2])), 2, "done")
+
+    release.set()
+    with pytest.raises(ImportInProgress):
+        await running
+    async with AsyncSessionLocal() as session:
+        texts = (await session.execute(sa.select(ChatHistory.message_text))).scalars().all()
+    assert sorted(texts) == [f"reply {i}" for i in range(4)]
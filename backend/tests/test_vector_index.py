@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.vector_index import UserIndex, VectorIndex
+
+DIM = 16
+
+
+def _add(registry, user_id, count, rng):
+    ids = [uuid.uuid4() for _ in range(count)]
+    for message_id in ids:
+        registry.add(user_id, message_id, uuid.uuid4(), rng.standard_normal(DIM).astype(np.float32))
+    return ids
+
+
+def test_user_index_grows_in_place():
+    index = UserIndex(DIM)
+    rng = np.random.default_rng(0)
+    buffers = set()
+    for _ in range(1000):
+        index.add([uuid.uuid4().bytes], [uuid.uuid4().bytes], rng.standard_normal((1, DIM)))
+        buffers.add(id(index._vectors))
+    assert len(index) == 1000
+    assert len(buffers) <= 6  # 64, 128, ... 1024: doubling, not one copy per add
+    probe = index.vectors[123]
+    assert index.search(probe, 1)[0][0] == bytes(index.ids[123])
+
+
+@pytest.mark.anyio
+async def test_training_runs_in_the_background(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "vector_index_min_train", 64)
+    registry = VectorIndex(str(tmp_path), DIM, max_bytes=1 << 30, persist_every=50)
+    user_id = uuid.uuid4()
+    registry._indexes[user_id] = UserIndex(DIM)
+    ids = _add(registry, user_id, 200, np.random.default_rng(1))
+    await registry.close()
+
+    index = registry._indexes[user_id]
+    assert index.centroids is not None and index.trained_size >= 64
+    assert len(index.assignments) == len(index) == 200
+    assert registry.stats()["trainings"] >= 1
+    restored = UserIndex.load(registry._path(user_id), DIM)
+    assert len(restored) == 200 and uuid.UUID(bytes=bytes(restored.ids[-1])) == ids[-1]
+
+
+@pytest.mark.anyio
+async def test_least_recently_used_index_is_saved_and_evicted(tmp_path):
+    registry = VectorIndex(str(tmp_path), DIM, max_bytes=20000, persist_every=10 ** 6)
+    rng = np.random.default_rng(2)
+    first, second = uuid.uuid4(), uuid.uuid4()
+    registry._indexes[first] = UserIndex(DIM)
+    registry._indexes[second] = UserIndex(DIM)
+    _add(registry, first, 100, rng)
+    _add(registry, second, 100, rng)
+    await registry.close()
+
+    assert list(registry._indexes) == [second]
+    assert registry.stats()["evictions"] == 1
+    assert registry.bytes == registry._indexes[second].nbytes
+    assert len(UserIndex.load(registry._path(first), DIM)) == 100
+
+
+@pytest.mark.anyio
+async def test_build_outlives_a_cancelled_query(db, tmp_path, monkeypatch):
+    release = threading.Event()
+    build = VectorIndex._build
+
+    def slow_build(self, user_id, rows):
+        release.wait(5)
+        return build(self, user_id, rows)
+
+    monkeypatch.setattr(VectorIndex, "_build", slow_build)
+    registry = VectorIndex(str(tmp_path), DIM, max_bytes=1 << 30)
+    user_id, query = uuid.uuid4(), np.ones(DIM, dtype=np.float32)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(registry.search(user_id, query), 0.05)
+    assert registry.stats()["building"] == 1
+    with pytest.raises(asyncio.TimeoutError):  # still building: the next deadline expires too
+        await asyncio.wait_for(registry.search(user_id, query), 0.05)
+
+    release.set()
+    assert await registry.search(user_id, query) == []
+    assert registry.stats()["builds"] == 1 and user_id in registry._indexes
+    await registry.close()
+
+
+@pytest.mark.anyio
+async def test_message_added_during_a_build_is_indexed(db, tmp_path, monkeypatch):
+    release = threading.Event()
+    build = VectorIndex._build
+
+    def slow_build(self, user_id, rows):
+        release.wait(5)
+        return build(self, user_id, rows)
+
+    monkeypatch.setattr(VectorIndex, "_build", slow_build)
+    registry = VectorIndex(str(tmp_path), DIM, max_bytes=1 << 30)
+    user_id, message_id, embedding = uuid.uuid4(), uuid.uuid4(), np.ones(DIM, dtype=np.float32)
+
+    search = asyncio.ensure_future(registry.search(user_id, embedding))
+    await asyncio.sleep(0.05)
+    registry.add(user_id, message_id, uuid.uuid4(), embedding)  # stored after the catch-up query ran
+    release.set()
+    await search
+    assert [hit for hit, _ in await registry.search(user_id, embedding)] == [message_id]
+    await registry.close()
@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.db import crud
+from app.db.database import AsyncSessionLocal
+from app.db.models import ChatHistory, MessageJob
+from app.db.writer import chat_writer
+from app.services import neo4j_client
+from app.services.work_queue import QueueFull, WorkQueue
+from benchmarks.graph_standin import StandInGraph
+
+
+async def _jobs():
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(sa.select(MessageJob))).scalars().all()
+
+
+async def _wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.anyio
+async def test_message_and_job_commit_together(db):
+    queue = WorkQueue(None, concurrency=1, max_depth=1)
+    user_id, session_id = uuid.uuid4(), uuid.uuid4()
+    async with queue.reserve():
+        chat = await crud.create_chat_message(session_id, user_id, "I live in Paris", enqueue=True)
+    await chat_writer.close()
+
+    [job] = await _jobs()
+    assert (job.message_id, job.session_id, job.message_text) == (chat.id, session_id, "I live in Paris")
+    assert queue.depth == 1
+    with pytest.raises(QueueFull):
+        async with queue.reserve():
+            pass
+
+
+@pytest.mark.anyio
+async def test_failed_insert_gives_the_reservation_back(db):
+    queue = WorkQueue(None, concurrency=1, max_depth=10)
+    message_id = uuid.uuid4()
+    row = dict(id=message_id, session_id=uuid.uuid4(), user_id=uuid.uuid4(), message_text="hi", role="user")
+    await chat_writer.submit(row)
+    with pytest.raises(sa.exc.IntegrityError):  # same primary key: neither row nor job is written
+        async with queue.reserve():
+            await chat_writer.submit(row, [(MessageJob, dict(
+                message_id=message_id, session_id=row["session_id"], user_id=row["user_id"],
+                message_text="hi", role="user",
+            ))])
+    await chat_writer.close()
+    assert queue.depth == 0
+    assert await _jobs() == []
+    async with AsyncSessionLocal() as session:
+        assert (await session.execute(sa.select(sa.func.count()).select_from(ChatHistory))).scalar_one() == 1
+
+
+@pytest.mark.anyio
+async def test_redelivered_job_reinforces_facts_once(db, monkeypatch):
+    graph = StandInGraph(rtt=0)
+    monkeypatch.setattr(neo4j_client, "driver", graph)
+    monkeypatch.setattr(settings, "queue_retry_base_seconds", 0)
+    calls = []
+
+    async def handler(session_id, user_id, message_text, role, message_id=None):
+        calls.append(message_id)
+        await asyncio.to_thread(
+            neo4j_client.insert_facts, [("alice", "likes", "tea")], user_id, session_id, message_id=message_id
+        )
+        if len(calls) == 1:
+            raise RuntimeError("worker died after the graph write")
+
+    queue = WorkQueue(handler, concurrency=2, max_depth=10)
+    user_id = uuid.uuid4()
+    async with queue.reserve():
+        chat = await crud.create_chat_message(uuid.uuid4(), user_id, "Alice likes tea", enqueue=True)
+    await queue.start()
+    try:
+        async def done():
+            return [job.status for job in await _jobs()] == ["done"]
+        await _wait_for(done)
+    finally:
+        await queue.stop()
+        await chat_writer.close()
+
+    assert calls == [chat.id, chat.id]
+    [job] = await _jobs()
+    assert job.attempts == 2 and queue.stats()["retried"] == 1
+    assert graph.relations[("alice", "likes", "tea", str(user_id))]["weight"] == 1.0
@@ -0,0 +1,30 @@
+import asyncio
+import uuid
+
+import pytest
+import sqlalchemy as sa
+
+from app.db.database import AsyncSessionLocal
+from app.db.models import ChatHistory
+from app.db.writer import GroupCommitWriter
+
+
+def _row(**values):
+    return dict(session_id=uuid.uuid4(), user_id=uuid.uuid4(), message_text="hello", role="user", **values)
+
+
+@pytest.mark.anyio
+async def test_bad_row_fails_only_its_own_submit(db):
+    writer = GroupCommitWriter(ChatHistory, window=0.05)
+    taken = await writer.submit(_row())
+    results = await asyncio.gather(
+        writer.submit(_row()), writer.submit(_row(id=taken["id"])), writer.submit(_row()),
+        return_exceptions=True,
+    )
+    await writer.close()
+
+    assert isinstance(results[1], sa.exc.IntegrityError)
+    assert not isinstance(results[0], Exception) and not isinstance(results[2], Exception)
+    async with AsyncSessionLocal() as session:
+        stored = set((await session.execute(sa.select(ChatHistory.id))).scalars())
+    assert stored == {taken["id"], results[0]["id"], results[2]["id"]}